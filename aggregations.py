@@ -0,0 +1,439 @@
+"""
+Memoized aggregation layer for the Research Dashboard.
+
+Streamlit reruns the whole script on every widget interaction, but the
+dashboard numbers only change when a check-in is saved. Aggregates are
+therefore cached on (store version, filter tuple) and recomputed only
+after the store's version moves on.
+
+On top of that, `RunningAggregates` is updated by the check-in store on
+every write, so per-segment means and frequency tables are O(1) lookups
+instead of full scans.
+"""
+import functools
+import math
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from charts import weekly_mean
+from diagnostics import ROWS_SCANNED, count
+
+# Dashboard filter columns, in the order they appear in the UI.
+FILTER_COLUMNS = ("user_id", "neurotype", "dating_intention")
+
+# Segments with incrementally maintained statistics. `None` is the
+# whole study.
+SEGMENT_COLUMNS = ("user_id", "neurotype", "dating_intention", "nudge_arm")
+
+# Numeric columns with running count / sum / sum of squares.
+METRIC_COLUMNS = (
+    "dating_feel",
+    "burnout_index",
+    "matches",
+    "conversations",
+    "dates",
+    "conversation_rate",
+    "date_rate",
+)
+
+# Categorical columns with running frequency tables.
+COUNTED_COLUMNS = (
+    "user_id",
+    "neurotype",
+    "goal",
+    "friction",
+    "persona_label",
+    "nudge_type",
+    "dating_feel",
+)
+
+# Frequency table holding the comma-separated `research_tags`, one per tag.
+TAGS = "research_tags"
+
+SliceKey = Tuple[Tuple[str, str], ...]
+Segment = Tuple[Optional[str], object]
+GLOBAL: Segment = (None, None)
+
+
+def _missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def split_tags(tags) -> list:
+    if _missing(tags):
+        return []
+    return [t.strip() for t in str(tags).split(",") if t.strip()]
+
+
+def _factorize(values: pd.Series):
+    """`pd.factorize` with the uniques as a plain list (cheap to index)."""
+    codes, uniques = pd.factorize(values)
+    return codes, np.asarray(uniques, dtype=object).tolist()
+
+
+def _factorize_tags(tags: pd.Series):
+    """
+    Explode comma-separated tag strings into (row positions, (tag codes,
+    tag names)), splitting each distinct string only once.
+    """
+    codes, uniques = _factorize(tags)
+    split = [split_tags(u) for u in uniques]
+    names = sorted({t for ts in split for t in ts})
+    rows, tag_codes = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    for i, name in enumerate(names):
+        holders = [j for j, ts in enumerate(split) if name in ts]
+        positions = np.flatnonzero(np.isin(codes, holders))
+        rows.append(positions)
+        tag_codes.append(np.full(len(positions), i, dtype=np.int64))
+    return np.concatenate(rows), (np.concatenate(tag_codes), names)
+
+
+class RunningStats:
+    """Count, sum and sum of squares of one metric within one segment."""
+
+    __slots__ = ("count", "total", "total_sq")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+
+    def merge(self, count: int, total: float, total_sq: float):
+        self.count += int(count)
+        self.total += float(total)
+        self.total_sq += float(total_sq)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float("nan")
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (n - 1 denominator), NaN below two observations."""
+        if self.count < 2:
+            return float("nan")
+        return max(0.0, (self.total_sq - self.total * self.total / self.count) / (self.count - 1))
+
+
+class RunningAggregates:
+    """
+    Per-segment summary state maintained on ingest.
+
+    For the whole study and for each value of every column in
+    `SEGMENT_COLUMNS` this keeps a row count, `RunningStats` for every
+    column in `METRIC_COLUMNS`, and a `Counter` for every column in
+    `COUNTED_COLUMNS` plus the individual research tags.
+    """
+
+    # Columns with a per-segment frequency table (plus TAGS).
+    counted: Tuple[str, ...] = COUNTED_COLUMNS
+
+    def __init__(self):
+        self.rows: Counter = Counter()
+        self.stats: Dict[Tuple[Segment, str], RunningStats] = {}
+        self.counts: Dict[Tuple[Segment, str], Counter] = {}
+
+    def _segments(self, row: Dict) -> Iterable[Segment]:
+        yield GLOBAL
+        for dim in SEGMENT_COLUMNS:
+            value = row.get(dim)
+            if not _missing(value):
+                yield (dim, value)
+
+    def _segment_codes(self, frame: pd.DataFrame) -> Iterator[Tuple[np.ndarray, List[Segment]]]:
+        """
+        Frame-wise `_segments`: for each segmentation, the segment code of
+        every row (-1 = no segment) and the segment each code stands for.
+        """
+        yield np.zeros(len(frame), dtype=np.int64), [GLOBAL]
+        for dim in SEGMENT_COLUMNS:
+            key_codes, uniques = _factorize(frame[dim])
+            yield key_codes, [(dim, v) for v in uniques]
+
+    def _stats(self, segment: Segment, metric: str) -> RunningStats:
+        key = (segment, metric)
+        if key not in self.stats:
+            self.stats[key] = RunningStats()
+        return self.stats[key]
+
+    def _counter(self, segment: Segment, column: str) -> Counter:
+        key = (segment, column)
+        if key not in self.counts:
+            self.counts[key] = Counter()
+        return self.counts[key]
+
+    # ---------------------------------------------------
+    # Updates
+    # ---------------------------------------------------
+    def update(self, row: Dict):
+        """Fold a single check-in row into every segment it belongs to."""
+        tags = split_tags(row.get(TAGS))
+        for segment in self._segments(row):
+            self.rows[segment] += 1
+            for metric in METRIC_COLUMNS:
+                value = row.get(metric)
+                if not _missing(value):
+                    self._stats(segment, metric).add(float(value))
+            for column in self.counted:
+                value = row.get(column)
+                if not _missing(value):
+                    self._counter(segment, column)[value] += 1
+            if tags:
+                self._counter(segment, TAGS).update(tags)
+
+    def update_frame(self, frame: pd.DataFrame, sign: int = 1):
+        """
+        Vectorized equivalent of calling `update` for every row: segment
+        and value columns are factorized to integer codes and tallied with
+        `np.bincount`, so Python only loops over distinct combinations.
+
+        `sign=-1` takes previously added rows back out again, e.g. to move
+        them to other segments after a profile edit.
+        """
+        if frame.empty:
+            return
+
+        metrics = {
+            m: pd.to_numeric(frame[m], errors="coerce").to_numpy(dtype=float)
+            for m in METRIC_COLUMNS
+        }
+        values = {c: _factorize(frame[c]) for c in self.counted}
+        tag_rows, values[TAGS] = _factorize_tags(frame[TAGS])
+
+        for key_codes, segments in self._segment_codes(frame):
+            n_segments = len(segments)
+            has_key = key_codes >= 0
+
+            for i, size in enumerate(np.bincount(key_codes[has_key], minlength=n_segments)):
+                if size:
+                    self.rows[segments[i]] += sign * int(size)
+                    if self.rows[segments[i]] <= 0:
+                        del self.rows[segments[i]]
+
+            for metric, x in metrics.items():
+                ok = has_key & ~np.isnan(x)
+                k = key_codes[ok]
+                counts = np.bincount(k, minlength=n_segments)
+                sums = np.bincount(k, weights=x[ok], minlength=n_segments)
+                sums_sq = np.bincount(k, weights=x[ok] ** 2, minlength=n_segments)
+                for i in np.flatnonzero(counts):
+                    stats = self._stats(segments[i], metric)
+                    stats.merge(sign * counts[i], sign * sums[i], sign * sums_sq[i])
+                    if stats.count <= 0:
+                        del self.stats[(segments[i], metric)]
+
+            for column, (codes, uniques) in values.items():
+                keys = key_codes[tag_rows] if column == TAGS else key_codes
+                ok = (keys >= 0) & (codes >= 0)
+                combined = keys[ok] * len(uniques) + codes[ok]
+                combos, counts = np.unique(combined, return_counts=True)
+                for combo, n in zip(combos.tolist(), counts.tolist()):
+                    seg, item = divmod(combo, len(uniques))
+                    counter = self._counter(segments[seg], column)
+                    counter[uniques[item]] += sign * n
+                    if counter[uniques[item]] <= 0:
+                        # Removed rows leave no empty entries behind.
+                        del counter[uniques[item]]
+                        if not counter:
+                            del self.counts[(segments[seg], column)]
+
+    # ---------------------------------------------------
+    # Lookups
+    # ---------------------------------------------------
+    def count(self, dim: Optional[str] = None, value=None) -> int:
+        return self.rows.get(GLOBAL if dim is None else (dim, value), 0)
+
+    def metric(self, metric: str, dim: Optional[str] = None, value=None) -> RunningStats:
+        return self.stats.get(
+            (GLOBAL if dim is None else (dim, value), metric), RunningStats()
+        )
+
+    def mean(self, metric: str, dim: Optional[str] = None, value=None) -> float:
+        return self.metric(metric, dim, value).mean
+
+    def value_counts(self, column: str, dim: Optional[str] = None, value=None) -> pd.Series:
+        """Frequency table shaped like `Series.value_counts()`."""
+        counter = self.counts.get((GLOBAL if dim is None else (dim, value), column), Counter())
+        return pd.Series(
+            dict(counter.most_common()), name="count", dtype="int64"
+        ).rename_axis(column)
+
+    def distinct(self, column: str, dim: Optional[str] = None, value=None) -> int:
+        return len(self.counts.get((GLOBAL if dim is None else (dim, value), column), ()))
+
+    def segment_values(self, dim: str) -> list:
+        return sorted(v for d, v in self.rows if d == dim)
+
+
+class AggregationCache:
+    """
+    Small thread-safe LRU cache of computed aggregates.
+
+    Entries are tagged with the store version they were computed from;
+    the first lookup at a newer version drops everything older.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, version: int, key: Hashable, compute: Callable[[], object]):
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+            elif key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = compute()
+
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            self.misses += 1
+        return value
+
+
+def slice_key(**filters) -> SliceKey:
+    """Canonical hashable key for a set of active (non-"All") filters."""
+    return tuple(sorted((col, value) for col, value in filters.items() if value is not None))
+
+
+def _value_counts(values: pd.Series) -> pd.Series:
+    """`value_counts` without the zero rows categoricals add for unused categories."""
+    counts = values.value_counts()
+    return counts[counts > 0]
+
+
+def summarize_slice(
+    filtered: pd.DataFrame,
+    running: Optional[RunningAggregates] = None,
+    key: SliceKey = (),
+) -> Dict[str, object]:
+    """
+    Every aggregate the dashboard renders for one filtered slice.
+    `filtered` is expected in check-in date order (`CheckinStore.timeline`);
+    `rows` returns it, and `positions` is None (see `dashboard_slice`).
+
+    When `running` is given and the slice is the whole study or a single
+    segment, scalar metrics and frequency tables are read from it instead
+    of being recomputed from `filtered`.
+    """
+    rows = filtered
+
+    summary = {
+        "rows": lambda: rows,
+        "positions": None,
+        "total_checkins": len(rows),
+        "mood_series": weekly_mean(rows, "checkin_date", ["dating_feel"]),
+    }
+
+    if running is not None and len(key) <= 1:
+        dim, value = key[0] if key else (None, None)
+        tag_counts = running.value_counts(TAGS, dim, value)
+        summary.update(
+            {
+                "unique_participants": running.distinct("user_id", dim, value),
+                "avg_dating_feel": running.mean("dating_feel", dim, value),
+                "avg_burnout_index": running.mean("burnout_index", dim, value),
+                "nudge_counts": (
+                    running.value_counts("nudge_type", dim, value)
+                    .rename_axis("nudge_type")
+                    .reset_index(name="count")
+                ),
+                "goal_counts": running.value_counts("goal", dim, value).to_frame(),
+                "friction_counts": running.value_counts("friction", dim, value).to_frame(),
+                "persona_counts": running.value_counts("persona_label", dim, value).to_frame(),
+                "tag_counts": tag_counts.to_frame() if not tag_counts.empty else None,
+            }
+        )
+        return summary
+
+    count(ROWS_SCANNED, len(rows))
+    tags = (
+        rows["research_tags"]
+        .dropna()
+        .astype(str)
+        .str.split(",")
+        .explode()
+        .str.strip()
+    )
+    tags = tags[tags != ""]
+
+    summary.update(
+        {
+            "unique_participants": rows["user_id"].nunique(),
+            "avg_dating_feel": rows["dating_feel"].mean(),
+            "avg_burnout_index": rows["burnout_index"].mean(),
+            "nudge_counts": (
+                _value_counts(rows["nudge_type"])
+                .rename_axis("nudge_type")
+                .reset_index(name="count")
+            ),
+            "goal_counts": _value_counts(rows["goal"]).rename("count").to_frame(),
+            "friction_counts": _value_counts(rows["friction"]).rename("count").to_frame(),
+            "persona_counts": _value_counts(rows["persona_label"]).rename("count").to_frame(),
+            "tag_counts": _value_counts(tags).rename("count").to_frame() if not tags.empty else None,
+        }
+    )
+    return summary
+
+
+def dashboard_slice(cache: AggregationCache, store, key: SliceKey) -> Dict[str, object]:
+    """
+    Cached summary of the rows matching `key`, or None when the slice is
+    empty. Recomputed only when `store.version` changes. `rows` is a
+    callable returning the slice's check-ins in date order.
+
+    Slices that do not pick out a single participant are summarized from
+    the store's weekly rollup; only per-participant slices are scanned.
+    A rollup-served slice does not read its rows up front: `positions()`
+    gives their positions in `store.frame()` (enough for a paged table)
+    and `rows()` takes them, each on first call only.
+    """
+    filters = dict(key)
+
+    def compute():
+        if "user_id" in filters:
+            filtered = store.timeline(**filters)
+            if filtered.empty:
+                return None
+            return summarize_slice(filtered, store.aggregates, key)
+        summary = store.rollup.summary(**filters)
+        if not summary["total_checkins"]:
+            return None
+        positions = functools.cache(lambda: store.timeline_positions(**filters))
+        rows = functools.cache(lambda: store.frame().take(positions()))
+        return dict(summary, rows=rows, positions=positions)
+
+    return cache.get_or_compute(store.version, ("slice", key), compute)
+
+
+def dashboard_options(cache: AggregationCache, store) -> Dict[str, list]:
+    """Sorted distinct values for each dashboard filter column."""
+    return cache.get_or_compute(
+        store.version,
+        ("options",),
+        lambda: {col: store.distinct(col) for col in FILTER_COLUMNS},
+    )
@@ -1,8 +1,60 @@
+import os
+
 import streamlit as st
+import numpy as np
 import pandas as pd
+from collections import deque
 from datetime import date, datetime
-from random import choice
-from typing import Tuple, Dict
+from typing import Dict, List, Optional
+
+from aggregations import AggregationCache, dashboard_options, dashboard_slice, slice_key
+from arm_effects import REFERENCE_ARM, RESAMPLES, arm_effects
+from charts import (
+    CHART_POINT_BUDGET,
+    MAX_POINT_BUDGET,
+    MIN_POINT_BUDGET,
+    binned_scatter,
+    downsample,
+)
+from checkin_store import STORE_URL_ENV, CheckinStore, store_from_url
+from diagnostics import (
+    BYTES_SERIALIZED,
+    ROWS_RENDERED,
+    ROWS_SCANNED,
+    RerunTrace,
+    count,
+    start_trace,
+    summarize,
+    timed,
+    to_json,
+    tracing,
+)
+from export import EXPORT_FORMATS, export_bytes, payload_bytes
+from ingest import ingest
+from nudges import assign_experiment_arm, render_nudge, select_template
+from personas import generate_persona_label
+from profile_store import ProfileStore
+from schema import (
+    AGE_BRACKETS,
+    DATING_INTENTIONS,
+    FRICTIONS,
+    GENDERS,
+    GOALS,
+    NEUROTYPES,
+    ORIENTATIONS,
+    option_index,
+)
+from synthetic import SEED_PARTICIPANTS_ENV, SEED_WEEKS_ENV, generate_checkins
+from tables import (
+    DEFAULT_PAGE_SIZE,
+    PAGE_SIZES,
+    page_count,
+    page_slice,
+    sort_positions,
+    sort_subset,
+    visible_columns,
+)
+from tagging import tag_burnout_note
 
 # ---------------------------------------------------
 # Page config
@@ -13,6 +65,8 @@ st.set_page_config(
     layout="wide",
 )
 
+rerun = start_trace()
+
 # --- Color & visual system (colorful, but product-y) ---
 ACCENT = "#FF5A7A"        # rosy accent
 ACCENT_DARK = "#D74463"
@@ -22,422 +76,290 @@ TEXT_MAIN = "#13141F"
 CARD_BG = "#FFFFFF"
 CARD_BORDER = "#E2E6F0"
 
-st.markdown(
-    f"""
-    <style>
-    /* Global background as gradient */
-    .stApp {{
-        background: linear-gradient(160deg, {BG_GRADIENT_TOP} 0%, {BG_GRADIENT_BOTTOM} 60%);
-        color: {TEXT_MAIN};
-        font-family: "Inter", system-ui, -apple-system, BlinkMacSystemFont, "Helvetica Neue", Arial, sans-serif;
-    }}
-
-    .block-container {{
-        padding-top: 1.5rem;
-        padding-bottom: 4rem;
-    }}
-
-    /* Main "card" look for each page content area */
-    .page-card {{
-        background-color: {CARD_BG};
-        border-radius: 18px;
-        padding: 1.75rem 1.75rem 2rem 1.75rem;
-        border: 1px solid {CARD_BORDER};
-        box-shadow: 0 18px 40px rgba(15, 23, 42, 0.08);
-    }}
-
-    /* Sidebar styling */
-    [data-testid="stSidebar"] {{
-        background: rgba(255, 255, 255, 0.96);
-        border-right: 1px solid #E0E3EC;
-    }}
-
-    /* Headings */
-    h1, h2, h3, h4, h5, h6 {{
-        color: {TEXT_MAIN} !important;
-        font-weight: 650;
-    }}
-
-    /* Buttons */
-    div.stButton > button, div.stDownloadButton > button {{
-        background: linear-gradient(135deg, {ACCENT} 0%, {ACCENT_DARK} 100%) !important;
-        color: #FFFFFF !important;
-        border-radius: 999px !important;
-        border: none;
-        padding: 0.5rem 1.3rem;
-        font-weight: 600;
-    }}
-    div.stButton > button:hover, div.stDownloadButton > button:hover {{
-        filter: brightness(1.05);
-        box-shadow: 0 8px 20px rgba(255, 90, 122, 0.35);
-    }}
-
-    /* Inputs & selects */
-    .stTextInput > div > div > input,
-    .stNumberInput input,
-    .stSelectbox > div > div > select,
-    .stTextArea textarea {{
-        border-radius: 999px !important;
-        border: 1px solid #D0D6EA !important;
-    }}
-
-    .stTextArea textarea {{
-        border-radius: 14px !important;
-    }}
-
-    /* Radio / checkbox labels */
-    .stRadio > label, .stSelectbox > label, .stTextInput > label, .stNumberInput > label {{
-        font-weight: 500;
-    }}
-
-    /* Alerts (info/success) */
-    .stAlert > div {{
-        border-radius: 16px;
-        border: none;
-    }}
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+with timed("page style (CSS)"):
+    st.markdown(
+        f"""
+        <style>
+        /* Global background as gradient */
+        .stApp {{
+            background: linear-gradient(160deg, {BG_GRADIENT_TOP} 0%, {BG_GRADIENT_BOTTOM} 60%);
+            color: {TEXT_MAIN};
+            font-family: "Inter", system-ui, -apple-system, BlinkMacSystemFont, "Helvetica Neue", Arial, sans-serif;
+        }}
+
+        .block-container {{
+            padding-top: 1.5rem;
+            padding-bottom: 4rem;
+        }}
+
+        /* Main "card" look for each page content area */
+        .page-card {{
+            background-color: {CARD_BG};
+            border-radius: 18px;
+            padding: 1.75rem 1.75rem 2rem 1.75rem;
+            border: 1px solid {CARD_BORDER};
+            box-shadow: 0 18px 40px rgba(15, 23, 42, 0.08);
+        }}
+
+        /* Sidebar styling */
+        [data-testid="stSidebar"] {{
+            background: rgba(255, 255, 255, 0.96);
+            border-right: 1px solid #E0E3EC;
+        }}
+
+        /* Headings */
+        h1, h2, h3, h4, h5, h6 {{
+            color: {TEXT_MAIN} !important;
+            font-weight: 650;
+        }}
+
+        /* Buttons */
+        div.stButton > button, div.stDownloadButton > button {{
+            background: linear-gradient(135deg, {ACCENT} 0%, {ACCENT_DARK} 100%) !important;
+            color: #FFFFFF !important;
+            border-radius: 999px !important;
+            border: none;
+            padding: 0.5rem 1.3rem;
+            font-weight: 600;
+        }}
+        div.stButton > button:hover, div.stDownloadButton > button:hover {{
+            filter: brightness(1.05);
+            box-shadow: 0 8px 20px rgba(255, 90, 122, 0.35);
+        }}
+
+        /* Inputs & selects */
+        .stTextInput > div > div > input,
+        .stNumberInput input,
+        .stSelectbox > div > div > select,
+        .stTextArea textarea {{
+            border-radius: 999px !important;
+            border: 1px solid #D0D6EA !important;
+        }}
+
+        .stTextArea textarea {{
+            border-radius: 14px !important;
+        }}
+
+        /* Radio / checkbox labels */
+        .stRadio > label, .stSelectbox > label, .stTextInput > label, .stNumberInput > label {{
+            font-weight: 500;
+        }}
+
+        /* Alerts (info/success) */
+        .stAlert > div {{
+            border-radius: 16px;
+            border: none;
+        }}
+        </style>
+        """,
+        unsafe_allow_html=True,
+    )
 
 DATA_KEY = "checkin_data"
-PROFILE_KEY = "profile_data"
 SEED_KEY = "seeded_sample_data"
+DIAGNOSTICS_KEY = "rerun_traces"
+DOWNLOADS_KEY = "download_traces"
+DIAGNOSTICS_HISTORY = 50
 
 
 # ---------------------------------------------------
 # Data / session helpers
 # ---------------------------------------------------
-def init_data():
-    if DATA_KEY not in st.session_state:
-        st.session_state[DATA_KEY] = pd.DataFrame(
-            columns=[
-                # Identity / segmentation
-                "user_id",
-                "age_bracket",
-                "location_region",
-                "gender",
-                "orientation",
-                "neurotype",
-                "dating_intention",
-                # Check-in meta
-                "checkin_date",
-                "dating_feel",
-                "burnout_index",
-                "goal",
-                "friction",
-                # Behavioral data
-                "matches",
-                "conversations",
-                "dates",
-                "conversation_rate",
-                "date_rate",
-                # Date & follow-through
-                "went_on_date",
-                "want_see_again",
-                "standout_moment",
-                "nudge_arm",
-                "nudge_type",
-                "nudge_text",
-                # Qualitative
-                "burnout_note",
-                "research_tags",
-                # Derived
-                "persona_label",
-                "created_at",
-            ]
-        )
+@st.cache_resource(show_spinner=False)
+def get_shared_store(store_url: str) -> CheckinStore:
+    """
+    One check-in store per process (per store URL), shared by every
+    session. Sessions only hold a reference to it, so memory scales with
+    the data rather than with the number of open browser tabs.
+    Participant profiles live in the store's participant dimension.
+    """
+    return store_from_url(store_url)
 
 
-def get_data() -> pd.DataFrame:
-    init_data()
-    return st.session_state[DATA_KEY]
+@st.cache_resource(show_spinner=False)
+def get_aggregation_cache(store_url: str) -> AggregationCache:
+    """Dashboard aggregates for the shared store, keyed on its version."""
+    return AggregationCache()
 
 
-def save_checkin(row: Dict):
-    df = get_data()
-    st.session_state[DATA_KEY] = pd.concat(
-        [df, pd.DataFrame([row])], ignore_index=True
-    )
+def init_data():
+    if DATA_KEY not in st.session_state:
+        st.session_state[DATA_KEY] = get_shared_store(
+            os.environ.get(STORE_URL_ENV, "")
+        )
 
 
-def seed_sample_data():
-    """
-    Seed a small synthetic dataset so the researcher-facing views
-    are populated when first opened.
-    """
+def get_store() -> CheckinStore:
     init_data()
-    if st.session_state.get(SEED_KEY, False):
-        return
+    return st.session_state[DATA_KEY]
 
-    df = st.session_state[DATA_KEY]
-    if not df.empty:
-        st.session_state[SEED_KEY] = True
-        return
 
-    sample_rows = []
-    sample_users = [
-        {
-            "user_id": "MG",
-            "age_bracket": "25–29",
-            "location_region": "NYC",
-            "gender": "Woman",
-            "orientation": "Straight",
-            "neurotype": "ADHD / attention challenges",
-            "dating_intention": "Primarily looking for a long-term relationship",
-        },
-        {
-            "user_id": "RS",
-            "age_bracket": "30–34",
-            "location_region": "London",
-            "gender": "Man",
-            "orientation": "Bi / pan",
-            "neurotype": "Neurotypical (self-described)",
-            "dating_intention": "Exploring / not sure",
-        },
-        {
-            "user_id": "AJ",
-            "age_bracket": "18–24",
-            "location_region": "SF Bay Area",
-            "gender": "Non-binary",
-            "orientation": "Queer",
-            "neurotype": "Other neurodivergence",
-            "dating_intention": "Friendship / low pressure",
-        },
-    ]
-
-    goals = [
-        "Go on at least one date",
-        "Be more intentional about who I match with",
-        "Be more honest about what I want",
-        "Take a gentler, slower approach to dating",
-    ]
-    frictions = [
-        "I match but rarely move to dates",
-        "I overthink sending messages",
-        "I say yes to dates I’m not excited about",
-        "I struggle with consistent communication",
-    ]
-    standout_examples = [
-        "we laughed about our worst first dates",
-        "we talked about our favorite bad movies",
-        "we shared stories about our families",
-    ]
-
-    base_date = date.today()
-
-    for u in sample_users:
-        for offset in range(3):
-            # step back in weeks for a mini time series
-            d = base_date.replace(day=max(1, base_date.day - (7 * offset)))
-            dating_feel = choice([3, 4, 5, 6])
-            burnout_index = 8 - dating_feel
-            goal = choice(goals)
-            friction = choice(frictions)
-            matches = choice([2, 3, 5, 7])
-            conversations = choice([1, 2, 3, 4])
-            dates_count = choice([0, 1, 1, 2])
-            conversation_rate = conversations / matches if matches > 0 else 0
-            date_rate = dates_count / conversations if conversations > 0 else 0
-            went_on_date = "Yes" if dates_count > 0 else "No"
-            want_see_again = choice(["Yes", "Not sure", "No"]) if went_on_date == "Yes" else "N/A"
-            standout_moment = choice(standout_examples) if went_on_date == "Yes" else ""
-            nudge_arm = choice(["A", "B", "C"])
-            nudge_type = choice(["Scripted", "Reflective", "Planning"])
-            nudge_text = "Sample nudge text for demo purposes."
-            burnout_note = choice(
-                [
-                    "Felt a bit drained after so many small talks.",
-                    "Actually felt hopeful this week.",
-                    "Messaging back and forth is tiring but dates were good.",
-                ]
-            )
-            research_tags = "burnout, anxiety" if burnout_index >= 4 else "positive"
+def get_profiles() -> ProfileStore:
+    return get_store().participants
 
-            persona_label = generate_persona_label(
-                dating_feel=dating_feel,
-                goal=goal,
-                friction=friction,
-                neurotype=u["neurotype"],
-            )
 
-            sample_rows.append(
-                {
-                    **u,
-                    "checkin_date": d.isoformat(),
-                    "dating_feel": dating_feel,
-                    "burnout_index": burnout_index,
-                    "goal": goal,
-                    "friction": friction,
-                    "matches": matches,
-                    "conversations": conversations,
-                    "dates": dates_count,
-                    "conversation_rate": conversation_rate,
-                    "date_rate": date_rate,
-                    "went_on_date": went_on_date,
-                    "want_see_again": want_see_again,
-                    "standout_moment": standout_moment,
-                    "nudge_arm": nudge_arm,
-                    "nudge_type": nudge_type,
-                    "nudge_text": nudge_text,
-                    "burnout_note": burnout_note,
-                    "research_tags": research_tags,
-                    "persona_label": persona_label,
-                    "created_at": datetime.utcnow().isoformat(),
-                }
-            )
+def get_data() -> pd.DataFrame:
+    return get_store().frame()
 
-    if sample_rows:
-        st.session_state[DATA_KEY] = pd.concat(
-            [df, pd.DataFrame(sample_rows)], ignore_index=True
-        )
 
-    st.session_state[SEED_KEY] = True
+def save_checkin(row: Dict):
+    store = get_store()
+    store.append(row)
+    store.persist()
 
 
-# ---------------------------------------------------
-# Persona logic
-# ---------------------------------------------------
-def generate_persona_label(
-    dating_feel: int, goal: str, friction: str, neurotype: str
-) -> str:
+def render(section: str, draw, data, **kwargs):
     """
-    Simple derived persona label to help reason about
-    segments and patterns. Not meant as a production taxonomy.
+    Draw a chart or table inside a timed section, counting its rows and
+    the bytes of its Arrow payload (measured outside the section).
     """
-    neuro_tag = ""
-    if neurotype in ["ADHD / attention challenges", "Autistic / on the spectrum"]:
-        neuro_tag = "Neurodivergent "
-
-    if dating_feel <= 3:
-        mood_tag = "Burnt-Out "
-    elif dating_feel >= 6:
-        mood_tag = "Optimistic "
-    else:
-        mood_tag = "Thoughtful "
-
-    if "overthink" in friction.lower():
-        friction_tag = "Overthinking Initiator"
-    elif "rarely move to dates" in friction.lower():
-        friction_tag = "Hesitant Planner"
-    elif "consistent communication" in friction.lower():
-        friction_tag = "Inconsistent Communicator"
-    elif "not excited" in friction.lower():
-        friction_tag = "People-Pleaser Dater"
-    else:
-        friction_tag = "Exploring Dater"
+    count(ROWS_RENDERED, len(data))
+    count(BYTES_SERIALIZED, payload_bytes(data))
+    with timed(section):
+        draw(data, **kwargs)
 
-    if "gentler, slower" in goal.lower():
-        goal_tag = "Gentle "
-    elif "intentional" in goal.lower():
-        goal_tag = "Intentional "
-    else:
-        goal_tag = ""
 
-    return f"{neuro_tag}{mood_tag}{goal_tag}{friction_tag}".strip()
+def traced_download(label: str, build):
+    """
+    `build` as a download button's deferred `data` callable. Streamlit
+    runs it on a server thread, outside the rerun's trace, so it gets a
+    trace of its own whose counters (bytes serialized) `record_rerun`
+    adds to the rerun handling the click, or to the next one if the file
+    was still being built when that rerun ended.
+    """
+    finished = st.session_state.setdefault(DOWNLOADS_KEY, deque())
+
+    def run():
+        with tracing(RerunTrace(label)) as trace:
+            data = build()
+        finished.append(trace.finish())
+        return data
+
+    return run
+
+
+def paged_table(
+    section: str,
+    frame: pd.DataFrame,
+    columns: List[str],
+    key: str,
+    cache: AggregationCache,
+    version: int,
+    slice_id,
+    positions: Optional[np.ndarray] = None,
+):
+    """
+    Sortable, paginated view of `frame`: only the visible page of the
+    chosen columns is sent to the browser. Sort orders are cached per
+    store version, slice and sort column. With `positions`, only those
+    rows of `frame` (in that default order) are shown.
+    """
+    t1, t2, t3, t4, t5 = st.columns([3, 2, 1, 1, 1])
+    with t1:
+        shown = st.multiselect("Columns", columns, default=columns, key=f"{key}_columns")
+    with t2:
+        sort_by = st.selectbox("Sort by", ["(check-in date)"] + columns, key=f"{key}_sort")
+    with t3:
+        descending = st.toggle("Descending", key=f"{key}_descending")
+    with t4:
+        page_size = st.selectbox(
+            "Rows per page",
+            PAGE_SIZES,
+            index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE),
+            key=f"{key}_page_size",
+        )
+    with t5:
+        page_number = st.number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page")
+
+    sort_column = None if sort_by == "(check-in date)" else sort_by
+    order = cache.get_or_compute(
+        version,
+        ("order", slice_id, sort_column, descending),
+        lambda: (
+            sort_positions(frame, sort_column, ascending=not descending)
+            if positions is None
+            else sort_subset(frame, positions, sort_column, ascending=not descending)
+        ),
+    )
+    pages = page_count(len(order), page_size)
+    page_number = min(int(page_number), pages)
+    rows, first, last = page_slice(frame, visible_columns(columns, shown), order, page_number, page_size)
+    st.caption(f"Rows {first:,}–{last:,} of {len(order):,} (page {page_number:,} of {pages:,})")
+    render(section, st.dataframe, rows, use_container_width=True)
 
 
-# ---------------------------------------------------
-# Tagging qualitative notes
-# ---------------------------------------------------
-def tag_burnout_note(note: str) -> str:
+def record_rerun(trace: RerunTrace):
     """
-    Extremely lightweight auto-tagging to show how
-    qualitative notes could be structured for analysis.
+    Keep the finished trace for the Diagnostics view, with the counters
+    of the downloads built since the previous one.
     """
-    note_lower = note.lower()
+    downloads = st.session_state.get(DOWNLOADS_KEY)
+    while downloads:
+        trace.counters.update(downloads.popleft().counters)
+    traces = st.session_state.setdefault(DIAGNOSTICS_KEY, deque(maxlen=DIAGNOSTICS_HISTORY))
+    traces.append(trace.finish())
 
-    tags = []
-    if any(w in note_lower for w in ["tired", "exhausted", "burnt", "burned"]):
-        tags.append("burnout")
-    if any(w in note_lower for w in ["anxious", "nervous", "overwhelmed"]):
-        tags.append("anxiety")
-    if any(w in note_lower for w in ["excited", "hopeful", "optimistic"]):
-        tags.append("positive")
-    if any(w in note_lower for w in ["ghost", "ghosted"]):
-        tags.append("ghosting")
-    if any(w in note_lower for w in ["adhd", "focus", "distracted"]):
-        tags.append("attention")
-
-    return ", ".join(sorted(set(tags))) if tags else ""
 
+def seed_sample_data():
+    """
+    Seed a small synthetic dataset so the researcher-facing views
+    are populated when first opened. The store is shared across
+    sessions, so this only does work for the very first session.
+    """
+    init_data()
+    if st.session_state.get(SEED_KEY, False):
+        return
 
-# ---------------------------------------------------
-# Nudge experiment logic
-# ---------------------------------------------------
-SCRIPTED_TEMPLATES = [
-    "Hey, I had a really good time talking about **{moment}**. "
-    "Would you be up for **{suggestion}** sometime next week?",
-    "I’ve been thinking about our convo about **{moment}** — it was really fun. "
-    "Want to check out **{suggestion}** soon?",
-]
+    store = get_store()
+    with store.lock:
+        if store.empty:
+            rows = _build_sample_rows()
+            store.extend(rows)
+    st.session_state[SEED_KEY] = True
 
-REFLECTIVE_TEMPLATES = [
-    "Take 30 seconds to write down how you felt during the date, "
-    "especially around **{moment}**. That reflection can make your next step feel easier.",
-    "Before you decide what to do next, write one sentence: "
-    "“When we talked about **{moment}**, I felt…” Use that to choose your next step.",
-]
 
-PLANNING_TEMPLATES = [
-    "Pick a specific day and time you’d want to see them again, then send a message: "
-    "“Free **{suggestion}** for a round two?”",
-    "Open your calendar and block a tentative slot for a second date. "
-    "Then send a simple message suggesting that time.",
+SAMPLE_PARTICIPANTS = [
+    {
+        "user_id": "MG",
+        "age_bracket": "25–29",
+        "location_region": "NYC",
+        "gender": "Woman",
+        "orientation": "Straight",
+        "neurotype": "ADHD / attention challenges",
+        "dating_intention": "Primarily looking for a long-term relationship",
+    },
+    {
+        "user_id": "RS",
+        "age_bracket": "30–34",
+        "location_region": "London",
+        "gender": "Man",
+        "orientation": "Bi / pan",
+        "neurotype": "Neurotypical (self-described)",
+        "dating_intention": "Exploring / not sure",
+    },
+    {
+        "user_id": "AJ",
+        "age_bracket": "18–24",
+        "location_region": "SF Bay Area",
+        "gender": "Non-binary",
+        "orientation": "Queer",
+        "neurotype": "Other neurodivergence",
+        "dating_intention": "Friendship / low pressure",
+    },
 ]
 
 
-def assign_experiment_arm() -> str:
-    """Randomly assign an experiment arm (A/B/C) for nudges."""
-    return choice(["A", "B", "C"])
-
-
-def generate_nudge(
-    friction: str, want_see_again: str, standout_moment: str, experiment_arm: str
-) -> Tuple[str, str]:
+def _build_sample_rows() -> pd.DataFrame:
     """
-    Returns (nudge_type, nudge_text)
-
-    experiment_arm:
-        A -> scripted focus
-        B -> reflective focus
-        C -> planning focus
+    3 synthetic participants x 3 weekly check-ins by default. Set
+    HINGE_SEED_PARTICIPANTS (and optionally HINGE_SEED_WEEKS) to seed
+    that many random participants instead, e.g. for load testing.
     """
-    if not standout_moment:
-        standout_moment = "our conversation"
-    default_suggestion = "later this week"
-
-    if want_see_again.lower() == "no":
-        nudge_type = "Reflective (closure)"
-        text = (
-            "It’s okay not to want a second date. Take a moment to note one thing you appreciated "
-            "about the experience and one thing you’d like to look for differently next time."
-        )
-        return nudge_type, text
-
-    # Map experiment arm to primary style
-    if experiment_arm == "A":
-        primary_pool = SCRIPTED_TEMPLATES
-        primary_type = "Scripted"
-    elif experiment_arm == "B":
-        primary_pool = REFLECTIVE_TEMPLATES
-        primary_type = "Reflective"
-    else:
-        primary_pool = PLANNING_TEMPLATES
-        primary_type = "Planning"
-
-    # Adjust slightly based on declared friction
-    friction_lower = friction.lower()
-    if "overthink" in friction_lower and experiment_arm != "B":
-        primary_pool = SCRIPTED_TEMPLATES
-        primary_type = "Scripted"
-    elif "rarely move to dates" in friction_lower and experiment_arm != "C":
-        primary_pool = PLANNING_TEMPLATES
-        primary_type = "Planning"
-
-    template = choice(primary_pool)
-    text = template.format(moment=standout_moment, suggestion=default_suggestion)
-    return primary_type, text
+    participants = int(os.environ.get(SEED_PARTICIPANTS_ENV) or 0)
+    weeks = int(os.environ.get(SEED_WEEKS_ENV) or 3)
+    if participants:
+        return generate_checkins(participants, weeks)
+    return generate_checkins(weeks=weeks, profiles=pd.DataFrame(SAMPLE_PARTICIPANTS))
 
 
 # ---------------------------------------------------
@@ -465,22 +387,36 @@ with st.sidebar:
             "Research Dashboard (Hinge Labs view)",
             "Study Design Notes",
             "About This Prototype",
-        ],
+        ]
+        # Hidden view: open the app with ?diagnostics=1 to get it.
+        + (["Diagnostics"] if st.query_params.get("diagnostics") else []),
         index=1,
     )
 
+    with st.expander("Chart settings"):
+        point_budget = st.number_input(
+            "Max points per chart",
+            min_value=MIN_POINT_BUDGET,
+            max_value=MAX_POINT_BUDGET,
+            value=CHART_POINT_BUDGET,
+            step=50,
+            help="Long series and dense scatters are binned / downsampled to this many points.",
+        )
+
     st.markdown("---")
     st.caption(
         "Independent concept prototype inspired by Hinge Labs’ research themes.\n"
         "Not an official Hinge product."
     )
 
-if not user_id:
+if not user_id and page != "Diagnostics":
     st.warning("Enter a simulated participant ID to walk through the flows.")
     st.stop()
 
-init_data()
-seed_sample_data()
+rerun.label = page
+with timed("data: init + seed"):
+    init_data()
+    seed_sample_data()
 
 # Wrap all main pages in a "card" container for a focused layout
 st.markdown('<div class="page-card">', unsafe_allow_html=True)
@@ -498,7 +434,7 @@ if page == "Participant Profile (simulated)":
     )
 
     # Load existing profile if present
-    existing_profile = st.session_state.get(PROFILE_KEY, {}).get(user_id, {})
+    existing_profile = get_profiles().get(user_id)
 
     with st.form("profile_form"):
         col1, col2, col3 = st.columns(3)
@@ -506,119 +442,32 @@ if page == "Participant Profile (simulated)":
         with col1:
             age_bracket = st.selectbox(
                 "Age range",
-                [
-                    "Prefer not to say",
-                    "18–24",
-                    "25–29",
-                    "30–34",
-                    "35–39",
-                    "40+",
-                ],
-                index=(
-                    ["Prefer not to say", "18–24", "25–29", "30–34", "35–39", "40+"].index(
-                        existing_profile.get("age_bracket", "Prefer not to say")
-                    )
-                    if existing_profile
-                    else 0
-                ),
+                AGE_BRACKETS,
+                index=option_index("age_bracket", existing_profile.get("age_bracket")),
             )
             gender = st.selectbox(
                 "Gender identity (self-described)",
-                [
-                    "Prefer not to say",
-                    "Woman",
-                    "Man",
-                    "Non-binary",
-                    "Multiple / fluid",
-                    "Self-describe in notes",
-                ],
-                index=(
-                    [
-                        "Prefer not to say",
-                        "Woman",
-                        "Man",
-                        "Non-binary",
-                        "Multiple / fluid",
-                        "Self-describe in notes",
-                    ].index(existing_profile.get("gender", "Prefer not to say"))
-                    if existing_profile
-                    else 0
-                ),
+                GENDERS,
+                index=option_index("gender", existing_profile.get("gender")),
             )
 
         with col2:
             orientation = st.selectbox(
                 "Sexual orientation",
-                [
-                    "Prefer not to say",
-                    "Straight",
-                    "Gay",
-                    "Lesbian",
-                    "Bi / pan",
-                    "Queer",
-                    "Other / self-describe",
-                ],
-                index=(
-                    [
-                        "Prefer not to say",
-                        "Straight",
-                        "Gay",
-                        "Lesbian",
-                        "Bi / pan",
-                        "Queer",
-                        "Other / self-describe",
-                    ].index(existing_profile.get("orientation", "Prefer not to say"))
-                    if existing_profile
-                    else 0
-                ),
+                ORIENTATIONS,
+                index=option_index("orientation", existing_profile.get("orientation")),
             )
             neurotype = st.selectbox(
                 "Neurotype (self-identified, optional)",
-                [
-                    "Prefer not to say",
-                    "ADHD / attention challenges",
-                    "Autistic / on the spectrum",
-                    "Other neurodivergence",
-                    "Neurotypical (self-described)",
-                ],
-                index=(
-                    [
-                        "Prefer not to say",
-                        "ADHD / attention challenges",
-                        "Autistic / on the spectrum",
-                        "Other neurodivergence",
-                        "Neurotypical (self-described)",
-                    ].index(existing_profile.get("neurotype", "Prefer not to say"))
-                    if existing_profile
-                    else 0
-                ),
+                NEUROTYPES,
+                index=option_index("neurotype", existing_profile.get("neurotype")),
             )
 
         with col3:
             dating_intention = st.selectbox(
                 "Current dating intention",
-                [
-                    "Exploring / not sure",
-                    "Primarily looking for a long-term relationship",
-                    "Short-term / casual first",
-                    "Friendship / low pressure",
-                    "Taking a break but still curious",
-                ],
-                index=(
-                    [
-                        "Exploring / not sure",
-                        "Primarily looking for a long-term relationship",
-                        "Short-term / casual first",
-                        "Friendship / low pressure",
-                        "Taking a break but still curious",
-                    ].index(
-                        existing_profile.get(
-                            "dating_intention", "Exploring / not sure"
-                        )
-                    )
-                    if existing_profile
-                    else 0
-                ),
+                DATING_INTENTIONS,
+                index=option_index("dating_intention", existing_profile.get("dating_intention")),
             )
             location_region = st.text_input(
                 "Location (city or region)",
@@ -635,17 +484,18 @@ if page == "Participant Profile (simulated)":
         submitted_profile = st.form_submit_button("Save simulated profile")
 
     if submitted_profile:
-        profile_store = st.session_state.get(PROFILE_KEY, {})
-        profile_store[user_id] = {
-            "age_bracket": age_bracket,
-            "gender": gender,
-            "orientation": orientation,
-            "neurotype": neurotype,
-            "dating_intention": dating_intention,
-            "location_region": location_region,
-            "additional_notes": additional_notes,
-        }
-        st.session_state[PROFILE_KEY] = profile_store
+        get_profiles().save(
+            user_id,
+            {
+                "age_bracket": age_bracket,
+                "gender": gender,
+                "orientation": orientation,
+                "neurotype": neurotype,
+                "dating_intention": dating_intention,
+                "location_region": location_region,
+                "additional_notes": additional_notes,
+            },
+        )
 
         st.success("Profile stored. New check-ins will reference these fields.")
 
@@ -692,24 +542,12 @@ elif page == "Check-In Flow (participant view)":
         with col2:
             goal = st.selectbox(
                 "Short-term focus for the next few weeks",
-                [
-                    "Go on at least one date",
-                    "Be more intentional about who I match with",
-                    "Be more honest about what I want",
-                    "Take a gentler, slower approach to dating",
-                    "I’m not sure yet",
-                ],
+                GOALS,
             )
 
             friction = st.selectbox(
                 "Which feels most like your current friction?",
-                [
-                    "I match but rarely move to dates",
-                    "I overthink sending messages",
-                    "I say yes to dates I’m not excited about",
-                    "I struggle with consistent communication",
-                    "Something else / it changes a lot",
-                ],
+                FRICTIONS,
             )
 
         st.markdown("---")
@@ -776,7 +614,9 @@ elif page == "Check-In Flow (participant view)":
             experiment_mode = st.radio(
                 "Nudge assignment mode (for research)",
                 [
-                    "Random arm (A/B/C)",
+                    "Assigned arm (A/B/C)",
+                    "Adaptive arm (Thompson sampling)",
+                    "Adaptive arm (UCB)",
                     "Force Scripted (Arm A)",
                     "Force Reflective (Arm B)",
                     "Force Planning (Arm C)",
@@ -789,28 +629,31 @@ elif page == "Check-In Flow (participant view)":
 - Arm **A** → Scripted message suggestions  
 - Arm **B** → Reflective prompts  
 - Arm **C** → Planning / time-boxing nudges  
+- Assigned arms come from a hash of the user ID, so a participant keeps theirs every week  
+- Adaptive arms favour the arms whose participants more often want a second date at the next check-in where they rate a date  
 """
             )
 
         submitted = st.form_submit_button("Save check-in & generate nudge")
 
     if submitted:
-        # Pull profile values if stored
-        profile_store = st.session_state.get(PROFILE_KEY, {})
-        profile_for_user = profile_store.get(user_id, {})
-
-        age_bracket = profile_for_user.get("age_bracket", "Prefer not to say")
-        location_region = profile_for_user.get("location_region", "")
-        gender = profile_for_user.get("gender", "Prefer not to say")
-        orientation = profile_for_user.get("orientation", "Prefer not to say")
-        neurotype = profile_for_user.get("neurotype", "Prefer not to say")
-        dating_intention = profile_for_user.get(
-            "dating_intention", "Exploring / not sure"
-        )
+        # Pull profile values if stored (defaults otherwise)
+        profile_for_user = get_profiles().resolve(user_id)
+
+        age_bracket = profile_for_user["age_bracket"]
+        location_region = profile_for_user["location_region"]
+        gender = profile_for_user["gender"]
+        orientation = profile_for_user["orientation"]
+        neurotype = profile_for_user["neurotype"]
+        dating_intention = profile_for_user["dating_intention"]
 
         # Determine experiment arm
-        if experiment_mode == "Random arm (A/B/C)":
-            experiment_arm = assign_experiment_arm()
+        if experiment_mode == "Assigned arm (A/B/C)":
+            experiment_arm = assign_experiment_arm(user_id)
+        elif experiment_mode == "Adaptive arm (Thompson sampling)":
+            experiment_arm = assign_experiment_arm(mode="thompson", outcomes=get_store().arm_outcomes)
+        elif experiment_mode == "Adaptive arm (UCB)":
+            experiment_arm = assign_experiment_arm(mode="ucb", outcomes=get_store().arm_outcomes)
         elif experiment_mode == "Force Scripted (Arm A)":
             experiment_arm = "A"
         elif experiment_mode == "Force Reflective (Arm B)":
@@ -834,20 +677,14 @@ elif page == "Check-In Flow (participant view)":
 
         research_tags = tag_burnout_note(burnout_note)
 
-        # Generate nudge
-        if went_on_date == "Yes":
-            nudge_type, nudge_text = generate_nudge(
-                friction=friction,
-                want_see_again=want_see_again,
-                standout_moment=standout_moment,
-                experiment_arm=experiment_arm,
-            )
-        else:
-            nudge_type = "None (no date this week)"
-            nudge_text = (
-                "No date this week — that’s totally fine. "
-                "A very small commitment, like sending one message you feel good about next week, can still count as progress."
-            )
+        # Generate nudge: the template ID is stored, the text rendered from it
+        nudge_template = select_template(
+            friction=friction,
+            want_see_again=want_see_again,
+            experiment_arm=experiment_arm,
+            went_on_date=went_on_date,
+        )
+        nudge_type, nudge_text = render_nudge(nudge_template, standout_moment)
 
         row = {
             # Identity / segmentation
@@ -859,7 +696,7 @@ elif page == "Check-In Flow (participant view)":
             "neurotype": neurotype,
             "dating_intention": dating_intention,
             # Check-in meta
-            "checkin_date": checkin_date.isoformat(),
+            "checkin_date": checkin_date,
             "dating_feel": dating_feel,
             "burnout_index": burnout_index,
             "goal": goal,
@@ -876,16 +713,18 @@ elif page == "Check-In Flow (participant view)":
             "standout_moment": standout_moment,
             "nudge_arm": experiment_arm,
             "nudge_type": nudge_type,
+            "nudge_template": nudge_template,
             "nudge_text": nudge_text,
             # Qualitative
             "burnout_note": burnout_note,
             "research_tags": research_tags,
             # Derived
             "persona_label": persona_label,
-            "created_at": datetime.utcnow().isoformat(),
+            "created_at": datetime.utcnow(),
         }
 
-        save_checkin(row)
+        with timed("check-in: save"):
+            save_checkin(row)
 
         st.success("Check-in captured. Below is the assigned nudge for this participant state.")
 
@@ -908,12 +747,14 @@ elif page == "Check-In Flow (participant view)":
 elif page == "Participant Insights (participant view)":
     st.header("🔍 Participant Insights (Simulated)")
 
-    df = get_data()
-    if df.empty or user_id not in df["user_id"].unique():
+    store = get_store()
+    running = store.aggregates
+    if running.count("user_id", user_id) == 0:
         st.info("This simulated participant has no check-ins yet. Add at least one via the Check-In Flow.")
     else:
-        user_df = df[df["user_id"] == user_id].copy()
-        user_df["checkin_date_dt"] = pd.to_datetime(user_df["checkin_date"])
+        # Already in check-in date order; no parsing or sorting needed.
+        with timed("insights: timeline query"):
+            user_df = store.timeline(user_id=user_id)
 
         st.markdown(
             "This view illustrates what a **lightweight reflective surface** for the participant could look like, "
@@ -927,18 +768,17 @@ elif page == "Participant Insights (participant view)":
         with col1:
             st.metric(
                 "Avg. dating feel (this participant)",
-                f"{user_df['dating_feel'].mean():.1f} / 7",
+                f"{running.mean('dating_feel', 'user_id', user_id):.1f} / 7",
             )
         with col2:
-            global_df = df.copy()
             st.metric(
                 "Avg. dating feel (all simulated participants)",
-                f"{global_df['dating_feel'].mean():.1f} / 7",
+                f"{running.mean('dating_feel'):.1f} / 7",
             )
         with col3:
             st.metric(
                 "Total check-ins",
-                f"{len(user_df)}",
+                f"{running.count('user_id', user_id)}",
             )
 
         st.markdown("---")
@@ -948,24 +788,23 @@ elif page == "Participant Insights (participant view)":
         with col4:
             st.markdown("**Dating feel by check-in date**")
             mood_series = (
-                user_df.sort_values("checkin_date_dt")[["checkin_date_dt", "dating_feel"]]
-                .set_index("checkin_date_dt")
+                user_df[["checkin_date", "dating_feel"]]
+                .set_index("checkin_date")
             )
-            st.line_chart(mood_series)
+            render("insights: mood chart", st.line_chart, downsample(mood_series, point_budget))
 
         with col5:
             st.markdown("**Burnout index vs. number of dates**")
-            small = user_df.sort_values("checkin_date_dt")[
-                ["checkin_date_dt", "burnout_index", "dates"]
-            ].set_index("checkin_date_dt")
-            st.line_chart(small)
+            small = user_df[
+                ["checkin_date", "burnout_index", "dates"]
+            ].set_index("checkin_date")
+            render("insights: burnout chart", st.line_chart, downsample(small, point_budget))
 
         st.markdown("---")
         st.subheader("Personas & recurring frictions")
 
         persona_counts = (
-            user_df["persona_label"]
-            .value_counts()
+            running.value_counts("persona_label", "user_id", user_id)
             .rename_axis("persona")
             .reset_index(name="count")
         )
@@ -973,12 +812,14 @@ elif page == "Participant Insights (participant view)":
         col6, col7 = st.columns(2)
         with col6:
             st.markdown("**Derived persona labels (frequency)**")
-            st.dataframe(persona_counts, use_container_width=True)
+            render("insights: persona table", st.dataframe, persona_counts, use_container_width=True)
 
         with col7:
             st.markdown("**Top friction statements**")
-            st.dataframe(
-                user_df["friction"].value_counts().rename("count").to_frame(),
+            render(
+                "insights: friction table",
+                st.dataframe,
+                running.value_counts("friction", "user_id", user_id).to_frame(),
                 use_container_width=True,
             )
 
@@ -987,22 +828,22 @@ elif page == "Participant Insights (participant view)":
 
         insight_cards = []
 
-        if user_df["burnout_index"].mean() >= 4:
+        def user_mean(metric: str) -> float:
+            return running.mean(metric, "user_id", user_id)
+
+        if user_mean("burnout_index") >= 4:
             insight_cards.append(
                 "Average burnout index is relatively high. Weeks with more conversations may be depleting; "
                 "narrowing focus or introducing guardrails could be helpful."
             )
 
-        if (
-            user_df["conversation_rate"].mean() < 0.5
-            and user_df["matches"].mean() > 0
-        ):
+        if user_mean("conversation_rate") < 0.5 and user_mean("matches") > 0:
             insight_cards.append(
                 "This participant starts conversations with fewer than half of their matches. "
                 "Scripted initiator nudges might meaningfully change behavior here."
             )
 
-        if user_df["date_rate"].mean() < 0.4 and user_df["conversations"].mean() > 0:
+        if user_mean("date_rate") < 0.4 and user_mean("conversations") > 0:
             insight_cards.append(
                 "A small portion of conversations convert into dates. "
                 "Nudges that support decision-making around who to progress with could be impactful."
@@ -1010,7 +851,7 @@ elif page == "Participant Insights (participant view)":
 
         if (
             "ADHD / attention challenges"
-            in user_df["neurotype"].unique()
+            in running.value_counts("neurotype", "user_id", user_id).index
         ):
             insight_cards.append(
                 "Participant self-identifies with attention challenges. Time-bound, concrete nudges are likely "
@@ -1031,36 +872,38 @@ elif page == "Participant Insights (participant view)":
         st.subheader("Mood distribution (for this participant)")
 
         mood_hist = (
-            user_df["dating_feel"]
-            .value_counts()
+            running.value_counts("dating_feel", "user_id", user_id)
             .sort_index()
             .rename_axis("dating_feel")
             .reset_index(name="count")
         )
         if not mood_hist.empty:
-            st.bar_chart(mood_hist.set_index("dating_feel"))
+            render("insights: mood histogram", st.bar_chart, mood_hist.set_index("dating_feel"))
 
         st.markdown("---")
         st.subheader("Underlying check-in data for this participant")
 
-        st.dataframe(
-            user_df[
-                [
-                    "checkin_date",
-                    "dating_feel",
-                    "goal",
-                    "friction",
-                    "matches",
-                    "conversations",
-                    "dates",
-                    "went_on_date",
-                    "want_see_again",
-                    "nudge_type",
-                    "persona_label",
-                    "research_tags",
-                ]
+        paged_table(
+            "insights: check-in table",
+            user_df,
+            [
+                "checkin_date",
+                "dating_feel",
+                "goal",
+                "friction",
+                "matches",
+                "conversations",
+                "dates",
+                "went_on_date",
+                "want_see_again",
+                "nudge_type",
+                "persona_label",
+                "research_tags",
             ],
-            use_container_width=True,
+            key="insights_rows",
+            cache=get_aggregation_cache(os.environ.get(STORE_URL_ENV, "")),
+            version=store.version,
+            slice_id=("user_id", user_id),
         )
 
 
@@ -1070,9 +913,32 @@ elif page == "Participant Insights (participant view)":
 elif page == "Research Dashboard (Hinge Labs view)":
     st.header("📊 Research Dashboard (Concept View for Hinge Labs)")
 
-    df = get_data()
+    store = get_store()
+    agg_cache = get_aggregation_cache(os.environ.get(STORE_URL_ENV, ""))
+
+    with st.expander("Import historical check-ins (CSV, JSON Lines or Parquet)"):
+        st.caption(
+            "Rows need at least `user_id`, `checkin_date` and `dating_feel`; derived columns "
+            "(burnout index, rates, persona, tags) are recomputed. Very large files are better "
+            "loaded with `python ingest.py FILE --store URL`."
+        )
+        uploaded = st.file_uploader(
+            "Check-in file", type=["csv", "jsonl", "ndjson", "json", "parquet"]
+        )
+        if uploaded is not None and st.button("Import rows"):
+            try:
+                with st.spinner("Importing..."):
+                    report = ingest(uploaded, store)
+            # IngestError and pandas / pyarrow parse errors are all ValueErrors.
+            except ValueError as exc:
+                st.error(f"Import failed: {exc}")
+            else:
+                st.success(
+                    f"Imported {report['rows_imported']:,} of {report['rows_read']:,} rows "
+                    f"({report['rows_rejected']:,} rejected) in {report['seconds']:.1f}s."
+                )
 
-    if df.empty:
+    if store.empty:
         st.info("No check-ins recorded in this session. The seeding function can be extended for richer demo data.")
     else:
         st.markdown(
@@ -1083,36 +949,40 @@ elif page == "Research Dashboard (Hinge Labs view)":
         # Filters
         st.subheader("Filters (by simulated segmentation)")
 
+        with timed("dashboard: filter options"):
+            options = dashboard_options(agg_cache, store)
+
         colf1, colf2, colf3 = st.columns(3)
         with colf1:
-            users = sorted(df["user_id"].unique())
             filter_user = st.selectbox(
                 "Participant filter",
-                options=["All participants"] + users,
+                options=["All participants"] + options["user_id"],
             )
         with colf2:
             neuro_filter = st.selectbox(
                 "Neurotype filter",
-                options=["All neurotypes"] + sorted(df["neurotype"].unique()),
+                options=["All neurotypes"] + options["neurotype"],
             )
         with colf3:
             intention_filter = st.selectbox(
                 "Dating intention filter",
-                options=["All intentions"] + sorted(df["dating_intention"].unique()),
+                options=["All intentions"] + options["dating_intention"],
             )
 
-        filtered = df.copy()
-        if filter_user != "All participants":
-            filtered = filtered[filtered["user_id"] == filter_user]
-        if neuro_filter != "All neurotypes":
-            filtered = filtered[filtered["neurotype"] == neuro_filter]
-        if intention_filter != "All intentions":
-            filtered = filtered[filtered["dating_intention"] == intention_filter]
+        key = slice_key(
+            user_id=None if filter_user == "All participants" else filter_user,
+            neurotype=None if neuro_filter == "All neurotypes" else neuro_filter,
+            dating_intention=(
+                None if intention_filter == "All intentions" else intention_filter
+            ),
+        )
+        with timed("dashboard: filter + aggregate"):
+            summary = dashboard_slice(agg_cache, store, key)
 
-        if filtered.empty:
+        if summary is None:
             st.warning("No data matches the current filter selection.")
         else:
-            filtered["checkin_date_dt"] = pd.to_datetime(filtered["checkin_date"])
+            rows, positions = summary["rows"], summary["positions"]
 
             st.markdown("---")
             st.subheader("Study-level metrics (for current filters)")
@@ -1121,58 +991,82 @@ elif page == "Research Dashboard (Hinge Labs view)":
             with c1:
                 st.metric(
                     "Unique participants",
-                    f"{filtered['user_id'].nunique()}",
+                    f"{summary['unique_participants']}",
                 )
             with c2:
                 st.metric(
                     "Total check-ins",
-                    f"{len(filtered)}",
+                    f"{summary['total_checkins']}",
                 )
             with c3:
                 st.metric(
                     "Avg. dating feel",
-                    f"{filtered['dating_feel'].mean():.1f} / 7",
+                    f"{summary['avg_dating_feel']:.1f} / 7",
                 )
             with c4:
                 st.metric(
                     "Avg. burnout index",
-                    f"{filtered['burnout_index'].mean():.1f}",
+                    f"{summary['avg_burnout_index']:.1f}",
                 )
 
             st.markdown("---")
             colg1, colg2 = st.columns(2)
 
             with colg1:
-                st.markdown("**Dating feel over time (filtered)**")
-                mood_series = (
-                    filtered.sort_values("checkin_date_dt")[
-                        ["checkin_date_dt", "dating_feel"]
-                    ]
-                    .set_index("checkin_date_dt")
+                st.markdown("**Dating feel over time (weekly mean, filtered)**")
+                render(
+                    "dashboard: mood chart",
+                    st.line_chart,
+                    downsample(summary["mood_series"], point_budget),
                 )
-                st.line_chart(mood_series)
 
             with colg2:
                 st.markdown("**Nudge styles delivered (for this slice)**")
-                nudge_counts = (
-                    filtered["nudge_type"]
-                    .value_counts()
-                    .rename_axis("nudge_type")
-                    .reset_index(name="count")
-                )
+                nudge_counts = summary["nudge_counts"]
                 if not nudge_counts.empty:
-                    st.bar_chart(
-                        nudge_counts.set_index("nudge_type")
+                    render(
+                        "dashboard: nudge chart",
+                        st.bar_chart,
+                        nudge_counts.set_index("nudge_type"),
                     )
                 else:
                     st.caption("No nudges recorded yet for the current filters.")
 
+            st.markdown("---")
+            st.subheader("Experiment arms (A/B/C)")
+
+            with timed("dashboard: arm effects"):
+                effects = arm_effects(agg_cache, store, key)
+            st.caption(
+                f"Effects are vs. arm {REFERENCE_ARM}, with {RESAMPLES:,} bootstrap resamples for the "
+                "95% intervals and as many label permutations for the two-sided p-values."
+            )
+            render(
+                "dashboard: arm effects table",
+                st.dataframe,
+                effects,
+                use_container_width=True,
+                hide_index=True,
+            )
+
             st.markdown("---")
             st.subheader("Behavior vs. burnout (toy scatter)")
 
-            if not filtered.empty:
-                scatter_df = filtered[["conversations", "burnout_index"]]
-                st.scatter_chart(scatter_df)
+            if summary["total_checkins"]:
+                scatter_df = agg_cache.get_or_compute(
+                    store.version,
+                    ("scatter", key, point_budget),
+                    lambda: binned_scatter(rows(), "conversations", "burnout_index", point_budget),
+                )
+                st.caption("Point size = number of check-ins at that spot.")
+                render(
+                    "dashboard: scatter chart",
+                    st.scatter_chart,
+                    scatter_df,
+                    x="conversations",
+                    y="burnout_index",
+                    size="count",
+                )
 
             st.markdown("---")
             st.subheader("Goals, frictions & derived personas")
@@ -1180,78 +1074,85 @@ elif page == "Research Dashboard (Hinge Labs view)":
             colg3, colg4, colg5 = st.columns(3)
             with colg3:
                 st.markdown("**Top goals**")
-                st.dataframe(
-                    filtered["goal"].value_counts().rename("count").to_frame(),
+                render(
+                    "dashboard: goal table",
+                    st.dataframe,
+                    summary["goal_counts"],
                     use_container_width=True,
                 )
             with colg4:
                 st.markdown("**Top friction statements**")
-                st.dataframe(
-                    filtered["friction"].value_counts().rename("count").to_frame(),
+                render(
+                    "dashboard: friction table",
+                    st.dataframe,
+                    summary["friction_counts"],
                     use_container_width=True,
                 )
             with colg5:
                 st.markdown("**Top derived persona labels**")
-                st.dataframe(
-                    filtered["persona_label"]
-                    .value_counts()
-                    .rename("count")
-                    .to_frame(),
+                render(
+                    "dashboard: persona table",
+                    st.dataframe,
+                    summary["persona_counts"],
                     use_container_width=True,
                 )
 
             st.markdown("---")
             st.subheader("Qualitative themes (auto-tagged, illustrative only)")
 
-            tag_counts = (
-                filtered["research_tags"]
-                .dropna()
-                .astype(str)
-                .str.split(",")
-                .explode()
-            )
-            tag_counts = tag_counts.str.strip()
-            tag_counts = tag_counts[tag_counts != ""]
-            if not tag_counts.empty:
-                tag_counts = tag_counts.value_counts().rename("count").to_frame()
-                st.dataframe(tag_counts, use_container_width=True)
+            tag_counts = summary["tag_counts"]
+            if tag_counts is not None:
+                render("dashboard: tag table", st.dataframe, tag_counts, use_container_width=True)
             else:
                 st.caption("No auto-tagged qualitative themes in this slice yet.")
 
             st.markdown("---")
             st.subheader("Underlying check-in rows (exportable)")
 
-            st.dataframe(
-                filtered[
-                    [
-                        "user_id",
-                        "checkin_date",
-                        "dating_feel",
-                        "burnout_index",
-                        "goal",
-                        "friction",
-                        "matches",
-                        "conversations",
-                        "dates",
-                        "conversation_rate",
-                        "date_rate",
-                        "went_on_date",
-                        "want_see_again",
-                        "nudge_arm",
-                        "nudge_type",
-                        "persona_label",
-                        "research_tags",
-                    ]
+            paged_table(
+                "dashboard: check-in table",
+                rows() if positions is None else store.frame(),
+                [
+                    "user_id",
+                    "checkin_date",
+                    "dating_feel",
+                    "burnout_index",
+                    "goal",
+                    "friction",
+                    "matches",
+                    "conversations",
+                    "dates",
+                    "conversation_rate",
+                    "date_rate",
+                    "went_on_date",
+                    "want_see_again",
+                    "nudge_arm",
+                    "nudge_type",
+                    "persona_label",
+                    "research_tags",
                 ],
-                use_container_width=True,
+                key="dashboard_rows",
+                cache=agg_cache,
+                version=store.version,
+                slice_id=key,
+                positions=None if positions is None else positions(),
             )
 
-            csv = filtered.to_csv(index=False).encode("utf-8")
+            export_format = st.selectbox(
+                "Export format",
+                list(EXPORT_FORMATS),
+                help="Compressed and columnar formats are much smaller for large slices.",
+            )
+            extension, mime = EXPORT_FORMATS[export_format]
+            # Passing a callable defers building the file until the button is
+            # actually clicked, instead of on every dashboard rerun.
             st.download_button(
-                "Download current slice as CSV (concept)",
-                data=csv,
-                file_name="hinge_labs_concept_checkins.csv",
-                mime="text/csv",
+                f"Download current slice as {export_format} (concept)",
+                data=traced_download(
+                    f"download: {export_format}", lambda: export_bytes(rows(), export_format)
+                ),
+                file_name=f"hinge_labs_concept_checkins.{extension}",
+                mime=mime,
             )
 
 
@@ -1361,9 +1262,63 @@ Implementation details:
 
 - Built in Streamlit for speed of iteration and ease of sharing  
 - All data in this demo is **ephemeral in-memory** and/or **synthetic**, purely for illustration  
+  (set `HINGE_CHECKIN_STORE=sqlite:///checkins.db` or `parquet://checkins` to keep check-ins on disk)  
 - Nothing here is connected to real Hinge data or real users  
 """
     )
 
+
+# ---------------------------------------------------
+# Page: Diagnostics (hidden, ?diagnostics=1)
+# ---------------------------------------------------
+elif page == "Diagnostics":
+    st.header("🩺 Diagnostics (rerun timings)")
+
+    # The trace of the current rerun is still open; show earlier ones,
+    # leaving out reruns of this page itself.
+    traces = [t for t in st.session_state.get(DIAGNOSTICS_KEY, []) if t.label != "Diagnostics"]
+    if not traces:
+        st.info("No reruns recorded yet in this session. Use the other views, then come back here.")
+    else:
+        last = traces[-1]
+        st.markdown(f"Last rerun: **{last.label}** at {last.started_at:%H:%M:%S} UTC")
+
+        d1, d2, d3, d4, d5 = st.columns(5)
+        with d1:
+            st.metric("Rerun time", f"{last.seconds * 1000:.0f} ms")
+        with d2:
+            st.metric("Not in a section", f"{last.unattributed() * 1000:.0f} ms")
+        with d3:
+            st.metric("Rows scanned", f"{last.counters[ROWS_SCANNED]:,}")
+        with d4:
+            st.metric("Rows rendered", f"{last.counters[ROWS_RENDERED]:,}")
+        with d5:
+            st.metric("Bytes serialized", f"{last.counters[BYTES_SERIALIZED]:,}")
+
+        st.subheader("Sections (last rerun)")
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {"section": "  " * s["depth"] + s["name"], "ms": (s["seconds"] or 0.0) * 1000}
+                    for s in last.sections
+                ]
+            ),
+            use_container_width=True,
+        )
+
+        st.subheader(f"Sections across the last {len(traces)} reruns")
+        st.dataframe(pd.DataFrame(summarize(traces)), use_container_width=True)
+
+        st.download_button(
+            "Download rerun traces as JSON",
+            data=to_json(traces),
+            file_name="rerun_traces.json",
+            mime="application/json",
+        )
+        if st.button("Clear recorded reruns"):
+            st.session_state[DIAGNOSTICS_KEY].clear()
+
 # Close the page card wrapper
 st.markdown('</div>', unsafe_allow_html=True)
+
+record_rerun(rerun)
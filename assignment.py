@@ -0,0 +1,188 @@
+"""
+Deterministic experiment assignment.
+
+A participant's arm is a pure function of (user_id, experiment_id,
+salt): the user ID is hashed (SipHash-2-4, keyed by the experiment ID and
+salt) into one of BUCKETS buckets, and buckets are split between the
+arms in proportion to their weights. The same participant therefore
+always lands in the same arm, any assignment can be recomputed offline
+from the user IDs alone, and experiments with different IDs or salts are
+independent of each other.
+
+A fraction of the buckets can be held out of an experiment, and an
+`AssignmentService` can hold a share of all participants out of every
+experiment it runs (a global holdout, hashed with its own salt).
+Held-out participants get no arm (None).
+
+`Experiment.assign_batch` hashes a whole column at once with
+`pandas.util.hash_array` (only the distinct values of a categorical),
+for backfills and offline analysis.
+"""
+import hashlib
+import threading
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from schema import NUDGE_ARMS
+
+BUCKETS = 10_000
+
+NUDGE_EXPERIMENT_ID = "nudge_style"
+GLOBAL_HOLDOUT_SALT = "global-holdout"
+
+
+def _hash_key(*parts: str) -> str:
+    """The 16-character SipHash key for an experiment ID and salt."""
+    return hashlib.blake2b(":".join(parts).encode("utf8"), digest_size=8).hexdigest()
+
+
+def hash_buckets(user_ids, key: str) -> np.ndarray:
+    """Bucket (0 .. BUCKETS - 1) of every user ID, under hash `key`."""
+    values = pd.Series(user_ids)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Hash each distinct ID once, then broadcast by code.
+        categories = values.cat.categories.astype(str).to_numpy(dtype=object)
+        table = np.append(_buckets(categories, key), -1)
+        return table[values.cat.codes.to_numpy()]
+    # Non-string IDs hash as their str().
+    buckets = _buckets(values.to_numpy(dtype=object), key)
+    buckets[values.isna().to_numpy()] = -1
+    return buckets
+
+
+def _buckets(ids: np.ndarray, key: str) -> np.ndarray:
+    hashed = pd.util.hash_array(ids, hash_key=key, categorize=False)
+    return (hashed % np.uint64(BUCKETS)).astype(np.int64)
+
+
+def _bucket(user_id, key: str) -> np.ndarray:
+    """`hash_buckets` for one ID, without building a Series."""
+    return _buckets(np.array([str(user_id)], dtype=object), key)
+
+
+class Experiment:
+    """
+    One experiment's assignment rule.
+
+    arms, weights:
+        Arm labels and their relative traffic weights (default: equal).
+    salt:
+        Changing the salt reshuffles every participant; keep it fixed for
+        the life of the experiment.
+    holdout:
+        Share of participants (0 .. 1) kept out of the experiment.
+    """
+
+    def __init__(
+        self,
+        experiment_id: str,
+        arms: Sequence[str],
+        weights: Optional[Sequence[float]] = None,
+        salt: str = "",
+        holdout: float = 0.0,
+    ):
+        if not arms:
+            raise ValueError(f"{experiment_id}: an experiment needs at least one arm")
+        weights = np.ones(len(arms)) if weights is None else np.asarray(weights, dtype=float)
+        if len(weights) != len(arms):
+            raise ValueError(f"{experiment_id}: expected {len(arms)} weights, got {len(weights)}")
+        if (weights < 0).any() or not weights.sum():
+            raise ValueError(f"{experiment_id}: weights must be non-negative and not all zero")
+        if not 0.0 <= holdout < 1.0:
+            raise ValueError(f"{experiment_id}: holdout must be in [0, 1)")
+
+        self.experiment_id = experiment_id
+        self.arms = list(arms)
+        self.weights = weights / weights.sum()
+        self.salt = salt
+        self.holdout = holdout
+        self.key = _hash_key(experiment_id, salt)
+        # Buckets below `held_out` are the holdout; the rest are split
+        # between the arms, arm i ending (exclusive) at `bounds[i]`.
+        self.held_out = int(round(holdout * BUCKETS))
+        in_play = BUCKETS - self.held_out
+        self.bounds = self.held_out + np.rint(np.cumsum(self.weights) * in_play).astype(np.int64)
+        self.bounds[-1] = BUCKETS
+
+    def __repr__(self) -> str:
+        return f"Experiment({self.experiment_id!r}, arms={self.arms!r})"
+
+    def arm_codes(self, buckets: np.ndarray) -> np.ndarray:
+        """Arm index of every bucket; -1 for the holdout and missing IDs."""
+        codes = np.searchsorted(self.bounds, buckets, side="right")
+        return np.where((buckets < self.held_out) | (buckets < 0), -1, codes)
+
+    def assign(self, user_id: str) -> Optional[str]:
+        """The participant's arm, or None if they are held out."""
+        code = int(self.arm_codes(_bucket(user_id, self.key))[0])
+        return self.arms[code] if code >= 0 else None
+
+    def assign_batch(self, user_ids) -> pd.Categorical:
+        """`assign` for a whole column of user IDs, as a Categorical over the arms."""
+        return pd.Categorical.from_codes(
+            self.arm_codes(hash_buckets(user_ids, self.key)), categories=self.arms
+        )
+
+
+class AssignmentService:
+    """
+    Registry of concurrent experiments with an optional global holdout:
+    a `holdout` share of all participants, chosen independently of any
+    experiment, gets no arm in any of them. Safe to share between
+    Streamlit sessions.
+    """
+
+    def __init__(
+        self,
+        experiments: Iterable[Experiment] = (),
+        holdout: float = 0.0,
+        holdout_salt: str = GLOBAL_HOLDOUT_SALT,
+    ):
+        self.lock = threading.Lock()
+        self.experiments: Dict[str, Experiment] = {}
+        self.holdout: Optional[Experiment] = None
+        if holdout:
+            self.holdout = Experiment("holdout", ["out", "in"], [holdout, 1.0 - holdout], holdout_salt)
+        for experiment in experiments:
+            self.register(experiment)
+
+    def register(self, experiment: Experiment):
+        with self.lock:
+            if experiment.experiment_id in self.experiments:
+                raise ValueError(f"Experiment already registered: {experiment.experiment_id!r}")
+            self.experiments[experiment.experiment_id] = experiment
+
+    def held_out(self, user_ids) -> np.ndarray:
+        """True for every user ID in the global holdout."""
+        if self.holdout is None:
+            return np.zeros(len(user_ids), dtype=bool)
+        return self.holdout.arm_codes(hash_buckets(user_ids, self.holdout.key)) == 0
+
+    def assign(self, experiment_id: str, user_id: str) -> Optional[str]:
+        """The participant's arm in one experiment, or None if held out."""
+        holdout = self.holdout
+        if holdout is not None and holdout.arm_codes(_bucket(user_id, holdout.key))[0] == 0:
+            return None
+        return self.experiments[experiment_id].assign(user_id)
+
+    def assign_batch(self, experiment_id: str, user_ids) -> pd.Categorical:
+        """`assign` for a whole column of user IDs."""
+        experiment = self.experiments[experiment_id]
+        codes = experiment.arm_codes(hash_buckets(user_ids, experiment.key))
+        codes[self.held_out(user_ids)] = -1
+        return pd.Categorical.from_codes(codes, categories=experiment.arms)
+
+    def assignments(self, user_ids) -> pd.DataFrame:
+        """Every participant's arm in every registered experiment, one column each."""
+        index = pd.Index(pd.Series(user_ids).astype(str), name="user_id")
+        return pd.DataFrame(
+            {eid: self.assign_batch(eid, user_ids) for eid in self.experiments}, index=index
+        )
+
+
+# The nudge-style experiment behind `nudges.assign_experiment_arm`. It
+# has no holdout: every participant gets an arm.
+NUDGE_EXPERIMENT = Experiment(NUDGE_EXPERIMENT_ID, NUDGE_ARMS)
+DEFAULT_SERVICE = AssignmentService([NUDGE_EXPERIMENT])
@@ -0,0 +1,152 @@
+"""
+Adaptive allocation of the nudge arms.
+
+Instead of the fixed hash assignment, `nudges.assign_experiment_arm` can
+pick an arm with a multi-armed bandit policy that shifts traffic toward
+the arms whose participants more often want a second date (the
+"conversion" outcome of `arm_effects`):
+
+thompson:
+    Draw a conversion rate for every arm from its Beta posterior
+    (uniform prior) and take the best draw.
+ucb:
+    UCB1: take the arm with the highest mean plus exploration bonus,
+    trying every arm at least once.
+
+A nudge is shown after its check-in has been submitted, so that check-in's
+own `want_see_again` answer predates it. An arm is instead rewarded by
+the first outcome recorded after the nudge: the answer of the
+participant's next answered check-in ("Yes", "Not sure" or "No"). A
+check-in without a date to rate ("N/A") leaves the nudges before it
+waiting, so several nudges can share one outcome. `ArmOutcomes` keeps
+those delayed rewards and the check-in store updates it on every write,
+so a decision costs O(arms) regardless of table size. Unlike hash
+assignment, an adaptive arm is not fixed per participant.
+"""
+import math
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from arm_effects import ANSWERED
+from schema import NUDGE_ARMS
+
+ALLOCATION_MODES = ("hash", "thompson", "ucb")
+
+
+ARM_CODES: Dict[str, int] = {arm: i for i, arm in enumerate(NUDGE_ARMS)}
+
+
+class ArmOutcomes:
+    """
+    Per-arm bandit rewards, credited when the outcome arrives.
+
+    `successes` / `trials` (in NUDGE_ARMS order) count, for each nudge
+    shown with that arm, the first answered second-date question ("Yes"
+    is a success) at a later check-in of the same participant. "Later" is
+    the order in which a participant's check-ins are stored. `pending`
+    holds, per participant, how many of each arm's nudges are still
+    waiting for that answer.
+    """
+
+    def __init__(self):
+        self.successes = np.zeros(len(NUDGE_ARMS), dtype=np.int64)
+        self.trials = np.zeros(len(NUDGE_ARMS), dtype=np.int64)
+        self.pending: Dict[str, np.ndarray] = {}
+
+    def _credit(self, user_id: str, answer: int):
+        """Reward `user_id`'s pending nudges with an ANSWERED code."""
+        waiting = self.pending.pop(user_id, None)
+        if waiting is not None:
+            self.trials += waiting
+            if answer == 0:
+                self.successes += waiting
+
+    def _wait(self, user_id: str, nudges: np.ndarray):
+        """Add per-arm `nudges` to those `user_id` has waiting."""
+        if user_id in self.pending:
+            self.pending[user_id] += nudges
+        else:
+            self.pending[user_id] = nudges
+
+    def update(self, row: Dict):
+        """Fold in one check-in: reward the nudges before it, then wait on its own."""
+        user_id = row.get("user_id")
+        if user_id is None or pd.isna(user_id):
+            return
+        answer = row.get("want_see_again")
+        if answer in ANSWERED:
+            self._credit(user_id, ANSWERED.index(answer))
+        arm = ARM_CODES.get(row.get("nudge_arm"), -1)
+        if arm >= 0:
+            self._wait(user_id, np.eye(len(NUDGE_ARMS), dtype=np.int64)[arm])
+
+    def update_frame(self, frame: pd.DataFrame):
+        """Vectorized equivalent of calling `update` for every row, in order."""
+        users, names = pd.factorize(frame["user_id"])
+        names = names.tolist()
+        arms = pd.Categorical(frame["nudge_arm"], categories=NUDGE_ARMS).codes.astype(np.int64)
+        answers = pd.Categorical(frame["want_see_again"], categories=ANSWERED).codes
+        stored = np.flatnonzero(users >= 0)
+        # Each participant's rows together, in stored order.
+        order = stored[np.argsort(users[stored], kind="stable")]
+        users, arms, answers = users[order], arms[order], answers[order]
+        rows = len(users)
+        if not rows:
+            return
+
+        # First answered row at or after each row (`rows` if none), and
+        # strictly after it; it only counts within the same participant.
+        answered_at = np.minimum.accumulate(np.where(answers >= 0, np.arange(rows), rows)[::-1])[::-1]
+        after = np.append(answered_at[1:], rows)
+        same_user = np.append(users, -1)
+
+        # Nudges pending from earlier writes take the participant's first answer here.
+        if self.pending:
+            starts = np.flatnonzero(np.diff(users, prepend=-1))
+            for start, at in zip(starts.tolist(), answered_at[starts].tolist()):
+                user_id = names[users[start]]
+                if user_id in self.pending and same_user[at] == users[start]:
+                    self._credit(user_id, int(answers[at]))
+
+        nudged = arms >= 0
+        credited = nudged & (same_user[after] == users)
+        outcome = answers[np.minimum(after, rows - 1)]
+        self.trials += np.bincount(arms[credited], minlength=len(NUDGE_ARMS))
+        self.successes += np.bincount(arms[credited & (outcome == 0)], minlength=len(NUDGE_ARMS))
+
+        waiting = nudged & ~credited
+        waiting_users, slots = np.unique(users[waiting], return_inverse=True)
+        nudges = np.zeros((len(waiting_users), len(NUDGE_ARMS)), dtype=np.int64)
+        np.add.at(nudges, (slots, arms[waiting]), 1)
+        for user, counts in zip(waiting_users.tolist(), nudges):
+            self._wait(names[user], counts)
+
+
+def thompson_arm(successes: np.ndarray, trials: np.ndarray, rng: np.random.Generator) -> int:
+    """Index of the arm with the highest Beta(1 + s, 1 + f) draw."""
+    draws = rng.beta(1 + successes, 1 + trials - successes)
+    return int(np.argmax(draws))
+
+
+def ucb_arm(successes: np.ndarray, trials: np.ndarray, rng: np.random.Generator) -> int:
+    """UCB1 arm index; untried arms come first, in random order."""
+    untried = np.flatnonzero(trials == 0)
+    if len(untried):
+        return int(rng.choice(untried))
+    bonus = np.sqrt(2 * math.log(trials.sum()) / trials)
+    return int(np.argmax(successes / trials + bonus))
+
+
+POLICIES = {"thompson": thompson_arm, "ucb": ucb_arm}
+
+
+def adaptive_arm(
+    outcomes: ArmOutcomes, mode: str = "thompson", rng: Optional[np.random.Generator] = None
+) -> str:
+    """An arm chosen by the `mode` policy from the store's `arm_outcomes`."""
+    if mode not in POLICIES:
+        raise ValueError(f"Unknown adaptive allocation mode: {mode!r}")
+    policy = POLICIES[mode]
+    return NUDGE_ARMS[policy(outcomes.successes, outcomes.trials, rng or np.random.default_rng())]
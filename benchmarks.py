@@ -0,0 +1,508 @@
+"""
+Headless benchmark suite for the app's hot paths.
+
+Each benchmark builds a synthetic check-in table of a given size, then
+times one path (best of several repeats) and, in a separate pass under
+tracemalloc, records its peak Python/NumPy allocation. Results can be
+saved as a baseline and later compared against it; the run exits
+non-zero if any path got slower or hungrier than the allowed tolerance.
+
+    python benchmarks.py                              # 10^2 .. 10^5 rows
+    python benchmarks.py --sizes 1e2,1e4,1e6 --only dashboard_filter
+    python benchmarks.py --save-baseline              # writes bench_baseline.json
+    python benchmarks.py --compare                    # fails on regressions
+    python benchmarks.py --check                      # correctness checks only
+
+Baselines are machine-specific: save one on the box that runs --compare.
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from aggregations import AggregationCache, dashboard_slice, slice_key
+from arm_effects import analyze_arms
+from assignment import NUDGE_EXPERIMENT
+from bandits import adaptive_arm
+from checkin_store import CheckinStore
+from export import EXPORT_FORMATS, export_bytes, export_file
+from nudges import generate_nudge, render_nudges, select_templates
+from personas import generate_persona_label, label_personas
+from synthetic import generate_checkins
+from tagging import DEFAULT_TAGGER, NoteTagger, tag_burnout_note
+
+DEFAULT_SIZES = [10**2, 10**3, 10**4, 10**5]
+DEFAULT_BASELINE = "bench_baseline.json"
+WEEKS = 10
+APPENDS = 100
+
+# A benchmark takes a check-in table and returns the callable to time.
+Benchmark = Callable[[pd.DataFrame], Callable[[], object]]
+
+
+def _dataset(rows: int) -> pd.DataFrame:
+    participants = max(1, -(-rows // WEEKS))
+    return generate_checkins(participants, WEEKS, seed=0).iloc[:rows].reset_index(drop=True)
+
+
+def _store(frame: pd.DataFrame) -> CheckinStore:
+    store = CheckinStore()
+    store.extend(frame)
+    store.frame()
+    return store
+
+
+def bench_save_checkin(frame):
+    """APPENDS check-ins appended and persisted into a store of len(frame) rows."""
+    store = _store(frame)
+    rows = frame.iloc[:APPENDS].to_dict("records")
+
+    def run():
+        for row in rows:
+            store.append(row)
+            store.persist()
+
+    return run
+
+
+def bench_dashboard_filter(frame):
+    """Cold dashboard slices: everyone, one segment, two segments, one participant."""
+    store = _store(frame)
+    keys = [
+        slice_key(),
+        slice_key(neurotype=frame["neurotype"].iloc[0]),
+        slice_key(
+            neurotype=frame["neurotype"].iloc[0],
+            dating_intention=frame["dating_intention"].iloc[0],
+        ),
+        slice_key(user_id=frame["user_id"].iloc[0]),
+    ]
+
+    def run():
+        cache = AggregationCache()
+        for key in keys:
+            dashboard_slice(cache, store, key)
+
+    return run
+
+
+def bench_persona_label(frame):
+    """generate_persona_label once per row, as the check-in flow calls it."""
+    rows = list(zip(frame["dating_feel"], frame["goal"], frame["friction"], frame["neurotype"]))
+
+    def run():
+        for feel, goal, friction, neurotype in rows:
+            generate_persona_label(int(feel), goal, friction, neurotype)
+
+    return run
+
+
+def bench_persona_label_batch(frame):
+    return lambda: label_personas(frame)
+
+
+def bench_tag_note(frame):
+    """tag_burnout_note once per row."""
+    notes = frame["burnout_note"].tolist()
+
+    def run():
+        for note in notes:
+            tag_burnout_note(note)
+
+    return run
+
+
+def bench_tag_note_batch(frame):
+    return lambda: DEFAULT_TAGGER.tag_series(frame["burnout_note"])
+
+
+def bench_generate_nudge(frame):
+    """generate_nudge once per row that had a date."""
+    dated = frame[frame["went_on_date"] == "Yes"]
+    rows = list(
+        zip(dated["friction"], dated["want_see_again"], dated["standout_moment"], dated["nudge_arm"])
+    )
+
+    def run():
+        for friction, want_see_again, moment, arm in rows:
+            generate_nudge(friction, want_see_again, moment, arm)
+
+    return run
+
+
+def bench_generate_nudge_batch(frame):
+    def run():
+        templates = select_templates(
+            frame["friction"], frame["want_see_again"], frame["nudge_arm"], frame["went_on_date"], seed=0
+        )
+        render_nudges(templates, frame["standout_moment"])
+
+    return run
+
+
+def bench_assign_arm(frame):
+    """Hash assignment once per row, as the check-in flow calls it."""
+    user_ids = frame["user_id"].astype(str).tolist()
+
+    def run():
+        for user_id in user_ids:
+            NUDGE_EXPERIMENT.assign(user_id)
+
+    return run
+
+
+def bench_assign_arm_batch(frame):
+    user_ids = frame["user_id"].astype(str)
+    return lambda: NUDGE_EXPERIMENT.assign_batch(user_ids)
+
+
+def bench_adaptive_arm(frame):
+    """APPENDS Thompson-sampling arm choices against a store of len(frame) rows."""
+    outcomes = _store(frame).arm_outcomes
+
+    def run():
+        for _ in range(APPENDS):
+            adaptive_arm(outcomes, "thompson")
+
+    return run
+
+
+def bench_arm_effects(frame):
+    """Uncached arm analysis (bootstrap + permutation tests) over the table."""
+    return lambda: analyze_arms(frame)
+
+
+def bench_export_csv(frame):
+    def run():
+        export_file(frame, "CSV").close()
+
+    return run
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "save_checkin": bench_save_checkin,
+    "dashboard_filter": bench_dashboard_filter,
+    "persona_label": bench_persona_label,
+    "persona_label_batch": bench_persona_label_batch,
+    "tag_note": bench_tag_note,
+    "tag_note_batch": bench_tag_note_batch,
+    "generate_nudge": bench_generate_nudge,
+    "generate_nudge_batch": bench_generate_nudge_batch,
+    "assign_arm": bench_assign_arm,
+    "assign_arm_batch": bench_assign_arm_batch,
+    "adaptive_arm": bench_adaptive_arm,
+    "arm_effects": bench_arm_effects,
+    "export_csv": bench_export_csv,
+}
+
+
+# Correctness checks of the benchmarked paths (`--check`); each raises
+# AssertionError on failure.
+def check_export_download():
+    """Every export format survives the download button's deferred conversion."""
+    import gzip
+    import io
+
+    from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+    frame = _dataset(200)
+    for fmt in EXPORT_FORMATS:
+        data, _ = convert_data_to_bytes_and_infer_mime(
+            export_bytes(frame, fmt), unsupported_error=AssertionError(f"{fmt}: unsupported type")
+        )
+        if fmt.startswith("CSV"):
+            text = gzip.decompress(data) if fmt == "CSV (gzip)" else data
+            assert len(pd.read_csv(io.BytesIO(text))) == len(frame), fmt
+        else:
+            assert data, fmt
+
+
+def check_overlapping_tags():
+    """Keywords of different tags that start at the same position all count."""
+    cases = [
+        ({"stress": ["burn"], "burnout": ["burnout"]}, "total burnout", "burnout, stress"),
+        ({"a": ["date"], "b": ["dates"]}, "two dates", "a, b"),
+        ({"a": ["date"], "b": ["dates"]}, "no date", "a"),
+    ]
+    for lexicon, note, expected in cases:
+        tagger = NoteTagger(lexicon)
+        assert tagger.tag(note) == expected, (lexicon, note, tagger.tag(note))
+        batch = tagger.tag_series(pd.Series([note]))
+        assert batch.iloc[0] == expected, (lexicon, note, batch.iloc[0])
+
+
+def check_categorical_append():
+    """Categorical columns (the rendered nudge text too) survive appends."""
+    frame = _dataset(200)
+    store = CheckinStore()
+    store.extend(frame.iloc[:150])
+    store.frame()
+    for _, row in frame.iloc[150:].iterrows():
+        store.append(row.to_dict())
+    out = store.frame()
+    assert len(out) == len(frame)
+    for col in out.columns:
+        if isinstance(frame[col].dtype, pd.CategoricalDtype) or col == "nudge_text":
+            assert isinstance(out[col].dtype, pd.CategoricalDtype), (col, out[col].dtype)
+
+
+def check_frame_snapshot():
+    """A frame read earlier is unchanged by later appends and profile edits."""
+    frame = _dataset(300)
+    store = CheckinStore(flush_every=5)
+    store.extend(frame.iloc[:200])
+    snapshot = store.frame()
+    expected = snapshot.copy(deep=True)
+    for _, row in frame.iloc[200:].iterrows():
+        store.append(row.to_dict())
+        store.frame()
+    store.participants.save(frame["user_id"].iloc[0], {"neurotype": "Other neurodivergence"})
+    assert len(store.frame()) == len(frame)
+    pd.testing.assert_frame_equal(snapshot, expected)
+
+
+def check_parquet_parts():
+    """Check-ins saved one at a time reach Parquet as a few parts, in order."""
+    import os
+    import tempfile
+
+    from checkin_store import store_from_url
+
+    frame = _dataset(2000)
+    with tempfile.TemporaryDirectory() as directory:
+        store = store_from_url(f"parquet://{directory}")
+        for row in frame.to_dict("records"):
+            store.append(row)
+            store.persist()
+        for backend in (store.backend, store.participants.backend, store.nudges.backend):
+            backend.close()
+        parts = os.listdir(os.path.join(directory, "checkin_facts"))
+        assert len(parts) <= 2, parts
+        reloaded = store_from_url(f"parquet://{directory}").frame()
+        assert reloaded["user_id"].astype(str).tolist() == frame["user_id"].astype(str).tolist()
+
+
+def check_profile_edit():
+    """A profile edit moves its participant's rows like a full rebuild would."""
+    from aggregations import RunningAggregates
+    from rollups import WeeklyRollup
+
+    frame = _dataset(300)
+    store = CheckinStore(flush_every=7)
+    store.extend(frame.iloc[:250])
+    user_id = frame["user_id"].iloc[0]
+    revision = store.participants.revision
+    store.participants.save(user_id, {"additional_notes": "notes only"})
+    assert store.participants.revision == revision, "notes-only edit bumped the revision"
+    store.participants.save(user_id, {"neurotype": "Other neurodivergence"})
+    for _, row in frame.iloc[250:].iterrows():
+        store.append(dict(row.to_dict(), user_id=user_id, dating_intention="Friendship / low pressure"))
+
+    full = store.frame()
+    current = store.participants.get(user_id)["neurotype"]
+    assert set(full.loc[full["user_id"] == user_id, "neurotype"]) == {current}
+    for incremental, rebuilt in ((store.aggregates, RunningAggregates()), (store.rollup, WeeklyRollup())):
+        rebuilt.update_frame(full)
+        assert dict(incremental.rows) == dict(rebuilt.rows), type(rebuilt).__name__
+        assert incremental.counts == rebuilt.counts, type(rebuilt).__name__
+        for key, stats in rebuilt.stats.items():
+            assert incremental.stats[key].count == stats.count, key
+            assert abs(incremental.stats[key].total - stats.total) < 1e-6, key
+
+
+def check_next_checkin_reward():
+    """
+    An arm is rewarded by the participant's next answered check-in, not
+    its own; "N/A" check-ins in between leave it waiting.
+    """
+    from bandits import ArmOutcomes
+
+    rows = [
+        {"user_id": "u1", "nudge_arm": "A", "want_see_again": "Yes"},
+        {"user_id": "u2", "nudge_arm": "C", "want_see_again": "No"},
+        {"user_id": "u1", "nudge_arm": "B", "want_see_again": "N/A"},
+        {"user_id": "u1", "nudge_arm": None, "want_see_again": "N/A"},
+        {"user_id": "u1", "nudge_arm": "C", "want_see_again": "Yes"},
+        {"user_id": "u2", "nudge_arm": "A", "want_see_again": "No"},
+        {"user_id": "u2", "nudge_arm": "B", "want_see_again": "N/A"},
+    ]
+    # A and B <- u1's fifth check-in (Yes), C <- u2's second (No); u1's C
+    # and u2's A and B wait.
+    expected = ([1, 1, 0], [1, 1, 1])
+    pending = {"u1": [0, 0, 1], "u2": [1, 1, 0]}
+    one_by_one = ArmOutcomes()
+    for row in rows:
+        one_by_one.update(row)
+    whole, split = ArmOutcomes(), ArmOutcomes()
+    whole.update_frame(pd.DataFrame(rows))
+    # u1's A and B are still waiting when the second block arrives.
+    split.update_frame(pd.DataFrame(rows[:3]))
+    split.update_frame(pd.DataFrame(rows[3:]))
+    for outcomes in (one_by_one, whole, split):
+        assert (outcomes.successes.tolist(), outcomes.trials.tolist()) == expected, (
+            outcomes.successes, outcomes.trials,
+        )
+        waiting = {user: arms.tolist() for user, arms in outcomes.pending.items()}
+        assert waiting == pending, waiting
+
+    frame = _dataset(300)
+    appended = CheckinStore()
+    for _, row in frame.iterrows():
+        appended.append(row.to_dict())
+    extended = CheckinStore()
+    extended.extend(frame)
+    for store in (appended, extended):
+        assert store.arm_outcomes.trials.tolist() == appended.arm_outcomes.trials.tolist()
+        assert store.arm_outcomes.successes.tolist() == appended.arm_outcomes.successes.tolist()
+
+
+CHECKS: Dict[str, Callable[[], None]] = {
+    "categorical_append": check_categorical_append,
+    "export_download": check_export_download,
+    "frame_snapshot": check_frame_snapshot,
+    "next_checkin_reward": check_next_checkin_reward,
+    "overlapping_tags": check_overlapping_tags,
+    "parquet_parts": check_parquet_parts,
+    "profile_edit": check_profile_edit,
+}
+
+
+def run_checks() -> List[str]:
+    """Names of the failed checks (with their errors)."""
+    failures = []
+    for name, check in CHECKS.items():
+        try:
+            check()
+            status = "ok"
+        except AssertionError as exc:
+            failures.append(f"{name}: {exc}")
+            status = "FAIL"
+        print(f"check {name:<32} {status}", flush=True)
+    return failures
+
+
+def measure(run: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Best-of-`repeat` wall time, then peak traced memory of one more call."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(times), "peak_bytes": peak}
+
+
+def run_suite(sizes: List[int], names: List[str], repeat: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """Results keyed by "name[rows]"."""
+    results = {}
+    for rows in sizes:
+        frame = _dataset(rows)
+        for name in names:
+            run = BENCHMARKS[name](frame)
+            result = measure(run, repeat or (5 if rows <= 10**4 else 3 if rows <= 10**5 else 1))
+            key = f"{name}[{rows}]"
+            results[key] = result
+            print(
+                f"{key:<32} {result['seconds'] * 1000:>12.3f} ms {result['peak_bytes'] / 2**20:>10.2f} MiB",
+                flush=True,
+            )
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    time_tolerance: float,
+    memory_tolerance: float,
+    min_seconds: float = 1e-3,
+) -> List[str]:
+    """
+    Regressions of `results` against `baseline`. Timings under `min_seconds`
+    in the baseline are compared against `min_seconds` instead, so tiny
+    benchmarks do not fail on scheduler noise.
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        allowed = max(base["seconds"], min_seconds) * (1 + time_tolerance)
+        if result["seconds"] > allowed:
+            regressions.append(
+                f"{key}: {result['seconds'] * 1000:.3f} ms vs baseline {base['seconds'] * 1000:.3f} ms"
+            )
+        allowed = base["peak_bytes"] * (1 + memory_tolerance) + 64 * 1024
+        if result["peak_bytes"] > allowed:
+            regressions.append(
+                f"{key}: peak {result['peak_bytes'] / 2**20:.2f} MiB "
+                f"vs baseline {base['peak_bytes'] / 2**20:.2f} MiB"
+            )
+    return regressions
+
+
+def _sizes(text: str) -> List[int]:
+    return [int(float(s)) for s in text.split(",") if s.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the check-in app's hot paths.")
+    parser.add_argument("--sizes", type=_sizes, default=DEFAULT_SIZES, help="e.g. 1e2,1e3,1e6")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="Repeatable")
+    parser.add_argument("--repeat", type=int, help="Timed repeats per benchmark (default: by size)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to --baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail on regressions against --baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.5, help="Allowed slowdown (0.5 = +50%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    parser.add_argument("--json", help="Also write results to this file")
+    parser.add_argument("--check", action="store_true", help="Run the correctness checks instead")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        failures = run_checks()
+        for line in failures:
+            print(f"FAILED {line}", file=sys.stderr)
+        return 1 if failures else 0
+
+    results = run_suite(args.sizes, args.only or list(BENCHMARKS), args.repeat)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            baseline = {}
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"saved {len(results)} results to {args.baseline}")
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
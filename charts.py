@@ -0,0 +1,125 @@
+"""
+Server-side reduction of chart data.
+
+Streamlit serializes every row handed to a chart and ships it to the
+browser on each rerun, so long time series and dense scatters are cut
+down here first: time series are binned by week and/or thinned with
+Largest-Triangle-Three-Buckets (which keeps the visual peaks and dips),
+and scatters are collapsed into counted points on a grid. Every helper
+takes a point budget; output never exceeds it.
+"""
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+CHART_POINT_BUDGET = 500
+MIN_POINT_BUDGET = 50
+MAX_POINT_BUDGET = 10_000
+
+
+def week_start(dates) -> np.ndarray:
+    """Monday of the ISO week of each date, as datetime64[D]."""
+    days = np.asarray(dates, dtype="datetime64[D]")
+    # 1970-01-01 was a Thursday, i.e. day 3 of an ISO (Monday = 0) week.
+    weekday = (days.astype(np.int64) + 3) % 7
+    return days - weekday.astype("timedelta64[D]")
+
+
+def weekly_mean(frame: pd.DataFrame, date_col: str, value_cols: Iterable[str]) -> pd.DataFrame:
+    """Mean of `value_cols` per ISO week of `date_col`, indexed by week start."""
+    value_cols = list(value_cols)
+    dates = frame[date_col].to_numpy()
+    valid = ~pd.isna(dates)
+    weeks, inverse = np.unique(week_start(dates[valid]), return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(weeks))
+    means = {}
+    for col in value_cols:
+        values = frame[col].to_numpy(dtype=float, na_value=np.nan)[valid]
+        present = ~np.isnan(values)
+        totals = np.bincount(inverse[present], weights=values[present], minlength=len(weeks))
+        n = np.bincount(inverse[present], minlength=len(weeks))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[col] = totals / n
+    out = pd.DataFrame(means, index=pd.DatetimeIndex(weeks.astype("datetime64[ns]"), name="week"))
+    return out[counts > 0]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, budget: int) -> np.ndarray:
+    """
+    Indices of at most `budget` points of (x, y) chosen with
+    Largest-Triangle-Three-Buckets. First and last points are always kept;
+    `x` must be sorted.
+    """
+    n = len(x)
+    if budget >= n or budget < 3:
+        return np.arange(n) if budget >= n else np.array([0, n - 1][:budget], dtype=np.int64)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Buckets over the interior points; bucket i spans edges[i]:edges[i + 1].
+    edges = np.linspace(1, n - 1, budget - 1).astype(np.int64)
+    # Average of each bucket, used as the third triangle vertex of the previous one.
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+
+    picked = np.empty(budget, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(budget - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 1 < budget - 2:
+            cx, cy = avg_x[i + 1], avg_y[i + 1]
+        else:
+            cx, cy = x[n - 1], y[n - 1]
+        bx, by = x[start:stop], y[start:stop]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def downsample(series: pd.DataFrame, budget: int = CHART_POINT_BUDGET) -> pd.DataFrame:
+    """
+    At most `budget` rows of a time-indexed chart frame. LTTB runs on each
+    column with an equal share of the budget and the chosen rows are
+    merged, so every line keeps its own extremes.
+    """
+    if len(series) <= budget:
+        return series
+    x = series.index.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    share = max(3, budget // max(1, series.shape[1]))
+    keep: List[np.ndarray] = [
+        lttb(x, series[col].to_numpy(dtype=float, na_value=np.nan), share) for col in series.columns
+    ]
+    rows = np.unique(np.concatenate(keep))[:budget]
+    return series.iloc[rows]
+
+
+def binned_scatter(
+    frame: pd.DataFrame,
+    x: str,
+    y: str,
+    budget: int = CHART_POINT_BUDGET,
+    bins: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Scatter points as (x, y, count) rows, at most `budget` of them. Exact
+    duplicate points are merged first (lossless); if that is still over
+    budget, points are snapped to the centres of a 2-D histogram grid.
+    """
+    xs = frame[x].to_numpy(dtype=float, na_value=np.nan)
+    ys = frame[y].to_numpy(dtype=float, na_value=np.nan)
+    valid = ~(np.isnan(xs) | np.isnan(ys))
+    xs, ys = xs[valid], ys[valid]
+
+    points, counts = np.unique(np.column_stack([xs, ys]), axis=0, return_counts=True)
+    if len(points) > budget:
+        bins = bins or max(2, int(np.sqrt(budget)))
+        grid, x_edges, y_edges = np.histogram2d(xs, ys, bins=bins)
+        ix, iy = np.nonzero(grid)
+        x_mid = (x_edges[:-1] + x_edges[1:]) / 2
+        y_mid = (y_edges[:-1] + y_edges[1:]) / 2
+        points = np.column_stack([x_mid[ix], y_mid[iy]])
+        counts = grid[ix, iy].astype(np.int64)
+    return pd.DataFrame({x: points[:, 0], y: points[:, 1], "count": counts})
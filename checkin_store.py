@@ -0,0 +1,1042 @@
+"""
+Check-in storage for the Hinge Labs concept prototype.
+
+Submitted rows land in a small columnar append buffer and are folded
+into preallocated column buffers in batches, so saving a check-in never
+rebuilds or copies the whole table. The full frame is only wrapped
+around those buffers when a view actually reads it.
+
+A store can optionally sit on top of a durable backend (a local SQLite
+table or an append-only directory of Parquet files) so check-ins survive
+the browser session and a cold start is a single read instead of a
+re-seed.
+
+Every block is cast to the typed schema in `schema.py` (categoricals,
+int16/float32, datetime64) on its way in.
+"""
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from aggregations import RunningAggregates
+from bandits import ArmOutcomes
+from diagnostics import ROWS_SCANNED, count
+from nudges import NudgeDimension
+from profile_store import PROFILE_COLUMNS, SEGMENT_FIELDS, ProfileStore, profiles_from_checkins
+from rollups import WeeklyRollup
+from schema import (
+    CHECKIN_COLUMNS,
+    FACT_COLUMNS,
+    ID_COLUMNS,
+    NUDGE_COLUMNS,
+    PARTICIPANT_COLUMNS,
+    coerce_schema,
+    empty_frame,
+    normalize_row,
+)
+
+# Rows held in the append buffer before they are folded into a block.
+FLUSH_EVERY = 1024
+
+# ParquetBackend: rows per written part, and the longest a buffered row
+# waits for one. A trailing run of COMPACT_PARTS parts under COMPACT_ROWS
+# rows each is rewritten as one part with ROW_GROUP_ROWS-row groups.
+PART_ROWS = 1024
+PART_SECONDS = 5.0
+COMPACT_PARTS = 8
+COMPACT_ROWS = 1 << 17
+ROW_GROUP_ROWS = 1 << 16
+
+# Fact columns with a maintained inverted index. Profile filters resolve
+# to participant IDs first (see CheckinStore.query).
+INDEXED_COLUMNS = ("participant_id",)
+
+# Environment variable naming the durable backend, e.g.
+# "sqlite:///data/checkins.db" or "parquet://data/checkins".
+STORE_URL_ENV = "HINGE_CHECKIN_STORE"
+
+Filters = Dict[str, object]
+
+
+def _sql_value(value):
+    """SQLite-bindable form of a check-in value."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+# ---------------------------------------------------
+# Durable backends
+# ---------------------------------------------------
+class SQLiteBackend:
+    """
+    Check-ins kept in a single local SQLite table. Every append is
+    committed immediately (write-through), and equality filters (or
+    membership, for a list value) are pushed down into the WHERE clause
+    against indexed columns.
+    """
+
+    write_through = True
+    indexed_columns = ("user_id", "participant_id")
+
+    def __init__(self, path: str, columns: Iterable[str] = CHECKIN_COLUMNS, table: str = "checkins"):
+        self.path = path
+        self.table = table
+        self.columns = list(columns)
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+        col_sql = ", ".join(f'"{c}"' for c in self.columns)
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({col_sql})')
+        for col in self.indexed_columns:
+            if col in self.columns:
+                self._conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "ix_{table}_{col}" ON "{table}" ("{col}")'
+                )
+        self._conn.commit()
+
+        placeholders = ", ".join("?" for _ in self.columns)
+        self._insert_sql = f'INSERT INTO "{table}" ({col_sql}) VALUES ({placeholders})'
+
+    def append(self, block: Dict[str, list]):
+        rows = [
+            tuple(_sql_value(v) for v in row)
+            for row in zip(*(block[c] for c in self.columns))
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(self._insert_sql, rows)
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM "{self.table}"').fetchone()[0]
+
+    def load(self, filters: Optional[Filters] = None) -> pd.DataFrame:
+        sql = f'SELECT * FROM "{self.table}"'
+        params: List[object] = []
+        clauses = []
+        for col, value in (filters or {}).items():
+            if isinstance(value, (list, tuple)):
+                # One JSON parameter, however many values (SQLite caps bound parameters).
+                clauses.append(f'"{col}" IN (SELECT value FROM json_each(?))')
+                params.append(json.dumps(list(value)))
+            else:
+                clauses.append(f'"{col}" = ?')
+                params.append(value)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY rowid"
+
+        with self._lock:
+            frame = pd.read_sql_query(sql, self._conn, params=params)
+        return frame.reindex(columns=self.columns)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ParquetBackend:
+    """
+    Append-only log of Parquet files ("parts") in a directory.
+
+    Appended rows are buffered in memory and written as one part once
+    `part_rows` of them have accumulated or the oldest has waited
+    `part_seconds` (or on `flush()` / `close()`), so a one-row append
+    does not cost a file. Whenever the newest COMPACT_PARTS parts are all
+    smaller than COMPACT_ROWS they are rewritten as a single part with
+    ROW_GROUP_ROWS-row groups, which keeps a cold start to a few files.
+
+    A part written by compaction is named after the first and last part
+    it replaces ("part-000000-000007.parquet"); parts a wider one covers
+    are leftovers of an interrupted compaction and are deleted on open.
+    `load` reads every part (and the buffered rows) in one dataset scan,
+    handing equality / membership filters to the Parquet reader so row
+    groups whose statistics rule them out are never decoded.
+
+    Requires pyarrow (already installed alongside Streamlit).
+    """
+
+    write_through = False
+
+    def __init__(
+        self,
+        directory: str,
+        columns: Iterable[str] = CHECKIN_COLUMNS,
+        part_rows: int = PART_ROWS,
+        part_seconds: float = PART_SECONDS,
+    ):
+        import pyarrow.parquet as pq
+
+        self.directory = directory
+        self.columns = list(columns)
+        self.part_rows = max(1, int(part_rows))
+        self.part_seconds = part_seconds
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, list] = {c: [] for c in self.columns}
+        self._pending_rows = 0
+        self._timer: Optional[threading.Timer] = None
+
+        # (first, last, path, rows, schema) per live part, in log order.
+        self._parts: List[tuple] = []
+        covered = -1
+        for first, last, path in sorted(self._listing(), key=lambda p: (p[0], -p[1])):
+            if last <= covered:
+                os.remove(path)
+                continue
+            covered = last
+            meta = pq.ParquetFile(path).metadata
+            self._parts.append((first, last, path, meta.num_rows, meta.schema.to_arrow_schema()))
+        with self._lock:
+            self._compact()
+
+    def _listing(self) -> List[tuple]:
+        """(first, last, path) of every part file in the directory."""
+        parts = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith("part-") and name.endswith(".parquet")):
+                continue
+            numbers = name[len("part-"):-len(".parquet")].split("-")
+            if len(numbers) > 2 or not all(n.isdigit() for n in numbers):
+                continue
+            parts.append((int(numbers[0]), int(numbers[-1]), os.path.join(self.directory, name)))
+        return parts
+
+    def _write(self, table, first: int, last: int, **options):
+        import pyarrow.parquet as pq
+
+        name = f"part-{first:06d}.parquet" if first == last else f"part-{first:06d}-{last:06d}.parquet"
+        path = os.path.join(self.directory, name)
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path, **options)
+        os.replace(tmp_path, path)
+        return (first, last, path, table.num_rows, table.schema)
+
+    def _write_pending(self):
+        """Write the buffered rows as a new part. Holds `_lock`."""
+        import pyarrow as pa
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending_rows:
+            return
+        table = pa.Table.from_pandas(
+            pd.DataFrame(self._pending, columns=self.columns), preserve_index=False
+        )
+        number = self._parts[-1][1] + 1 if self._parts else 0
+        self._parts.append(self._write(table, number, number))
+        self._pending = {c: [] for c in self.columns}
+        self._pending_rows = 0
+        self._compact()
+
+    def _compact(self):
+        """Merge the trailing run of small parts into one. Holds `_lock`."""
+        run = 0
+        while run < len(self._parts) and self._parts[-1 - run][3] < COMPACT_ROWS:
+            run += 1
+        if run < COMPACT_PARTS:
+            return
+        merged = self._parts[-run:]
+        table = self._scan(merged)
+        part = self._write(table, merged[0][0], merged[-1][1], row_group_size=ROW_GROUP_ROWS)
+        # The merged part is complete before the parts it replaces go away.
+        for _, _, path, _, _ in merged:
+            os.remove(path)
+        self._parts[-run:] = [part]
+
+    def _scan(self, parts: List[tuple], filters: Optional[Filters] = None):
+        """One dataset scan over `parts`, under their unified schema."""
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        schema = pa.unify_schemas([p[4] for p in parts], promote_options="permissive")
+        predicate = [
+            (col, "in", list(value)) if isinstance(value, (list, tuple)) else (col, "==", value)
+            for col, value in (filters or {}).items()
+        ]
+        dataset = ds.dataset([p[2] for p in parts], schema=schema, format="parquet")
+        return dataset.to_table(filter=pq.filters_to_expression(predicate) if predicate else None)
+
+    def append(self, block: Dict[str, list]):
+        if not block or not len(block[self.columns[0]]):
+            return
+        with self._lock:
+            for col in self.columns:
+                self._pending[col].extend(block[col])
+            self._pending_rows += len(block[self.columns[0]])
+            if self._pending_rows >= self.part_rows:
+                self._write_pending()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.part_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write the buffered rows now."""
+        with self._lock:
+            self._write_pending()
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(p[3] for p in self._parts) + self._pending_rows
+
+    def load(self, filters: Optional[Filters] = None) -> pd.DataFrame:
+        with self._lock:
+            frames = [self._scan(self._parts, filters).to_pandas()] if self._parts else []
+            if self._pending_rows:
+                pending = pd.DataFrame(self._pending, columns=self.columns)
+                for col, value in (filters or {}).items():
+                    values = list(value) if isinstance(value, (list, tuple)) else [value]
+                    pending = pending[pending[col].isin(values)]
+                frames.append(pending)
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(frames, ignore_index=True).reindex(columns=self.columns)
+
+    def close(self):
+        self.flush()
+
+
+def backend_from_url(url: str, columns: Iterable[str] = CHECKIN_COLUMNS, table: str = "checkins"):
+    """
+    Build a backend from a URL such as "sqlite:///checkins.db" or
+    "parquet://checkins". An empty URL means purely in-memory storage.
+
+    Other tables stored next to the check-ins (e.g. profiles) pass their
+    own `table`: a table in the same SQLite file, or a subdirectory of
+    the Parquet directory.
+    """
+    if not url:
+        return None
+    scheme, sep, location = url.partition("://")
+    if not sep:
+        raise ValueError(f"Unrecognised check-in store URL: {url!r}")
+    if scheme == "sqlite":
+        # sqlite:///relative.db and sqlite:////absolute.db, as in SQLAlchemy
+        return SQLiteBackend(location[1:] if location.startswith("/") else location, columns, table)
+    if scheme == "parquet":
+        if table != "checkins":
+            location = os.path.join(location, table)
+        return ParquetBackend(location, columns)
+    raise ValueError(f"Unsupported check-in store backend: {scheme!r}")
+
+
+# ---------------------------------------------------
+# Secondary indexes
+# ---------------------------------------------------
+class SegmentIndex:
+    """
+    Inverted index (value -> row positions) over a few low-cardinality
+    columns. Positions are appended in increasing order, so each posting
+    list is already sorted and lookups / intersections cost time
+    proportional to the matching rows, not the table.
+    """
+
+    def __init__(self, columns: Iterable[str] = INDEXED_COLUMNS):
+        self.columns = list(columns)
+        self._postings: Dict[str, Dict[object, array]] = {c: {} for c in self.columns}
+
+    def add(self, position: int, row: Dict):
+        for col in self.columns:
+            value = row.get(col)
+            if value is None or (isinstance(value, float) and value != value):
+                continue
+            postings = self._postings[col]
+            if value not in postings:
+                postings[value] = array("q")
+            postings[value].append(position)
+
+    def add_frame(self, start: int, frame: pd.DataFrame):
+        for col in self.columns:
+            postings = self._postings[col]
+            groups = frame.groupby(col, observed=True, sort=False).indices
+            for value, positions in groups.items():
+                if value not in postings:
+                    postings[value] = array("q")
+                postings[value].extend((positions + start).tolist())
+
+    def values(self, col: str) -> list:
+        return sorted(self._postings[col])
+
+    def positions(self, col: str, value) -> np.ndarray:
+        postings = self._postings[col].get(value)
+        if postings is None:
+            return np.empty(0, dtype=np.int64)
+        return np.frombuffer(postings, dtype=np.int64)
+
+    def union(self, col: str, values: Iterable) -> np.ndarray:
+        """Sorted row positions whose `col` is any of `values`."""
+        # Joining the raw posting buffers skips an ndarray per value.
+        found = [p for p in map(self._postings[col].get, values) if p is not None]
+        return np.sort(np.frombuffer(b"".join(found), dtype=np.int64))
+
+    def lookup(self, **filters) -> np.ndarray:
+        """Sorted row positions matching every `column=value` filter."""
+        lists = sorted(
+            (self.positions(col, value) for col, value in filters.items()),
+            key=len,
+        )
+        result = lists[0]
+        for other in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+
+class TimeOrder:
+    """
+    Row positions kept sorted by `checkin_date`.
+
+    New rows are sorted among themselves and merged into the existing
+    order with a binary search, so the table is never re-sorted and the
+    date column (already datetime64) is never re-parsed. `rank` is the
+    inverse permutation, used to put any subset of rows in time order.
+    """
+
+    def __init__(self):
+        self.order = np.empty(0, dtype=np.int64)
+        self._dates = np.empty(0, dtype=np.int64)
+        self._rank: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def extend(self, start: int, dates: np.ndarray):
+        """Merge rows `start .. start + len(dates)` into the order."""
+        if not len(dates):
+            return
+        dates = dates.astype("datetime64[ns]").view(np.int64)
+        new = np.argsort(dates, kind="stable")
+        new_dates = dates[new]
+        new_positions = new + start
+        if not len(self._dates) or new_dates[0] >= self._dates[-1]:
+            self.order = np.concatenate([self.order, new_positions])
+            self._dates = np.concatenate([self._dates, new_dates])
+        else:
+            at = np.searchsorted(self._dates, new_dates, side="right")
+            self.order = np.insert(self.order, at, new_positions)
+            self._dates = np.insert(self._dates, at, new_dates)
+        self._rank = None
+
+    @property
+    def rank(self) -> np.ndarray:
+        if self._rank is None:
+            rank = np.empty(len(self.order), dtype=np.int64)
+            rank[self.order] = np.arange(len(self.order))
+            self._rank = rank
+        return self._rank
+
+    def sort(self, positions: np.ndarray) -> np.ndarray:
+        """`positions` reordered by check-in date (stable)."""
+        if not len(positions):
+            return positions
+        return positions[np.argsort(self.rank[positions], kind="stable")]
+
+
+# ---------------------------------------------------
+# Materialized table
+# ---------------------------------------------------
+def _codes_dtype(n_categories: int) -> np.dtype:
+    """The codes dtype pandas uses for a Categorical with `n_categories` categories."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _merge_chunks(first, second):
+    """One extension array holding `first` then `second`."""
+    merged = pd.concat([pd.Series(first), pd.Series(second)], ignore_index=True).array
+    if hasattr(merged, "__arrow_array__"):
+        # Concatenating Arrow-backed arrays only chains their chunks.
+        import pyarrow as pa
+
+        merged = pd.array(pa.array(merged), dtype=merged.dtype)
+    return merged
+
+
+class FrameBuffer:
+    """
+    A typed table that grows at the end without copying its rows.
+
+    Numpy columns and the codes of categorical columns live in
+    preallocated arrays whose capacity grows geometrically (by GROWTH),
+    so appending k rows writes k rows plus an occasional reallocation.
+    Categories are only ever appended to, so stored codes stay valid.
+    Other extension columns (Arrow-backed strings) are kept as chunks,
+    merged like a binary counter: O(log n) chunks, each row copied
+    O(log n) times overall.
+
+    `frame()` wraps read-only views of the first `len(self)` rows in a
+    DataFrame without copying. Rows below `len(self)` are never written
+    again (`replace` puts a column into new arrays), so a frame handed
+    out earlier stays valid after later appends.
+    """
+
+    GROWTH = 1.5
+    MIN_CAPACITY = 1024
+
+    def __init__(self):
+        self.columns: List[str] = []
+        self._rows = 0
+        self._capacity = 0
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._dtypes: Dict[str, pd.CategoricalDtype] = {}
+        self._chunks: Dict[str, list] = {}
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _reserve(self, rows: int):
+        if rows <= self._capacity:
+            return
+        self._capacity = max(rows, int(self._capacity * self.GROWTH), self.MIN_CAPACITY)
+        for col, values in self._arrays.items():
+            grown = np.empty(self._capacity, dtype=values.dtype)
+            grown[: self._rows] = values[: self._rows]
+            self._arrays[col] = grown
+
+    def _array(self, col: str, dtype: np.dtype) -> np.ndarray:
+        """`col`'s buffer, (re)allocated for `dtype` if need be."""
+        values = self._arrays.get(col)
+        if values is None or values.dtype != dtype:
+            grown = np.empty(self._capacity, dtype=dtype)
+            if values is not None:
+                grown[: self._rows] = values[: self._rows]
+            self._arrays[col] = values = grown
+        return values
+
+    def _codes(self, col: str, values: pd.Categorical) -> np.ndarray:
+        """`values`' codes under `col`'s categories, appending any new ones."""
+        dtype = self._dtypes.get(col)
+        if dtype is None:
+            self._dtypes[col] = values.dtype
+            return values.codes
+        position = dtype.categories.get_indexer(values.categories)
+        unseen = position < 0
+        if unseen.any():
+            dtype = pd.CategoricalDtype(dtype.categories.append(values.categories[unseen]))
+            self._dtypes[col] = dtype
+            position = dtype.categories.get_indexer(values.categories)
+        # Missing values (code -1) pick the appended -1.
+        return np.append(position, -1)[values.codes]
+
+    def _write(self, col: str, values: pd.Series, start: int):
+        end = start + len(values)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = self._codes(col, values.array)
+            self._array(col, _codes_dtype(len(self._dtypes[col].categories)))[start:end] = codes
+        elif isinstance(values.dtype, np.dtype):
+            self._array(col, values.dtype)[start:end] = values.to_numpy()
+        else:
+            chunks = self._chunks.setdefault(col, [])
+            chunks.append(values.array)
+            while len(chunks) > 1 and len(chunks[-2]) <= len(chunks[-1]):
+                last = chunks.pop()
+                chunks[-1] = _merge_chunks(chunks[-1], last)
+
+    def extend(self, frame: pd.DataFrame):
+        """Append the rows of `frame` (with the same columns every time)."""
+        if frame.empty:
+            return
+        if not self.columns:
+            self.columns = list(frame.columns)
+        self._reserve(self._rows + len(frame))
+        for col in self.columns:
+            self._write(col, frame[col], self._rows)
+        self._rows += len(frame)
+
+    def replace(self, col: str, values):
+        """Swap in all of `col`'s values, in new arrays."""
+        self._arrays.pop(col, None)
+        self._dtypes.pop(col, None)
+        self._chunks.pop(col, None)
+        self._write(col, pd.Series(values, copy=False), 0)
+
+    def _column(self, col: str):
+        if col in self._chunks:
+            chunks = self._chunks[col]
+            if len(chunks) == 1:
+                return chunks[0]
+            return pd.concat([pd.Series(c) for c in chunks], ignore_index=True).array
+        view = self._arrays[col][: self._rows]
+        view.flags.writeable = False
+        if col in self._dtypes:
+            return pd.Categorical.from_codes(view, dtype=self._dtypes[col], validate=False)
+        return view
+
+    def frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """The stored rows of `columns` (default: all), without copying."""
+        return pd.DataFrame({c: self._column(c) for c in columns or self.columns}, copy=False)
+
+
+class CheckinStore:
+    """
+    Append-optimised check-in table, stored as a star schema.
+
+    Each check-in is kept as a narrow fact row (`schema.FACT_COLUMNS`):
+    its own answers plus the integer IDs of its participant in
+    `participants` (a `profile_store.ProfileStore`) and of its nudge in
+    `nudges` (a `nudges.NudgeDimension`). Writes take wide
+    CHECKIN_COLUMNS rows and split them; reads return the wide view,
+    joined from the dimensions' current values, so editing a profile
+    applies to all of that participant's check-ins without rewriting any.
+    Catalog nudge texts are not stored at all: the join renders them from
+    the template ID and the check-in's standout moment.
+
+    `append` is O(1): values go into per-column lists. Once `flush_every`
+    rows have accumulated (or on the next read) they are joined and
+    appended to `table`, a `FrameBuffer` of the facts plus their wide
+    view, so a write never copies the rows stored before it. `frame()`
+    wraps the table's buffers without copying and caches the result
+    until the next write.
+
+    With a `backend` (which holds the facts), new rows are persisted
+    incrementally: write-through backends on every append, buffered ones
+    when a block is flushed or `persist()` is called (a Parquet backend
+    batches those further into parts of its own). Existing rows are
+    loaded once on construction, or lazily on first read with
+    `preload=False`, in which case `query()` pushes its filters down to
+    the backend until the table is resident.
+
+    `index` maps each participant ID to its row positions and is likewise
+    maintained on every write. `query()` resolves a `user_id` filter and
+    profile filters (neurotype, dating intention, ...) to participant IDs
+    against the participant dimension, then merges those participants'
+    postings, so the cost follows the matching rows. The rows are then
+    picked with a positional take instead of masking and copying the
+    table.
+
+    `time_order` keeps row positions sorted by check-in date, merged in
+    as blocks are materialized, so `timeline()` returns rows in date
+    order without parsing or sorting the table.
+
+    `aggregates` holds per-segment running statistics that are updated on
+    every write (see `aggregations.RunningAggregates`), and `rollup` the
+    same for weekly cells of the study's segment dimensions (see
+    `rollups.WeeklyRollup`). A profile edit moves only the edited
+    participant's rows (found through `index`) from their old segments
+    to the new ones, on the next read or write; for a lazily loaded store
+    both only become complete once the table is resident.
+
+    A single store is safe to share between Streamlit sessions: writes
+    and materialization happen under `lock`, and a materialized frame is
+    never mutated afterwards (writes only add rows beyond it), so every
+    session can hold the current frame as a free snapshot.
+    """
+
+    def __init__(
+        self,
+        flush_every: int = FLUSH_EVERY,
+        backend=None,
+        preload: bool = True,
+        participants: Optional[ProfileStore] = None,
+        nudges: Optional[NudgeDimension] = None,
+    ):
+        self.columns: List[str] = list(CHECKIN_COLUMNS)
+        self.flush_every = max(1, int(flush_every))
+        self.backend = backend
+        self.participants = participants if participants is not None else ProfileStore()
+        self.nudges = nudges if nudges is not None else NudgeDimension()
+        self.lock = threading.RLock()
+        self.index = SegmentIndex()
+        self.time_order = TimeOrder()
+        self._writes = 0
+        self._aggregates = RunningAggregates()
+        self._rollup = WeeklyRollup()
+        self._outcomes = ArmOutcomes()
+        # Profile revision the aggregates / joined frame reflect.
+        self._revision = self.participants.revision
+        self.table = FrameBuffer()
+        self._buffer: Dict[str, list] = {c: [] for c in FACT_COLUMNS}
+        self._buffered = 0
+        self._persisted = 0
+        self._rows = 0
+        self._frame: Optional[pd.DataFrame] = None
+        self._frame_revision = self._revision
+        self._resident = backend is None
+
+        if backend is not None:
+            if preload:
+                existing = coerce_schema(backend.load(), FACT_COLUMNS)
+                if not existing.empty:
+                    joined = self._join(existing)
+                    self._store(existing, joined)
+                    self.index.add_frame(0, existing)
+                    self._update_aggregates(joined)
+                self._rows = len(existing)
+                self._resident = True
+            else:
+                self._rows = backend.count()
+
+    def __len__(self) -> int:
+        return self._rows
+
+    @property
+    def empty(self) -> bool:
+        return self._rows == 0
+
+    @property
+    def version(self) -> int:
+        """Changes on every write and on every profile edit."""
+        return self._writes + self.participants.revision
+
+    @property
+    def aggregates(self) -> RunningAggregates:
+        self._refresh()
+        return self._aggregates
+
+    @property
+    def rollup(self) -> WeeklyRollup:
+        self._refresh()
+        return self._rollup
+
+    @property
+    def arm_outcomes(self) -> ArmOutcomes:
+        return self._outcomes
+
+    # ---------------------------------------------------
+    # Star schema
+    # ---------------------------------------------------
+    def _facts(self, block: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fact rows for a typed wide block, storing its participants'
+        profile fields and registering its nudges on the way.
+        """
+        self.participants.extend(profiles_from_checkins(block[block["user_id"].notna()]))
+        facts = {
+            "participant_id": self.participants.ids(block["user_id"]),
+            "nudge_id": self.nudges.ids(block["nudge_type"], block["nudge_template"], block["nudge_text"]),
+        }
+        facts.update({c: block[c] for c in FACT_COLUMNS if c not in ID_COLUMNS})
+        return pd.DataFrame(facts, index=block.index)
+
+    def _join(self, facts: pd.DataFrame) -> pd.DataFrame:
+        """The wide CHECKIN_COLUMNS view of fact rows, from current dimension values."""
+        joined = self.participants.take(facts["participant_id"].to_numpy())
+        joined.update(self.nudges.take(facts["nudge_id"].to_numpy(), facts["standout_moment"]))
+        return pd.DataFrame(
+            {c: joined[c] if c in joined else facts[c] for c in self.columns},
+            index=facts.index,
+        )
+
+    def _store(self, facts: pd.DataFrame, joined: pd.DataFrame):
+        """Add fact rows and their joined wide view to the table."""
+        self.table.extend(joined.assign(**{c: facts[c] for c in ID_COLUMNS}))
+
+    def _participant_ids(self, filters: Filters) -> Optional[np.ndarray]:
+        """
+        IDs of the participants matching the participant-column filters
+        (user ID and profile fields), or None if there are none.
+        """
+        wanted = {c: v for c, v in filters.items() if c in PARTICIPANT_COLUMNS}
+        if not wanted:
+            return None
+        if "user_id" in wanted:
+            found = self.participants.id_of(wanted.pop("user_id"))
+            ids = np.array([found] if found >= 0 else [], dtype=np.int64)
+        else:
+            ids = np.arange(len(self.participants), dtype=np.int64)
+        profiles = self.participants.frame()
+        for col, value in wanted.items():
+            values = profiles[col].array
+            if value not in values.categories:
+                return np.empty(0, dtype=np.int64)
+            ids = ids[values.codes[ids] == values.categories.get_loc(value)]
+        return ids
+
+    def _update_aggregates(self, frame: pd.DataFrame):
+        self._aggregates.update_frame(frame)
+        self._rollup.update_frame(frame)
+        self._outcomes.update_frame(frame)
+
+    def _refresh(self):
+        """
+        Catch the running aggregates up with profile edits: only the edited
+        participants' rows move, out of the segments and rollup cells of
+        their old profile and into those of the new one.
+        """
+        with self.lock:
+            revision = self.participants.revision
+            if revision == self._revision or not self._resident:
+                return
+            before = {
+                self.participants.id_of(user_id): previous
+                for user_id, previous in self.participants.edited_since(self._revision).items()
+            }
+            positions = np.sort(np.concatenate(
+                [self.index.positions("participant_id", pid) for pid in before]
+            ))
+            if len(positions):
+                self._flush()
+                facts = self.table.frame(FACT_COLUMNS).take(positions)
+                moved = self._join(facts)
+                ids = facts["participant_id"].tolist()
+                old = moved.assign(**{f: [before[pid][f] for pid in ids] for f in SEGMENT_FIELDS})
+                self._aggregates.update_frame(old, sign=-1)
+                self._rollup.update_frame(old, sign=-1)
+                # Arm outcomes do not depend on the profile.
+                self._aggregates.update_frame(moved)
+                self._rollup.update_frame(moved)
+            self._revision = revision
+
+    # ---------------------------------------------------
+    # Writes
+    # ---------------------------------------------------
+    def append(self, row: Dict):
+        """Buffer a single check-in row."""
+        row = normalize_row(row)
+        with self.lock:
+            user_id = row.get("user_id")
+            if user_id is not None:
+                self.participants.extend([row])
+                self._refresh()
+                # Aggregate under the participant's profile as now stored.
+                row.update({f: v for f, v in self.participants.get(user_id).items() if f in SEGMENT_FIELDS})
+            fact = dict(
+                row,
+                participant_id=self.participants.id_of(user_id),
+                nudge_id=self.nudges.id_of(
+                    row.get("nudge_type"), row.get("nudge_template"), row.get("nudge_text")
+                ),
+            )
+            for col in FACT_COLUMNS:
+                self._buffer[col].append(fact.get(col))
+            self._buffered += 1
+            if self.backend is not None and self.backend.write_through:
+                self.backend.append({c: [fact.get(c)] for c in FACT_COLUMNS})
+                self._persisted = self._buffered
+            self.index.add(self._rows, fact)
+            self._rows += 1
+            self._aggregates.update(row)
+            self._rollup.update(row)
+            self._outcomes.update(row)
+            self._touch()
+            if self._buffered >= self.flush_every:
+                self._flush()
+
+    def extend(self, rows: Union[pd.DataFrame, Iterable[Dict]]):
+        """Append many rows at once, either as a DataFrame or as dicts."""
+        with self.lock:
+            if isinstance(rows, pd.DataFrame):
+                if rows.empty:
+                    return
+                self._flush()
+                facts = self._facts(coerce_schema(rows).reset_index(drop=True))
+                # Profile edits in `rows` apply to the earlier check-ins first.
+                self._refresh()
+                if self.backend is not None:
+                    self.backend.append({c: facts[c].tolist() for c in FACT_COLUMNS})
+                if not self._resident:
+                    # The backend is the only copy until the first full read.
+                    self._rows += len(facts)
+                    self._touch()
+                    return
+                joined = self._join(facts)
+                self._store(facts, joined)
+                self.index.add_frame(self._rows, facts)
+                self._rows += len(facts)
+                self._update_aggregates(joined)
+                self._touch()
+                return
+
+            for row in rows:
+                self.append(row)
+
+    def persist(self):
+        """Write buffered rows that the backend has not seen yet."""
+        with self.lock:
+            if self.backend is None or self._persisted >= self._buffered:
+                return
+            self.backend.append(
+                {c: values[self._persisted:] for c, values in self._buffer.items()}
+            )
+            self._persisted = self._buffered
+
+    def _touch(self):
+        self._writes += 1
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        self.persist()
+        if self._resident:
+            facts = coerce_schema(pd.DataFrame(self._buffer, columns=FACT_COLUMNS), FACT_COLUMNS)
+            self._store(facts, self._join(facts))
+        self._buffer = {c: [] for c in FACT_COLUMNS}
+        self._buffered = 0
+        self._persisted = 0
+
+    # ---------------------------------------------------
+    # Reads
+    # ---------------------------------------------------
+    def frame(self) -> pd.DataFrame:
+        """
+        Materialized wide view of every stored row. Callers should treat
+        the returned frame as read-only; it is shared until the next write.
+        """
+        with self.lock:
+            revision = self.participants.revision
+            if (
+                self._frame is not None
+                and len(self._frame) == self._rows
+                and self._frame_revision == revision
+            ):
+                return self._frame
+
+            self._flush()
+            loaded = False
+            if not self._resident:
+                # Everything appended so far has been persisted above, so the
+                # backend is the complete picture.
+                facts = coerce_schema(self.backend.load(), FACT_COLUMNS)
+                count(ROWS_SCANNED, len(facts))
+                self._rows = len(facts)
+                self.index = SegmentIndex()
+                self.index.add_frame(0, facts)
+                self.time_order = TimeOrder()
+                self.table = FrameBuffer()
+                self._store(facts, self._join(facts))
+                self._resident = loaded = True
+
+            if not len(self.table):
+                frame = empty_frame(self.columns)
+            else:
+                if self._frame_revision != revision:
+                    # A profile edit only changes the participant columns:
+                    # take those again instead of re-joining every row.
+                    ids = self.table.frame(["participant_id"])["participant_id"].to_numpy()
+                    for col, values in self.participants.take(ids).items():
+                        self.table.replace(col, values)
+                frame = self.table.frame(self.columns)
+
+            ordered = len(self.time_order)
+            if ordered < len(frame):
+                self.time_order.extend(
+                    ordered, frame["checkin_date"].to_numpy()[ordered:]
+                )
+
+            self._frame = frame
+            self._frame_revision = revision
+            if loaded:
+                self._aggregates = RunningAggregates()
+                self._rollup = WeeklyRollup()
+                self._outcomes = ArmOutcomes()
+                self._update_aggregates(frame)
+                self._revision = revision
+            return frame
+
+    def _positions(self, filters: Filters) -> Optional[np.ndarray]:
+        """
+        Sorted positions in `frame()` of the resident rows matching
+        `filters`, or None if there are no filters (every row).
+        """
+        frame = self.frame()
+        ids = self._participant_ids(filters)
+        positions = None
+        if ids is not None:
+            # The matching participants' postings, merged: proportional to
+            # their rows, not the table.
+            positions = self.index.union("participant_id", ids.tolist())
+            count(ROWS_SCANNED, len(positions))
+
+        for col, value in filters.items():
+            if col in PARTICIPANT_COLUMNS:
+                continue
+            values = frame[col] if positions is None else frame[col].take(positions)
+            count(ROWS_SCANNED, len(values))
+            matches = (values == value).to_numpy()
+            positions = np.flatnonzero(matches) if positions is None else positions[matches]
+        return positions
+
+    def query(self, **filters) -> pd.DataFrame:
+        """
+        Rows matching every `column=value` equality filter. Participant
+        columns are resolved to participant IDs (see the class docstring);
+        anything else falls back to a mask over the candidate rows.
+        Pushed down to the backend while the table is not yet resident.
+        """
+        with self.lock:
+            if self._resident:
+                positions = self._positions(filters)
+                frame = self.frame()
+                return frame if positions is None else frame.take(positions)
+
+            ids = self._participant_ids(filters)
+            rest = {c: v for c, v in filters.items() if c not in PARTICIPANT_COLUMNS}
+            self.persist()
+            pushed = {c: v for c, v in rest.items() if c in FACT_COLUMNS}
+            if ids is not None:
+                pushed["participant_id"] = ids.tolist()
+            facts = coerce_schema(self.backend.load(pushed), FACT_COLUMNS)
+            count(ROWS_SCANNED, len(facts))
+            frame = self._join(facts)
+            for col, value in rest.items():
+                if col not in pushed:
+                    count(ROWS_SCANNED, len(frame))
+                    frame = frame[frame[col] == value]
+            return frame
+
+    def timeline_positions(self, **filters) -> np.ndarray:
+        """
+        Positions in `frame()` of the rows `timeline(**filters)` returns,
+        in the same order, without taking them. Makes the table resident.
+        """
+        with self.lock:
+            self.frame()
+            positions = self._positions(filters)
+            if positions is None:
+                return self.time_order.order
+            return self.time_order.sort(positions)
+
+    def timeline(self, **filters) -> pd.DataFrame:
+        """`query(**filters)` with the rows ordered by check-in date."""
+        with self.lock:
+            if not self._resident:
+                return self.query(**filters).sort_values("checkin_date", kind="stable")
+            return self.frame().take(self.timeline_positions(**filters))
+
+    def distinct(self, column: str) -> list:
+        """Sorted distinct values of a participant column among stored check-ins."""
+        with self.lock:
+            if not self._resident:
+                self.frame()
+            ids = np.array(self.index.values("participant_id"), dtype=np.int64)
+            values = self.participants.take(ids[ids >= 0], [column])[column]
+            return sorted(values.unique().dropna())
+
+
+def store_from_url(url: str, preload: bool = True) -> CheckinStore:
+    """
+    A CheckinStore whose facts and dimension tables (participants,
+    nudges) all live in the backend at `url`; see `backend_from_url`.
+    An empty URL means purely in-memory storage.
+    """
+    return CheckinStore(
+        backend=backend_from_url(url, FACT_COLUMNS, table="checkin_facts"),
+        preload=preload,
+        participants=ProfileStore(backend_from_url(url, PROFILE_COLUMNS, table="profiles")),
+        nudges=NudgeDimension(backend_from_url(url, NUDGE_COLUMNS, table="nudges")),
+    )
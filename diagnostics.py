@@ -0,0 +1,140 @@
+"""
+Lightweight rerun instrumentation.
+
+A `RerunTrace` records how long each named section of one script run
+took (sections may nest) plus named counters such as rows scanned or
+bytes serialized. The app starts a trace at the top of every rerun;
+library code just calls `timed(...)` / `count(...)`, which are no-ops
+when no trace is active, so the store, aggregation and export modules
+stay usable from the CLIs and benchmarks without Streamlit.
+"""
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+ROWS_SCANNED = "rows_scanned"
+ROWS_RENDERED = "rows_rendered"
+BYTES_SERIALIZED = "bytes_serialized"
+
+
+class RerunTrace:
+    """Section timings and counters for one script rerun."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.started_at = datetime.utcnow()
+        self.sections: List[Dict] = []
+        self.counters: Counter = Counter()
+        self.seconds: Optional[float] = None
+        self._started = time.perf_counter()
+        self._depth = 0
+
+    @contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        # Recorded on entry so the list stays in execution order; the
+        # duration is filled in on exit.
+        record = {"name": name, "depth": self._depth, "seconds": None}
+        self.sections.append(record)
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record["seconds"] = time.perf_counter() - started
+            self._depth -= 1
+
+    def count(self, counter: str, amount: int = 1):
+        self.counters[counter] += amount
+
+    def finish(self) -> "RerunTrace":
+        self.seconds = time.perf_counter() - self._started
+        return self
+
+    def unattributed(self) -> float:
+        """Rerun time not covered by any top-level section."""
+        total = self.seconds if self.seconds is not None else time.perf_counter() - self._started
+        covered = sum(s["seconds"] or 0.0 for s in self.sections if s["depth"] == 0)
+        return max(0.0, total - covered)
+
+    def to_dict(self) -> Dict:
+        return {
+            "label": self.label,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "seconds": self.seconds,
+            "unattributed_seconds": self.unattributed(),
+            "sections": list(self.sections),
+            "counters": dict(self.counters),
+        }
+
+
+_current: ContextVar[Optional[RerunTrace]] = ContextVar("rerun_trace", default=None)
+
+
+def start_trace(label: str = "") -> RerunTrace:
+    """Start a new trace and make it the active one for this thread/context."""
+    trace = RerunTrace(label)
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RerunTrace]:
+    return _current.get()
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Time a block under `name` in the active trace, if there is one."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.section(name):
+        yield
+
+
+@contextmanager
+def tracing(trace: RerunTrace) -> Iterator[RerunTrace]:
+    """
+    Make `trace` the active one inside the block, for work that runs
+    outside any rerun (e.g. on a Streamlit server thread).
+    """
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def count(counter: str, amount: int = 1):
+    trace = _current.get()
+    if trace is not None:
+        trace.count(counter, amount)
+
+
+def summarize(traces: List[RerunTrace]) -> List[Dict]:
+    """
+    Per-section run count, mean and max milliseconds across `traces`, in
+    first-seen order (nested sections are indented under their parent).
+    """
+    totals: Dict[tuple, List[float]] = {}
+    for trace in traces:
+        for s in trace.sections:
+            if s["seconds"] is not None:
+                totals.setdefault((s["depth"], s["name"]), []).append(s["seconds"])
+    return [
+        {
+            "section": "  " * depth + name,
+            "runs": len(seconds),
+            "mean_ms": 1000 * sum(seconds) / len(seconds),
+            "max_ms": 1000 * max(seconds),
+        }
+        for (depth, name), seconds in totals.items()
+    ]
+
+
+def to_json(traces: List[RerunTrace]) -> str:
+    return json.dumps([t.to_dict() for t in traces], indent=2)
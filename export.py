@@ -0,0 +1,95 @@
+"""
+Streaming export of check-in slices.
+
+Exports are written chunk by chunk into a spooled temporary file (memory
+up to a small threshold, disk beyond it) instead of building the whole
+CSV string and a second bytes copy; `export_bytes` reads that file
+back once, for the download button. Besides plain CSV, slices can be
+exported gzip-compressed or in a columnar format (Parquet or Arrow IPC).
+"""
+import gzip
+import tempfile
+from typing import BinaryIO, Dict, Iterator, Tuple
+
+import pandas as pd
+
+from diagnostics import BYTES_SERIALIZED, count, timed
+
+CHUNK_ROWS = 50_000
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# label -> (file extension, MIME type)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Arrow IPC": ("arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+def iter_chunks(frame: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def iter_csv(frame: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    """UTF-8 CSV of `frame`, header first, one chunk of rows at a time."""
+    yield frame.iloc[:0].to_csv(index=False).encode("utf-8")
+    for chunk in iter_chunks(frame, chunk_rows):
+        yield chunk.to_csv(index=False, header=False).encode("utf-8")
+
+
+def write_export(frame: pd.DataFrame, fmt: str, out: BinaryIO, chunk_rows: int = CHUNK_ROWS):
+    """Write `frame` to the binary stream `out` in one of EXPORT_FORMATS."""
+    if fmt == "CSV":
+        for piece in iter_csv(frame, chunk_rows):
+            out.write(piece)
+    elif fmt == "CSV (gzip)":
+        with gzip.GzipFile(fileobj=out, mode="wb", mtime=0) as gz:
+            for piece in iter_csv(frame, chunk_rows):
+                gz.write(piece)
+    elif fmt in ("Parquet", "Arrow IPC"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.Schema.from_pandas(frame, preserve_index=False)
+        if fmt == "Parquet":
+            writer = pq.ParquetWriter(out, schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(out, schema)
+        with writer:
+            for chunk in iter_chunks(frame, chunk_rows):
+                writer.write_table(
+                    pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                )
+    else:
+        raise ValueError(f"Unknown export format: {fmt!r}")
+
+
+def payload_bytes(frame: pd.DataFrame) -> int:
+    """
+    Size of `frame` as an Arrow table, the form in which Streamlit sends
+    tables and chart data to the browser.
+    """
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(frame).nbytes
+
+
+def export_file(frame: pd.DataFrame, fmt: str, chunk_rows: int = CHUNK_ROWS) -> BinaryIO:
+    """The export as a rewound, spooled temporary file."""
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    with timed(f"export: {fmt}"):
+        write_export(frame, fmt, out, chunk_rows)
+    count(BYTES_SERIALIZED, out.tell())
+    out.seek(0)
+    return out
+
+
+def export_bytes(frame: pd.DataFrame, fmt: str, chunk_rows: int = CHUNK_ROWS) -> bytes:
+    """
+    The export as bytes, for `st.download_button`: its deferred `data`
+    callable must return bytes / str / a plain buffer, not a spooled file.
+    """
+    with export_file(frame, fmt, chunk_rows) as out:
+        return out.read()
@@ -0,0 +1,209 @@
+"""
+Bulk import of historical check-in datasets.
+
+Files (CSV, JSON Lines or Parquet) are read in chunks, validated against
+the check-in schema, and have every derived column (`burnout_index`,
+`conversation_rate`, `date_rate`, `persona_label`, `research_tags`)
+computed in vectorized form before being appended to a CheckinStore.
+
+Command line:
+
+    python ingest.py checkins.csv --store sqlite:///checkins.db
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from checkin_store import STORE_URL_ENV, CheckinStore, store_from_url
+from personas import label_personas
+from schema import CHECKIN_COLUMNS
+from tagging import DEFAULT_TAGGER
+
+CHUNK_ROWS = 50_000
+
+INGEST_FORMATS = ("csv", "jsonl", "parquet")
+
+REQUIRED_COLUMNS = ["user_id", "checkin_date", "dating_feel"]
+
+# Defaults for optional columns, matching what the Check-In Flow stores
+# when a participant has no profile or skipped a question.
+COLUMN_DEFAULTS = {
+    "age_bracket": "Prefer not to say",
+    "location_region": "",
+    "gender": "Prefer not to say",
+    "orientation": "Prefer not to say",
+    "neurotype": "Prefer not to say",
+    "dating_intention": "Exploring / not sure",
+    "goal": "I’m not sure yet",
+    "friction": "Something else / it changes a lot",
+    "matches": 0,
+    "conversations": 0,
+    "dates": 0,
+    "want_see_again": "N/A",
+    "standout_moment": "",
+    "burnout_note": "",
+}
+
+Source = Union[str, BinaryIO]
+
+
+class IngestError(ValueError):
+    """Raised when an input file cannot be imported at all."""
+
+
+def detect_format(name: str) -> str:
+    lower = name.lower()
+    for suffix in (".gz", ".bz2", ".zip", ".xz"):
+        if lower.endswith(suffix):
+            lower = lower[: -len(suffix)]
+    if lower.endswith(".csv"):
+        return "csv"
+    if lower.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    if lower.endswith((".parquet", ".pq")):
+        return "parquet"
+    raise IngestError(f"Cannot tell the format of {name!r}; expected one of {INGEST_FORMATS}")
+
+
+def read_chunks(source: Source, fmt: Optional[str] = None, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield `source` as DataFrames of at most `chunk_rows` rows."""
+    if fmt is None:
+        fmt = detect_format(source if isinstance(source, str) else getattr(source, "name", ""))
+
+    if fmt == "csv":
+        yield from pd.read_csv(source, chunksize=chunk_rows, dtype={"user_id": str})
+    elif fmt == "jsonl":
+        yield from pd.read_json(source, lines=True, chunksize=chunk_rows, dtype={"user_id": str})
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        raise IngestError(f"Unsupported import format: {fmt!r}")
+
+
+def prepare_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Validate one raw chunk and derive the computed columns.
+
+    Rows without a participant ID, with an unparseable check-in date or
+    with `dating_feel` outside 1–7 are dropped; the caller can compare
+    lengths to count them.
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise IngestError(f"Missing required column(s): {', '.join(missing)}")
+
+    df = chunk.reindex(columns=CHECKIN_COLUMNS).reset_index(drop=True)
+    for col, default in COLUMN_DEFAULTS.items():
+        df[col] = df[col].fillna(default)
+
+    user_id = df["user_id"].astype("string").str.strip()
+    checkin_date = pd.to_datetime(df["checkin_date"], errors="coerce", format="mixed")
+    dating_feel = pd.to_numeric(df["dating_feel"], errors="coerce")
+    valid = (
+        user_id.notna().to_numpy(bool, na_value=False)
+        & (user_id != "").to_numpy(bool, na_value=False)
+        & checkin_date.notna().to_numpy()
+        & dating_feel.between(1, 7).to_numpy()
+    )
+
+    df = df[valid].reset_index(drop=True)
+    df["user_id"] = user_id[valid].reset_index(drop=True)
+    df["checkin_date"] = checkin_date[valid].reset_index(drop=True)
+    df["dating_feel"] = dating_feel[valid].round().astype("int16").reset_index(drop=True)
+
+    counts = {}
+    for col in ("matches", "conversations", "dates"):
+        counts[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).clip(lower=0).to_numpy()
+        df[col] = counts[col]
+
+    # Derived metrics, same rules as the Check-In Flow.
+    df["burnout_index"] = 8 - df["dating_feel"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["conversation_rate"] = np.where(
+            counts["matches"] > 0, counts["conversations"] / counts["matches"], 0.0
+        )
+        df["date_rate"] = np.where(
+            counts["conversations"] > 0, counts["dates"] / counts["conversations"], 0.0
+        )
+    df["went_on_date"] = df["went_on_date"].fillna(
+        pd.Series(np.where(counts["dates"] > 0, "Yes", "No"), index=df.index)
+    )
+    df["persona_label"] = label_personas(df).astype(object)
+    df["research_tags"] = DEFAULT_TAGGER.tag_series(df["burnout_note"].astype(object))
+    df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce", format="mixed").fillna(
+        pd.Timestamp(datetime.utcnow())
+    )
+    return df
+
+
+def ingest(
+    source: Source,
+    store: CheckinStore,
+    fmt: Optional[str] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> Dict[str, float]:
+    """
+    Stream `source` into `store`. Returns counts of rows read, imported
+    and rejected, plus elapsed seconds and throughput.
+    """
+    started = time.perf_counter()
+    rows_read = rows_imported = 0
+    for chunk in read_chunks(source, fmt, chunk_rows):
+        rows_read += len(chunk)
+        prepared = prepare_chunk(chunk)
+        store.extend(prepared)
+        rows_imported += len(prepared)
+    store.persist()
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows_read": rows_read,
+        "rows_imported": rows_imported,
+        "rows_rejected": rows_read - rows_imported,
+        "seconds": seconds,
+        "rows_per_second": rows_imported / seconds if seconds > 0 else float("inf"),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-import check-ins into a durable check-in store.")
+    parser.add_argument("paths", nargs="+", help="CSV, JSON Lines or Parquet files")
+    parser.add_argument(
+        "--store",
+        default=os.environ.get(STORE_URL_ENV, ""),
+        help=f"Store URL, e.g. sqlite:///checkins.db (default: ${STORE_URL_ENV})",
+    )
+    parser.add_argument("--format", choices=INGEST_FORMATS, help="Override format detection")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    if not args.store:
+        parser.error(f"--store is required (or set {STORE_URL_ENV})")
+
+    # Don't load existing history: the import only appends.
+    store = store_from_url(args.store, preload=False)
+    for path in args.paths:
+        try:
+            report = ingest(path, store, args.format, args.chunk_rows)
+        except IngestError as exc:
+            print(f"{path}: {exc}", file=sys.stderr)
+            return 1
+        print(
+            f"{path}: imported {report['rows_imported']:,} of {report['rows_read']:,} rows "
+            f"({report['rows_rejected']:,} rejected) in {report['seconds']:.2f}s "
+            f"[{report['rows_per_second']:,.0f} rows/s]"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,420 @@
+"""
+Nudge experiment logic: arm assignment (see `assignment.py` and
+`bandits.py`), the follow-up nudge shown after a check-in, and the nudge
+dimension table check-ins are stored against.
+
+Nudge texts come from a fixed template catalog. Every template is parsed
+once, at import, into the literal pieces around its `{moment}`
+placeholder (other placeholders are filled in then and there), and the
+choice of template pool for an (arm, friction, answer) combination is
+computed once per distinct combination. A check-in stores the ID of the
+template it was shown, and the text is rendered from that ID and the
+check-in's standout moment when it is displayed. `select_templates` and
+`render_nudges` do the same for a whole table in one vectorized pass,
+drawing templates from a seeded generator so a batch is reproducible.
+"""
+import threading
+from functools import lru_cache
+from random import choice, randrange
+from string import Formatter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from assignment import NUDGE_EXPERIMENT
+from bandits import adaptive_arm
+from schema import CATEGORY_VOCABULARIES, NUDGE_ARMS, NUDGE_COLUMNS, NUDGE_TYPES
+
+SCRIPTED_TEMPLATES = [
+    "Hey, I had a really good time talking about **{moment}**. "
+    "Would you be up for **{suggestion}** sometime next week?",
+    "I’ve been thinking about our convo about **{moment}** — it was really fun. "
+    "Want to check out **{suggestion}** soon?",
+]
+
+REFLECTIVE_TEMPLATES = [
+    "Take 30 seconds to write down how you felt during the date, "
+    "especially around **{moment}**. That reflection can make your next step feel easier.",
+    "Before you decide what to do next, write one sentence: "
+    "“When we talked about **{moment}**, I felt…” Use that to choose your next step.",
+]
+
+PLANNING_TEMPLATES = [
+    "Pick a specific day and time you’d want to see them again, then send a message: "
+    "“Free **{suggestion}** for a round two?”",
+    "Open your calendar and block a tentative slot for a second date. "
+    "Then send a simple message suggesting that time.",
+]
+
+CLOSURE_TEMPLATES = [
+    "It’s okay not to want a second date. Take a moment to note one thing you appreciated "
+    "about the experience and one thing you’d like to look for differently next time.",
+]
+
+NO_DATE_TEMPLATES = [
+    "No date this week — that’s totally fine. "
+    "A very small commitment, like sending one message you feel good about next week, can still count as progress.",
+]
+
+# Used when a check-in has no standout moment.
+DEFAULT_MOMENT = "our conversation"
+# Placeholders filled in when the catalog is built.
+FIXED_FIELDS = {"suggestion": "later this week"}
+
+# Pool -> (nudge_type, templates). Template IDs are "<pool>-<n>", 1-based.
+TEMPLATE_POOLS: Dict[str, Tuple[str, List[str]]] = {
+    "scripted": ("Scripted", SCRIPTED_TEMPLATES),
+    "reflective": ("Reflective", REFLECTIVE_TEMPLATES),
+    "planning": ("Planning", PLANNING_TEMPLATES),
+    "closure": ("Reflective (closure)", CLOSURE_TEMPLATES),
+    "no-date": ("None (no date this week)", NO_DATE_TEMPLATES),
+}
+
+# Arm -> the pool it leads with; any other arm gets planning.
+ARM_POOLS = {"A": "scripted", "B": "reflective", "C": "planning"}
+# (substring of the lowercased friction, pool it switches to, arm that
+# keeps its own pool); the first rule that applies wins.
+FRICTION_RULES = [
+    ("overthink", "scripted", "B"),
+    ("rarely move to dates", "planning", "C"),
+]
+
+
+class NudgeTemplate:
+    """A catalog template, pre-split around its `{moment}` placeholder."""
+
+    def __init__(self, template_id: str, nudge_type: str, template: str):
+        self.template_id = template_id
+        self.nudge_type = nudge_type
+        self.template = template
+        parts, literal = [], []
+        for text, field, spec, conversion in Formatter().parse(template):
+            literal.append(text)
+            if field is None:
+                continue
+            if field == "moment":
+                parts.append("".join(literal))
+                literal = []
+            else:
+                literal.append(format(FIXED_FIELDS[field], spec or ""))
+        parts.append("".join(literal))
+        self._parts = tuple(parts)
+
+    def render(self, moment: Optional[str] = None) -> str:
+        return (moment or DEFAULT_MOMENT).join(self._parts)
+
+
+NUDGE_CATALOG: Dict[str, NudgeTemplate] = {
+    f"{pool}-{i}": NudgeTemplate(f"{pool}-{i}", nudge_type, template)
+    for pool, (nudge_type, templates) in TEMPLATE_POOLS.items()
+    for i, template in enumerate(templates, start=1)
+}
+TEMPLATE_IDS: List[str] = list(NUDGE_CATALOG)
+# Pool -> its template IDs, which are contiguous in TEMPLATE_IDS.
+POOL_TEMPLATES: Dict[str, Tuple[str, ...]] = {
+    pool: tuple(t for t in TEMPLATE_IDS if t.rsplit("-", 1)[0] == pool) for pool in TEMPLATE_POOLS
+}
+POOLS: List[str] = list(TEMPLATE_POOLS)
+
+
+def assign_experiment_arm(
+    user_id: Optional[str] = None,
+    mode: str = "hash",
+    outcomes=None,
+    rng: Optional[np.random.Generator] = None,
+) -> str:
+    """
+    Experiment arm (A/B/C) for nudges.
+
+    mode="hash":
+        With a `user_id`, the participant's fixed arm in the nudge
+        experiment (see `assignment.NUDGE_EXPERIMENT`), the same every
+        week; without one, a uniformly random arm.
+    mode="thompson" / "ucb":
+        Adaptive allocation (see `bandits.py`) from `outcomes`, the
+        store's per-arm `bandits.ArmOutcomes`.
+    """
+    if mode != "hash":
+        if outcomes is None:
+            raise ValueError(f"Allocation mode {mode!r} needs the store's arm outcomes")
+        return adaptive_arm(outcomes, mode, rng)
+    if user_id is None:
+        return choice(NUDGE_ARMS)
+    return NUDGE_EXPERIMENT.assign(user_id)
+
+
+@lru_cache(maxsize=4096)
+def template_pool(experiment_arm: str, friction: str, want_see_again: str, went_on_date: str = "Yes") -> str:
+    """
+    The template pool for a check-in:
+
+    experiment_arm:
+        A -> scripted focus
+        B -> reflective focus
+        C -> planning focus
+
+    adjusted for the declared friction (see FRICTION_RULES). A check-in
+    without a date gets the no-date nudge, and one that does not want a
+    second date the closure nudge.
+    """
+    if went_on_date != "Yes":
+        return "no-date"
+    if want_see_again.lower() == "no":
+        return "closure"
+    friction_lower = friction.lower()
+    for needle, pool, exempt_arm in FRICTION_RULES:
+        if needle in friction_lower and experiment_arm != exempt_arm:
+            return pool
+    return ARM_POOLS.get(experiment_arm, "planning")
+
+
+def select_template(
+    friction: str,
+    want_see_again: str,
+    experiment_arm: str,
+    went_on_date: str = "Yes",
+    rng: Optional[np.random.Generator] = None,
+) -> str:
+    """
+    Template ID for one check-in, drawn uniformly from its pool (see
+    `template_pool`); pass `rng` to make the draw reproducible.
+    """
+    pool = POOL_TEMPLATES[template_pool(experiment_arm, friction, want_see_again, went_on_date)]
+    return pool[int(rng.integers(len(pool))) if rng is not None else randrange(len(pool))]
+
+
+def render_nudge(template_id: str, standout_moment: Optional[str] = None) -> Tuple[str, str]:
+    """(nudge_type, nudge_text) of a catalog template for one check-in."""
+    template = NUDGE_CATALOG[template_id]
+    return template.nudge_type, template.render(standout_moment)
+
+
+def generate_nudge(
+    friction: str,
+    want_see_again: str,
+    standout_moment: str,
+    experiment_arm: str,
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[str, str]:
+    """
+    Returns (nudge_type, nudge_text) for a check-in that had a date;
+    `select_template` plus `render_nudge` in one call.
+    """
+    template_id = select_template(friction, want_see_again, experiment_arm, rng=rng)
+    return render_nudge(template_id, standout_moment)
+
+
+# (nudge_type, nudge_template, nudge_text); see NudgeDimension.
+Member = Tuple[str, Optional[str], Optional[str]]
+
+
+def _factorize(values) -> Tuple[np.ndarray, list]:
+    codes, uniques = pd.factorize(pd.Series(values))
+    return codes, [str(u) for u in uniques]
+
+
+def select_templates(
+    friction,
+    want_see_again,
+    experiment_arm,
+    went_on_date=None,
+    seed=None,
+) -> pd.Categorical:
+    """
+    `select_template` for every row of aligned columns (went_on_date
+    defaults to all "Yes"), as a Categorical over TEMPLATE_IDS. The pool
+    is looked up once per distinct combination of inputs, and templates
+    are drawn with `numpy.random.default_rng(seed)`: the same seed (or
+    generator state) gives the same templates.
+    """
+    rng = np.random.default_rng(seed)
+    columns = [_factorize(experiment_arm), _factorize(friction), _factorize(want_see_again)]
+    columns.append(
+        _factorize(went_on_date)
+        if went_on_date is not None
+        else (np.zeros(len(columns[0][0]), dtype=np.int64), ["Yes"])
+    )
+    # Missing values (code -1) take the extra last slot and count as "".
+    sizes = [len(uniques) + 1 for _, uniques in columns]
+    packed = np.ravel_multi_index(
+        [np.where(codes < 0, len(uniques), codes) for codes, uniques in columns], sizes
+    )
+    combo_codes, combos = pd.factorize(packed)
+    labels = [uniques + [""] for _, uniques in columns]
+    pools = np.array(
+        [
+            POOLS.index(template_pool(*(labels[d][c] for d, c in enumerate(combo))))
+            for combo in zip(*(i.tolist() for i in np.unravel_index(combos, sizes)))
+        ],
+        dtype=np.int64,
+    )[combo_codes]
+
+    sizes = np.array([len(POOL_TEMPLATES[p]) for p in POOLS])
+    offsets = np.array([TEMPLATE_IDS.index(POOL_TEMPLATES[p][0]) for p in POOLS])
+    picks = (rng.random(len(pools)) * sizes[pools]).astype(np.int64)
+    return pd.Categorical.from_codes(offsets[pools] + picks, categories=TEMPLATE_IDS)
+
+
+def _render(renderers: List[Callable[[Optional[str]], Optional[str]]], codes: np.ndarray, moments) -> pd.Categorical:
+    """
+    Nudge text for every row, where `codes` index `renderers` (-1 ->
+    missing). Each distinct (renderer, moment) pair is rendered once.
+    """
+    codes = np.asarray(codes)
+    moment_codes, moment_values = pd.factorize(pd.Series(moments, dtype=object))
+    moment_values = [str(m) for m in moment_values] + [None]
+    found = codes >= 0
+    packed = codes.astype(np.int64) * len(moment_values) + np.where(
+        moment_codes < 0, len(moment_values) - 1, moment_codes
+    )
+    pair_codes, pairs = pd.factorize(packed[found])
+    rendered = [renderers[p // len(moment_values)](moment_values[p % len(moment_values)]) for p in pairs.tolist()]
+    categories = sorted({t for t in rendered if t is not None})
+    position = {t: i for i, t in enumerate(categories)}
+    lookup = np.array([position.get(t, -1) for t in rendered] + [-1], dtype=np.int64)
+    text_codes = np.full(len(codes), -1, dtype=np.int64)
+    text_codes[found] = lookup[pair_codes]
+    return pd.Categorical.from_codes(text_codes, categories)
+
+
+def render_nudges(template_ids, standout_moments) -> Tuple[pd.Categorical, pd.Categorical]:
+    """
+    Vectorized `render_nudge`: (nudge_type, nudge_text) Categoricals for
+    aligned columns of template IDs and standout moments.
+    """
+    codes, uniques = _factorize(template_ids)
+    templates = [NUDGE_CATALOG[t] for t in uniques]
+    type_lookup = np.array([NUDGE_TYPES.index(t.nudge_type) for t in templates] + [-1], dtype=np.int64)
+    types = pd.Categorical.from_codes(type_lookup[codes], categories=NUDGE_TYPES)
+    return types, _render([t.render for t in templates], codes, standout_moments)
+
+
+class NudgeDimension:
+    """
+    Distinct nudges keyed by integer `nudge_id`: the nudge dimension of
+    the check-in star schema, so a stored check-in carries a small integer
+    instead of the full nudge text.
+
+    A member is (nudge_type, nudge_template, nudge_text). Nudges from the
+    catalog are stored by template ID alone (the text is rendered on read
+    from the check-in's standout moment); other nudges, e.g. imported
+    ones, keep their literal text. Members never change once added; IDs
+    follow insertion order, and new members are appended to `backend`
+    (if any) in that order.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.lock = threading.RLock()
+        self._ids: Dict[Member, int] = {}
+        self._members: List[Member] = []
+        self._columns: Optional[Dict[str, pd.Categorical]] = None
+
+        if backend is not None:
+            log = backend.load()
+            log = log.astype(object).where(log.notna(), None)
+            for member in zip(*(log[c] for c in NUDGE_COLUMNS)):
+                self._add(tuple(None if v is None else str(v) for v in member))
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def _add(self, member: Member) -> int:
+        if member not in self._ids:
+            self._ids[member] = len(self._members)
+            self._members.append(member)
+            self._columns = None
+        return self._ids[member]
+
+    def _persist(self, start: int):
+        if self.backend is not None and len(self._members) > start:
+            new = self._members[start:]
+            self.backend.append({c: [m[i] for m in new] for i, c in enumerate(NUDGE_COLUMNS)})
+
+    def ids(self, nudge_types, nudge_templates, nudge_texts) -> np.ndarray:
+        """
+        Nudge ID (int32) of every row of aligned columns, adding new
+        members. Rows without a nudge type get -1.
+        """
+        columns = [_factorize(nudge_types), _factorize(nudge_templates), _factorize(nudge_texts)]
+        # A template's text is rendered on read, so only rows without one keep theirs.
+        columns[2] = (np.where(columns[1][0] >= 0, -1, columns[2][0]), columns[2][1])
+        present = columns[0][0] >= 0
+        sizes = [len(uniques) + 1 for _, uniques in columns]
+        packed = np.ravel_multi_index(
+            [np.where(codes[present] < 0, len(uniques), codes[present]) for codes, uniques in columns],
+            sizes,
+        )
+        member_codes, members = pd.factorize(packed)
+        labels = [uniques + [None] for _, uniques in columns]
+        with self.lock:
+            added = len(self._members)
+            lookup = np.array(
+                [
+                    self._add(tuple(labels[d][c] for d, c in enumerate(combo)))
+                    for combo in zip(*(i.tolist() for i in np.unravel_index(members, sizes)))
+                ],
+                dtype=np.int32,
+            )
+            self._persist(added)
+        ids = np.full(len(present), -1, dtype=np.int32)
+        ids[present] = lookup[member_codes]
+        return ids
+
+    def id_of(self, nudge_type, nudge_template=None, nudge_text=None) -> int:
+        """`ids` for a single nudge."""
+        if not isinstance(nudge_type, str):
+            return -1
+        if isinstance(nudge_template, str):
+            member = (nudge_type, nudge_template, None)
+        else:
+            member = (nudge_type, None, nudge_text if isinstance(nudge_text, str) else None)
+        found = self._ids.get(member)
+        if found is not None:
+            return found
+        with self.lock:
+            added = len(self._members)
+            found = self._add(member)
+            self._persist(added)
+        return found
+
+    def _renderer(self, member: Member) -> Callable[[Optional[str]], Optional[str]]:
+        nudge_template, nudge_text = member[1], member[2]
+        if nudge_template is None:
+            return lambda moment: nudge_text
+        template = NUDGE_CATALOG.get(nudge_template)
+        # A template no longer in the catalog has no text to show.
+        return template.render if template is not None else lambda moment: None
+
+    def take(self, ids: np.ndarray, standout_moments=None) -> Dict[str, pd.Categorical]:
+        """
+        The NUDGE_COLUMNS of each nudge ID in `ids` (-1 -> missing), with
+        catalog texts rendered from the aligned `standout_moments`.
+        """
+        with self.lock:
+            if self._columns is None:
+                # Categoricals over the members, with the same category
+                # order coerce_schema would give the wide table.
+                self._columns = {}
+                for i, column in enumerate(NUDGE_COLUMNS[:2]):
+                    values = [m[i] for m in self._members]
+                    vocab = CATEGORY_VOCABULARIES.get(column, [])
+                    known = set(vocab)
+                    self._columns[column] = pd.Categorical(
+                        values,
+                        categories=vocab + sorted({v for v in values if v is not None and v not in known}),
+                    )
+            columns = self._columns
+            renderers = [self._renderer(m) for m in self._members]
+        ids = np.asarray(ids)
+        found = ids >= 0
+        taken = {}
+        for column, members in columns.items():
+            codes = np.full(len(ids), -1, dtype=np.int64)
+            codes[found] = members.codes[ids[found]]
+            taken[column] = pd.Categorical.from_codes(codes, members.categories)
+        if standout_moments is None:
+            standout_moments = [None] * len(ids)
+        taken["nudge_text"] = _render(renderers, ids, standout_moments)
+        return taken
@@ -0,0 +1,115 @@
+"""
+Derived persona labels.
+
+A label is four independent tags (neurotype, mood, goal, friction), each
+drawn from a tiny fixed set. Every possible label is precomputed once,
+so labelling is a matter of turning each input into a tag code and
+looking up the combined code, either for one check-in or for a whole
+DataFrame in a single vectorized pass.
+"""
+from functools import lru_cache
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+NEURODIVERGENT = frozenset(["ADHD / attention challenges", "Autistic / on the spectrum"])
+
+NEURO_TAGS = ["", "Neurodivergent "]
+MOOD_TAGS = ["Burnt-Out ", "Thoughtful ", "Optimistic "]
+GOAL_TAGS = ["", "Gentle ", "Intentional "]
+FRICTION_TAGS = [
+    "Overthinking Initiator",
+    "Hesitant Planner",
+    "Inconsistent Communicator",
+    "People-Pleaser Dater",
+    "Exploring Dater",
+]
+
+# (substring of the lowercased friction, FRICTION_TAGS index), first match wins
+FRICTION_RULES = [
+    ("overthink", 0),
+    ("rarely move to dates", 1),
+    ("consistent communication", 2),
+    ("not excited", 3),
+]
+GOAL_RULES = [
+    ("gentler, slower", 1),
+    ("intentional", 2),
+]
+
+# Every label, indexed by the combined code from `_combine`.
+PERSONA_LABELS = [
+    f"{n}{m}{g}{f}".strip()
+    for n, m, g, f in product(NEURO_TAGS, MOOD_TAGS, GOAL_TAGS, FRICTION_TAGS)
+]
+
+
+def _combine(neuro, mood, goal, friction):
+    return ((neuro * len(MOOD_TAGS) + mood) * len(GOAL_TAGS) + goal) * len(FRICTION_TAGS) + friction
+
+
+@lru_cache(maxsize=4096)
+def friction_code(friction: str) -> int:
+    friction_lower = friction.lower()
+    for needle, code in FRICTION_RULES:
+        if needle in friction_lower:
+            return code
+    return len(FRICTION_TAGS) - 1
+
+
+@lru_cache(maxsize=4096)
+def goal_code(goal: str) -> int:
+    goal_lower = goal.lower()
+    for needle, code in GOAL_RULES:
+        if needle in goal_lower:
+            return code
+    return 0
+
+
+def neuro_code(neurotype: str) -> int:
+    return 1 if neurotype in NEURODIVERGENT else 0
+
+
+def mood_codes(dating_feel) -> np.ndarray:
+    feel = np.asarray(dating_feel, dtype=float)
+    return np.where(feel <= 3, 0, np.where(feel >= 6, 2, 1))
+
+
+def generate_persona_label(
+    dating_feel: int, goal: str, friction: str, neurotype: str
+) -> str:
+    """
+    Simple derived persona label to help reason about
+    segments and patterns. Not meant as a production taxonomy.
+    """
+    code = _combine(
+        neuro_code(neurotype),
+        int(mood_codes(dating_feel)),
+        goal_code(goal),
+        friction_code(friction),
+    )
+    return PERSONA_LABELS[code]
+
+
+def _column_codes(values: pd.Series, to_code) -> np.ndarray:
+    """Apply `to_code` once per distinct value, then broadcast by position."""
+    codes, uniques = pd.factorize(values)
+    table = np.array([to_code(str(u)) for u in uniques] + [to_code("")], dtype=np.int64)
+    codes = np.where(codes < 0, len(uniques), codes)
+    return table[codes]
+
+
+def label_personas(frame: pd.DataFrame) -> pd.Series:
+    """
+    Persona labels for every row of `frame` (needs `dating_feel`, `goal`,
+    `friction` and `neurotype`), as a categorical Series aligned with it.
+    """
+    combined = _combine(
+        _column_codes(frame["neurotype"], neuro_code),
+        mood_codes(frame["dating_feel"]),
+        _column_codes(frame["goal"], goal_code),
+        _column_codes(frame["friction"], friction_code),
+    )
+    labels = pd.Categorical.from_codes(combined, categories=PERSONA_LABELS)
+    return pd.Series(labels, index=frame.index, name="persona_label")
@@ -0,0 +1,250 @@
+"""
+Headless rerun profiler for app.py.
+
+Drives the app through `streamlit.testing` AppTest (no browser, no
+server) on a synthetic dataset of a chosen size: one cold start, then
+each view in the sidebar radio. For every step it records wall time, a
+cProfile of the script thread and the tracemalloc peak, and writes
+
+    OUT/<step>.prof        pstats file (snakeviz, gprof2dot, flameprof ...)
+    OUT/<step>.collapsed   folded stacks for flamegraph.pl / speedscope
+    OUT/<step>.alloc.txt   top allocation sites at the peak
+    OUT/summary.json       timings, peaks and the app's own section trace
+
+Like benchmarks.py it can save a baseline and fail on regressions:
+
+    python profile_app.py --participants 10000 --weeks 10 --out profile/
+    python profile_app.py --participants 10000 --weeks 10 --compare
+"""
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from benchmarks import compare
+from synthetic import SEED_PARTICIPANTS_ENV, SEED_WEEKS_ENV, participant_ids
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DEFAULT_BASELINE = "profile_baseline.json"
+DEFAULT_OUT = "profile"
+TOP_ALLOCATIONS = 25
+# Traces of the app's own timed sections (see diagnostics.py).
+TRACES_KEY = "rerun_traces"
+
+
+@contextmanager
+def profile_script_threads(profiler: cProfile.Profile) -> Iterator[None]:
+    """
+    Enable `profiler` in every thread started inside the block. AppTest
+    runs the script in its own thread, which a plain `profiler.enable()`
+    on the calling thread would not see.
+    """
+
+    def start(*_):
+        sys.setprofile(None)
+        profiler.enable()
+
+    threading.setprofile(start)
+    try:
+        yield
+    finally:
+        threading.setprofile(None)
+        profiler.disable()
+
+
+def _label(func) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(stats: pstats.Stats, min_seconds: float = 1e-5) -> List[str]:
+    """
+    Folded "root;caller;callee microseconds" lines reconstructed from the
+    cProfile call graph. cProfile keeps only caller -> callee edges, so a
+    function's time is split across its call paths in proportion to each
+    edge's cumulative time (the approximation flameprof uses too).
+    """
+    table = stats.stats
+    callees: Dict[tuple, Dict[tuple, float]] = defaultdict(dict)
+    for func, (_, _, _, _, callers) in table.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]
+
+    folded: Counter = Counter()
+
+    def walk(func, path, labels, cumulative):
+        total = table[func][3]
+        scale = cumulative / total if total else 0.0
+        folded[";".join(labels)] += table[func][2] * scale
+        for callee, edge_cumulative in callees[func].items():
+            share = edge_cumulative * scale
+            if callee in path or callee not in table or share < min_seconds:
+                continue
+            walk(callee, path | {callee}, labels + [_label(callee)], share)
+
+    for func, entry in table.items():
+        if not entry[4]:
+            walk(func, {func}, [_label(func)], entry[3])
+    return [f"{stack} {round(seconds * 1e6)}" for stack, seconds in folded.items() if seconds >= min_seconds]
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def _app_trace(at) -> Optional[Dict]:
+    traces = at.session_state[TRACES_KEY] if TRACES_KEY in at.session_state else None
+    return traces[-1].to_dict() if traces else None
+
+
+def profile_step(name: str, step, out_dir: str) -> Dict:
+    """Run `step()` (one AppTest run) under cProfile and tracemalloc."""
+    profiler = cProfile.Profile()
+    tracemalloc.start(25)
+    try:
+        started = time.perf_counter()
+        with profile_script_threads(profiler):
+            at = step()
+        seconds = time.perf_counter() - started
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    slug = _slug(name)
+    profiler.dump_stats(os.path.join(out_dir, f"{slug}.prof"))
+    stats = pstats.Stats(profiler)
+    with open(os.path.join(out_dir, f"{slug}.collapsed"), "w") as f:
+        f.write("\n".join(collapsed_stacks(stats)) + "\n")
+    with open(os.path.join(out_dir, f"{slug}.alloc.txt"), "w") as f:
+        for stat in snapshot.statistics("traceback")[:TOP_ALLOCATIONS]:
+            f.write(f"{stat.size / 2**20:.2f} MiB in {stat.count} blocks\n")
+            f.write("\n".join(stat.traceback.format(limit=8)) + "\n\n")
+
+    return {
+        "profiled_seconds": seconds,
+        "peak_bytes": peak,
+        "exceptions": [str(e.value) for e in at.exception],
+        "app_trace": _app_trace(at),
+    }
+
+
+def run_profile(participants: int, weeks: int, out_dir: str, timeout: float) -> Dict[str, Dict]:
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    os.environ[SEED_PARTICIPANTS_ENV] = str(participants)
+    os.environ[SEED_WEEKS_ENV] = str(weeks)
+    os.makedirs(out_dir, exist_ok=True)
+    # A seeded participant, so the per-participant views have rows to show.
+    participant_id = participant_ids(participants)[0]
+
+    def fresh_app():
+        # The check-in store is a process-wide cache_resource: clear it so
+        # the start-up step really seeds (and pays for) the dataset again.
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        at.run()
+        at.sidebar.text_input[0].input(participant_id)
+        return at
+
+    results: Dict[str, Dict] = {}
+
+    # Cold start: once for wall time, once under the profiler.
+    at = fresh_app()
+    started = time.perf_counter()
+    at.run()
+    startup = {"seconds": time.perf_counter() - started}
+    at = fresh_app()
+    startup.update(profile_step("startup", at.run, out_dir))
+    results["startup"] = startup
+    print(f"{'startup':<45} {startup['seconds']:>8.3f} s  peak {startup['peak_bytes'] / 2**20:>8.1f} MiB")
+
+    for page in at.sidebar.radio[0].options:
+        started = time.perf_counter()
+        at.sidebar.radio[0].set_value(page).run()
+        first_visit = time.perf_counter() - started
+        started = time.perf_counter()
+        at.run()
+        result = {"first_visit_seconds": first_visit, "seconds": time.perf_counter() - started}
+        result.update(profile_step(f"page {page}", at.run, out_dir))
+        results[page] = result
+        print(
+            f"{page:<45} {result['seconds']:>8.3f} s  peak {result['peak_bytes'] / 2**20:>8.1f} MiB"
+            f"  (first visit {first_visit:.3f} s)"
+        )
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Profile headless reruns of app.py per sidebar view.")
+    parser.add_argument("--participants", type=int, default=1000)
+    parser.add_argument("--weeks", type=int, default=10)
+    parser.add_argument("--out", default=DEFAULT_OUT, help="Directory for .prof / .collapsed / summary.json")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds allowed per script run")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Fail on regressions against --baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.5)
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.25,
+        help="Timings below this are compared against it (reruns are noisy)",
+    )
+    args = parser.parse_args(argv)
+    if args.participants < 1:
+        parser.error("--participants must be at least 1 (the profile runs as a seeded participant)")
+
+    results = run_profile(args.participants, args.weeks, args.out, args.timeout)
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump(
+            {"participants": args.participants, "weeks": args.weeks, "steps": results},
+            f,
+            indent=2,
+            default=str,
+        )
+
+    rows = args.participants * args.weeks
+    measured = {
+        f"{name}[{rows}]": {"seconds": r["seconds"], "peak_bytes": r["peak_bytes"]}
+        for name, r in results.items()
+    }
+    failed = [f"{name}: {r['exceptions']}" for name, r in results.items() if r["exceptions"]]
+    if args.save_baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            baseline = {}
+        baseline.update(measured)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"saved {len(measured)} results to {args.baseline}")
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failed += compare(
+            measured, baseline, args.time_tolerance, args.memory_tolerance, args.min_seconds
+        )
+
+    for line in failed:
+        print(f"FAILED {line}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
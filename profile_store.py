@@ -0,0 +1,255 @@
+"""
+Participant profile storage.
+
+Profiles are one small row per participant that changes rarely, so they
+live apart from the check-ins: `ProfileStore` keeps the latest profile
+of every participant in a dict (O(1) lookup by user ID), persists each
+change to the same durable backend as the check-ins (a "profiles" table,
+or a "profiles" subdirectory for Parquet), and attaches profile fields
+to check-in rows with a positional join when a view asks for them.
+
+It is also the participant dimension of the check-in star schema (see
+`schema.FACT_COLUMNS`): every participant has a stable integer
+`participant_id`, the order in which they were first stored, which
+stored check-ins use instead of repeating the profile columns.
+
+The backend is used as an append log: a profile edit appends a new row
+and the last row per participant wins on load, while IDs follow each
+participant's first row.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from schema import CATEGORY_VOCABULARIES, PARTICIPANT_COLUMNS
+
+PROFILE_DEFAULTS: Dict[str, str] = {
+    "age_bracket": "Prefer not to say",
+    "gender": "Prefer not to say",
+    "orientation": "Prefer not to say",
+    "neurotype": "Prefer not to say",
+    "dating_intention": "Exploring / not sure",
+    "location_region": "",
+    "additional_notes": "",
+}
+PROFILE_FIELDS: List[str] = list(PROFILE_DEFAULTS)
+PROFILE_COLUMNS: List[str] = ["user_id"] + PROFILE_FIELDS
+
+# Profile fields that are also segmentation columns of a check-in row.
+SEGMENT_FIELDS: List[str] = [c for c in PARTICIPANT_COLUMNS if c != "user_id"]
+
+
+def _present(value) -> bool:
+    if isinstance(value, str):
+        return True
+    return value is not None and not pd.isna(value)
+
+
+def _categorical(field: str, values: list) -> pd.Categorical:
+    vocab = CATEGORY_VOCABULARIES.get(field, [])
+    known = set(vocab)
+    return pd.Categorical(values, categories=vocab + sorted({v for v in values if v not in known}))
+
+
+def _fill_missing(values: pd.Categorical, fallback: pd.Series) -> pd.Categorical:
+    """`values` with missing entries taken from the categorical `fallback`."""
+    categories = values.categories.union(fallback.cat.categories, sort=False)
+    primary = values.set_categories(categories).codes
+    backup = fallback.cat.set_categories(categories).cat.codes.to_numpy()
+    return pd.Categorical.from_codes(np.where(primary >= 0, primary, backup), categories)
+
+
+def profiles_from_checkins(checkins: pd.DataFrame) -> pd.DataFrame:
+    """Each participant's segmentation fields as of their latest check-in row."""
+    latest = checkins.drop_duplicates("user_id", keep="last")
+    return latest.reindex(columns=PARTICIPANT_COLUMNS)
+
+
+class ProfileStore:
+    """
+    Latest profile per participant, optionally persisted to `backend`
+    (see `checkin_store.backend_from_url`). Safe to share between
+    Streamlit sessions.
+
+    `version` changes whenever anything is stored; `revision` only when
+    an existing participant's segmentation fields (SEGMENT_FIELDS) are
+    edited, i.e. when views joined from earlier profiles have gone stale.
+    `edits` logs, one entry per revision, the edited participant and the
+    segment values they had before (see `edited_since`).
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.version = 0
+        self.revision = 0
+        self.edits: List[Tuple[str, Dict[str, str]]] = []
+        self.lock = threading.RLock()
+        # Insertion order = participant ID order.
+        self._profiles: Dict[str, Dict[str, str]] = {}
+        self._ids: Dict[str, int] = {}
+        self._frame: Optional[pd.DataFrame] = None
+
+        if backend is not None:
+            log = backend.load()
+            if not log.empty:
+                log["user_id"] = log["user_id"].astype(str)
+                first_seen = pd.unique(log["user_id"])
+                latest = log.drop_duplicates("user_id", keep="last").set_index("user_id")
+                for user_id, row in zip(first_seen, latest.reindex(first_seen).to_dict("records")):
+                    self._add(user_id, row)
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._profiles
+
+    # ---------------------------------------------------
+    # Writes
+    # ---------------------------------------------------
+    def _add(self, user_id: str, row: Dict) -> bool:
+        """Merge `row` into `user_id`'s profile; True if anything changed."""
+        current = self._profiles.get(user_id)
+        profile = dict(current or PROFILE_DEFAULTS)
+        for field in PROFILE_FIELDS:
+            value = row.get(field)
+            if _present(value):
+                profile[field] = str(value)
+        if profile == current:
+            return False
+        if current is None:
+            self._ids[user_id] = len(self._ids)
+        elif any(profile[f] != current[f] for f in SEGMENT_FIELDS):
+            self.edits.append((user_id, {f: current[f] for f in SEGMENT_FIELDS}))
+            self.revision += 1
+        self._profiles[user_id] = profile
+        return True
+
+    def save(self, user_id: str, profile: Dict) -> int:
+        """Store or update one participant's profile; returns their ID."""
+        self.extend([dict(profile, user_id=user_id)])
+        return self._ids[str(user_id)]
+
+    def extend(self, profiles: Iterable[Dict]):
+        """
+        Store many profiles at once; rows need a `user_id`. Fields that a
+        row leaves out (or leaves empty) keep their stored value.
+        """
+        if isinstance(profiles, pd.DataFrame):
+            profiles = profiles.to_dict("records")
+        with self.lock:
+            block: Dict[str, list] = {c: [] for c in PROFILE_COLUMNS}
+            for row in profiles:
+                user_id = str(row["user_id"])
+                if not self._add(user_id, row):
+                    continue
+                block["user_id"].append(user_id)
+                for field, value in self._profiles[user_id].items():
+                    block[field].append(value)
+            if not block["user_id"]:
+                return
+            if self.backend is not None:
+                self.backend.append(block)
+            self.version += 1
+            if self._frame is not None:
+                self._frame = self._patched(block["user_id"])
+
+    def _patched(self, user_ids: List[str]) -> pd.DataFrame:
+        """
+        A new `frame()` with the stored profiles of `user_ids` (edited or
+        new participants) applied to the cached one, without rebuilding
+        the unchanged rows.
+        """
+        frame = self._frame
+        users = list(dict.fromkeys(user_ids))
+        added = [u for u in users if self._ids[u] >= len(frame)]
+        positions = np.array([self._ids[u] for u in users], dtype=np.int64)
+        columns = {}
+        for field in ["user_id"] + PROFILE_FIELDS:
+            column = frame[field].array
+            values = pd.Index(users if field == "user_id" else [self._profiles[u][field] for u in users])
+            unseen = values[column.categories.get_indexer(values) < 0].unique()
+            if len(unseen):
+                column = column.add_categories(unseen)
+            codes = np.append(column.codes, np.full(len(added), -1, dtype=column.codes.dtype))
+            codes[positions] = column.categories.get_indexer(values)
+            columns[field] = pd.Categorical.from_codes(codes, column.categories)
+        index = frame.index.append(pd.Index(added, name="user_id", dtype=object)) if added else frame.index
+        return pd.DataFrame(columns, index=index)
+
+    # ---------------------------------------------------
+    # Reads
+    # ---------------------------------------------------
+    def get(self, user_id: str) -> Dict[str, str]:
+        """The stored profile, or an empty dict if there is none."""
+        return dict(self._profiles.get(user_id, {}))
+
+    def resolve(self, user_id: str) -> Dict[str, str]:
+        """The stored profile, with PROFILE_DEFAULTS for a new participant."""
+        return dict(self._profiles.get(user_id, PROFILE_DEFAULTS))
+
+    def edited_since(self, revision: int) -> Dict[str, Dict[str, str]]:
+        """
+        Participants whose segment fields were edited after `revision`,
+        each with the segment values they had at `revision`.
+        """
+        with self.lock:
+            before: Dict[str, Dict[str, str]] = {}
+            for user_id, previous in self.edits[revision:]:
+                before.setdefault(user_id, previous)
+            return before
+
+    def id_of(self, user_id) -> int:
+        """Participant ID of `user_id`, or -1 if unknown."""
+        return self._ids.get(user_id, -1)
+
+    def ids(self, user_ids) -> np.ndarray:
+        """Vectorized `id_of` (int32), looking each distinct user up once."""
+        codes, uniques = pd.factorize(pd.Series(user_ids))
+        lookup = np.array([self._ids.get(str(u), -1) for u in uniques] + [-1], dtype=np.int32)
+        return lookup[codes]
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Every profile as a categorical table in participant ID order
+        (row position = ID), with the user ID both as index and column.
+        Read-only.
+        """
+        with self.lock:
+            if self._frame is None:
+                users = list(self._profiles)
+                rows = list(self._profiles.values())
+                columns = {"user_id": _categorical("user_id", users)}
+                columns.update({f: _categorical(f, [r[f] for r in rows]) for f in PROFILE_FIELDS})
+                self._frame = pd.DataFrame(columns, index=pd.Index(users, name="user_id", dtype=object))
+            return self._frame
+
+    def take(self, ids: np.ndarray, fields: Iterable[str] = PARTICIPANT_COLUMNS) -> Dict[str, pd.Categorical]:
+        """Profile `fields` for each participant ID in `ids` (-1 -> missing)."""
+        profiles = self.frame()
+        ids = np.asarray(ids)
+        found = ids >= 0
+        taken = {}
+        for field in fields:
+            column = profiles[field].array
+            codes = np.full(len(ids), -1, dtype=np.int64)
+            codes[found] = column.codes[ids[found]]
+            taken[field] = pd.Categorical.from_codes(codes, column.categories)
+        return taken
+
+    def join(self, checkins: pd.DataFrame, fields: Iterable[str] = SEGMENT_FIELDS) -> pd.DataFrame:
+        """
+        `checkins` with `fields` taken from each participant's current
+        profile. Rows of participants without a stored profile keep the
+        values they already carry (if any).
+        """
+        ids = self.ids(checkins["user_id"])
+        found = ids >= 0
+        joined = {}
+        for field, values in self.take(ids, fields).items():
+            if field in checkins and not found.all():
+                values = _fill_missing(values, checkins[field].astype("category"))
+            joined[field] = pd.Series(values, index=checkins.index)
+        return checkins.assign(**joined)
@@ -0,0 +1,204 @@
+"""
+Materialized weekly rollups.
+
+Most study questions (burnout trend over a few weeks, arm effects by
+segment) only need per-week, per-segment aggregates. `WeeklyRollup`
+keeps exactly those, one cell per (ISO week, nudge_arm, neurotype,
+dating_intention, location_region), updated on every write alongside
+the store's other running aggregates. Any dashboard slice that does not
+filter on a single participant is answered by merging a few thousand
+cells instead of scanning check-in rows.
+"""
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from aggregations import (
+    COUNTED_COLUMNS,
+    METRIC_COLUMNS,
+    TAGS,
+    RunningAggregates,
+    RunningStats,
+)
+from charts import week_start
+
+ROLLUP_COLUMNS = ("nudge_arm", "neurotype", "dating_intention", "location_region")
+# Cell key: (week start, *ROLLUP_COLUMNS); missing values are None.
+Cell = Tuple[pd.Timestamp, ...]
+
+
+def _missing(value) -> bool:
+    return value is None or (not isinstance(value, str) and pd.isna(value))
+
+
+def _factorize(values: pd.Series):
+    codes, uniques = pd.factorize(values)
+    return codes, np.asarray(uniques, dtype=object).tolist()
+
+
+def _week(value) -> pd.Timestamp:
+    return pd.Timestamp(week_start(np.array([value], dtype="datetime64[ns]"))[0])
+
+
+def _profile(row: Dict) -> tuple:
+    return tuple(None if _missing(row.get(c)) else row.get(c) for c in ROLLUP_COLUMNS)
+
+
+def _combine(columns: List[Tuple[np.ndarray, list]]) -> Tuple[np.ndarray, List[tuple]]:
+    """
+    Composite key over factorized columns: a code per row and the tuple of
+    values each code stands for. Missing values (code -1) become None.
+    """
+    sizes = [len(u) + 1 for _, u in columns]
+    # Mixed-radix packing into one int64, so a 1-D hash factorize does
+    # the work of a (much slower) row-wise np.unique.
+    packed = np.ravel_multi_index([np.where(c < 0, len(u), c) for c, u in columns], sizes)
+    key_codes, combos = pd.factorize(packed)
+    labels = [list(u) + [None] for _, u in columns]
+    keys = [
+        tuple(labels[d][code] for d, code in enumerate(combo))
+        for combo in zip(*(i.tolist() for i in np.unravel_index(combos, sizes)))
+    ]
+    return key_codes, keys
+
+
+class WeeklyRollup(RunningAggregates):
+    """
+    `RunningAggregates` whose segments are rollup cells: each row belongs
+    to exactly one cell, which holds its row count, metric statistics and
+    frequency tables.
+
+    Participant IDs are not counted per cell (that would be one entry per
+    participant per week); `participants` instead counts check-ins per
+    participant for each combination of ROLLUP_COLUMNS, which is enough
+    to count distinct participants for any dimension filter.
+    """
+
+    counted = tuple(c for c in COUNTED_COLUMNS if c != "user_id")
+
+    def __init__(self):
+        super().__init__()
+        self.participants: Dict[tuple, Counter] = {}
+
+    def _segments(self, row: Dict) -> Iterator[Cell]:
+        if _missing(row.get("checkin_date")):
+            return
+        yield (_week(row["checkin_date"]),) + _profile(row)
+
+    def _segment_codes(self, frame: pd.DataFrame) -> Iterator[Tuple[np.ndarray, List[Cell]]]:
+        dates = frame["checkin_date"].to_numpy(dtype="datetime64[ns]")
+        week_codes, weeks = pd.factorize(week_start(dates))
+        week_codes[pd.isna(dates)] = -1
+        columns = [(week_codes, [pd.Timestamp(w) for w in weeks])]
+        key_codes, cells = _combine(columns + [_factorize(frame[c]) for c in ROLLUP_COLUMNS])
+        # A missing week drops the row.
+        key_codes[week_codes < 0] = -1
+        yield key_codes, cells
+
+    def update(self, row: Dict):
+        super().update(row)
+        if not _missing(row.get("user_id")):
+            self.participants.setdefault(_profile(row), Counter())[row["user_id"]] += 1
+
+    def update_frame(self, frame: pd.DataFrame, sign: int = 1):
+        super().update_frame(frame, sign)
+        if frame.empty:
+            return
+        profile_codes, profiles = _combine([_factorize(frame[c]) for c in ROLLUP_COLUMNS])
+        user_codes, users = _factorize(frame["user_id"])
+        ok = user_codes >= 0
+        combined = profile_codes[ok] * len(users) + user_codes[ok]
+        combos, counts = np.unique(combined, return_counts=True)
+        profile_of, user_of = np.divmod(combos, len(users))
+        # `combos` is sorted, so each profile's participants are contiguous.
+        starts = np.flatnonzero(np.diff(profile_of, prepend=-1))
+        users = np.asarray(users, dtype=object)
+        for start, stop in zip(starts.tolist(), np.append(starts[1:], len(combos)).tolist()):
+            counter = self.participants.setdefault(profiles[profile_of[start]], Counter())
+            touched = users[user_of[start:stop]].tolist()
+            counter.update(dict(zip(touched, (sign * counts[start:stop]).tolist())))
+            if sign < 0:
+                for user in touched:
+                    if counter[user] <= 0:
+                        del counter[user]
+                if not counter:
+                    del self.participants[profiles[profile_of[start]]]
+
+    # ---------------------------------------------------
+    # Lookups
+    # ---------------------------------------------------
+    def cells(self, **filters) -> List[Cell]:
+        """Cells matching every `column=value` filter over ROLLUP_COLUMNS."""
+        unknown = set(filters) - set(ROLLUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"Not a rollup dimension: {', '.join(sorted(unknown))}")
+        wanted = [(ROLLUP_COLUMNS.index(c) + 1, v) for c, v in filters.items()]
+        return [cell for cell in self.rows if all(cell[i] == v for i, v in wanted)]
+
+    def distinct_participants(self, **filters) -> int:
+        """Participants with at least one check-in matching the filters."""
+        wanted = [(ROLLUP_COLUMNS.index(c), v) for c, v in filters.items()]
+        users = set()
+        for profile, counter in self.participants.items():
+            if all(profile[i] == v for i, v in wanted):
+                users.update(counter)
+        return len(users)
+
+    def summary(self, **filters) -> Dict[str, object]:
+        """
+        The dashboard's slice aggregates (see `aggregations.summarize_slice`)
+        merged from the matching cells.
+        """
+        cells = self.cells(**filters)
+        stats = {m: RunningStats() for m in METRIC_COLUMNS}
+        weekly: Dict[pd.Timestamp, RunningStats] = {}
+        counts = {c: Counter() for c in self.counted + (TAGS,)}
+        for cell in cells:
+            for metric, total in stats.items():
+                part = self.stats.get((cell, metric))
+                if part is not None:
+                    total.merge(part.count, part.total, part.total_sq)
+            part = self.stats.get((cell, "dating_feel"))
+            if part is not None:
+                weekly.setdefault(cell[0], RunningStats()).merge(part.count, part.total, part.total_sq)
+            for column, counter in counts.items():
+                counter.update(self.counts.get((cell, column), {}))
+
+        def frequencies(column: str) -> pd.Series:
+            return pd.Series(
+                dict(counts[column].most_common()), name="count", dtype="int64"
+            ).rename_axis(column)
+
+        weeks = sorted(weekly)
+        tag_counts = frequencies(TAGS)
+        return {
+            "total_checkins": sum(self.rows[cell] for cell in cells),
+            "unique_participants": self.distinct_participants(**filters),
+            "avg_dating_feel": stats["dating_feel"].mean,
+            "avg_burnout_index": stats["burnout_index"].mean,
+            "mood_series": pd.DataFrame(
+                {"dating_feel": [weekly[w].mean for w in weeks]},
+                index=pd.DatetimeIndex(weeks, name="week"),
+            ),
+            "nudge_counts": frequencies("nudge_type").reset_index(name="count"),
+            "goal_counts": frequencies("goal").to_frame(),
+            "friction_counts": frequencies("friction").to_frame(),
+            "persona_counts": frequencies("persona_label").to_frame(),
+            "tag_counts": tag_counts.to_frame() if not tag_counts.empty else None,
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        """The rollup as a table: one row per cell, check-ins and metric means."""
+        records = []
+        for cell, rows in self.rows.items():
+            record = dict(zip(("week",) + ROLLUP_COLUMNS, cell), checkins=rows)
+            for metric in METRIC_COLUMNS:
+                part = self.stats.get((cell, metric))
+                record[f"{metric}_mean"] = part.mean if part is not None else float("nan")
+            records.append(record)
+        columns = ["week", *ROLLUP_COLUMNS, "checkins"] + [f"{m}_mean" for m in METRIC_COLUMNS]
+        return pd.DataFrame.from_records(records, columns=columns).sort_values(
+            ["week", *ROLLUP_COLUMNS], ignore_index=True
+        )
@@ -0,0 +1,286 @@
+"""
+Check-in table schema and the answer vocabularies behind it.
+
+Most check-in columns take one of a handful of long strings, so they are
+stored as pandas Categoricals (integer codes plus one copy of each
+label). Counts are int16, rates float32 and dates datetime64, which
+keeps the table several times smaller than all-object columns and lets
+filters and `value_counts` work on integer codes.
+"""
+from datetime import date, datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------
+# Answer vocabularies (order = order shown in the UI)
+# ---------------------------------------------------
+AGE_BRACKETS = ["Prefer not to say", "18–24", "25–29", "30–34", "35–39", "40+"]
+GENDERS = [
+    "Prefer not to say",
+    "Woman",
+    "Man",
+    "Non-binary",
+    "Multiple / fluid",
+    "Self-describe in notes",
+]
+ORIENTATIONS = [
+    "Prefer not to say",
+    "Straight",
+    "Gay",
+    "Lesbian",
+    "Bi / pan",
+    "Queer",
+    "Other / self-describe",
+]
+NEUROTYPES = [
+    "Prefer not to say",
+    "ADHD / attention challenges",
+    "Autistic / on the spectrum",
+    "Other neurodivergence",
+    "Neurotypical (self-described)",
+]
+DATING_INTENTIONS = [
+    "Exploring / not sure",
+    "Primarily looking for a long-term relationship",
+    "Short-term / casual first",
+    "Friendship / low pressure",
+    "Taking a break but still curious",
+]
+GOALS = [
+    "Go on at least one date",
+    "Be more intentional about who I match with",
+    "Be more honest about what I want",
+    "Take a gentler, slower approach to dating",
+    "I’m not sure yet",
+]
+FRICTIONS = [
+    "I match but rarely move to dates",
+    "I overthink sending messages",
+    "I say yes to dates I’m not excited about",
+    "I struggle with consistent communication",
+    "Something else / it changes a lot",
+]
+WENT_ON_DATE = ["No", "Yes"]
+WANT_SEE_AGAIN = ["Yes", "Not sure", "No", "N/A"]
+NUDGE_ARMS = ["A", "B", "C"]
+NUDGE_TYPES = [
+    "Scripted",
+    "Reflective",
+    "Planning",
+    "Reflective (closure)",
+    "None (no date this week)",
+]
+
+CHECKIN_COLUMNS = [
+    # Identity / segmentation
+    "user_id",
+    "age_bracket",
+    "location_region",
+    "gender",
+    "orientation",
+    "neurotype",
+    "dating_intention",
+    # Check-in meta
+    "checkin_date",
+    "dating_feel",
+    "burnout_index",
+    "goal",
+    "friction",
+    # Behavioral data
+    "matches",
+    "conversations",
+    "dates",
+    "conversation_rate",
+    "date_rate",
+    # Date & follow-through
+    "went_on_date",
+    "want_see_again",
+    "standout_moment",
+    "nudge_arm",
+    "nudge_type",
+    "nudge_template",
+    "nudge_text",
+    # Qualitative
+    "burnout_note",
+    "research_tags",
+    # Derived
+    "persona_label",
+    "created_at",
+]
+
+# Star schema: a stored check-in (fact) row keeps only per-check-in
+# values and refers to its participant (profile columns) and its nudge by
+# integer ID. The wide CHECKIN_COLUMNS view is rebuilt by joining.
+PARTICIPANT_COLUMNS = [
+    "user_id",
+    "age_bracket",
+    "location_region",
+    "gender",
+    "orientation",
+    "neurotype",
+    "dating_intention",
+]
+NUDGE_COLUMNS = ["nudge_type", "nudge_template", "nudge_text"]
+ID_COLUMNS = ["participant_id", "nudge_id"]
+FACT_COLUMNS = ID_COLUMNS + [
+    c for c in CHECKIN_COLUMNS if c not in PARTICIPANT_COLUMNS + NUDGE_COLUMNS
+]
+
+# Categorical columns with a known vocabulary. Values outside it are
+# still accepted and appended as extra categories.
+CATEGORY_VOCABULARIES: Dict[str, List[str]] = {
+    "age_bracket": AGE_BRACKETS,
+    "gender": GENDERS,
+    "orientation": ORIENTATIONS,
+    "neurotype": NEUROTYPES,
+    "dating_intention": DATING_INTENTIONS,
+    "goal": GOALS,
+    "friction": FRICTIONS,
+    "went_on_date": WENT_ON_DATE,
+    "want_see_again": WANT_SEE_AGAIN,
+    "nudge_arm": NUDGE_ARMS,
+    "nudge_type": NUDGE_TYPES,
+}
+
+# Option -> position in its vocabulary, for selectbox `index=` lookups.
+OPTION_INDEX: Dict[str, Dict[str, int]] = {
+    col: {option: i for i, option in enumerate(vocab)}
+    for col, vocab in CATEGORY_VOCABULARIES.items()
+}
+
+# Categorical columns whose categories are simply the values seen so far.
+OPEN_CATEGORY_COLUMNS = [
+    "user_id",
+    "location_region",
+    "nudge_template",
+    "persona_label",
+    "research_tags",
+]
+
+CATEGORY_COLUMNS = list(CATEGORY_VOCABULARIES) + OPEN_CATEGORY_COLUMNS
+INT_COLUMNS = ["dating_feel", "burnout_index", "matches", "conversations", "dates"]
+FLOAT_COLUMNS = ["conversation_rate", "date_rate"]
+DATETIME_COLUMNS = ["checkin_date", "created_at"]
+
+CHECKIN_SCHEMA: Dict[str, str] = {
+    **{c: "category" for c in CATEGORY_COLUMNS},
+    **{c: "int16" for c in INT_COLUMNS},
+    **{c: "float32" for c in FLOAT_COLUMNS},
+    **{c: "datetime64[ns]" for c in DATETIME_COLUMNS},
+    **{c: "int32" for c in ID_COLUMNS},
+}
+
+
+def option_index(column: str, value, default: int = 0) -> int:
+    """Position of `value` in `column`'s vocabulary, or `default` if absent."""
+    return OPTION_INDEX[column].get(value, default)
+
+
+def _categories(column: str, values: pd.Series) -> list:
+    seen = [v for v in pd.unique(values.dropna())]
+    if column in CATEGORY_VOCABULARIES:
+        vocab = CATEGORY_VOCABULARIES[column]
+        known = set(vocab)
+        return vocab + sorted(str(v) for v in seen if v not in known)
+    return sorted(str(v) for v in seen)
+
+
+def normalize_row(row: Dict) -> Dict:
+    """
+    Coerce one incoming row to the schema's Python-level types so that
+    appends, backends and running aggregates all see the same values.
+    """
+    out = dict(row)
+    for col in CATEGORY_COLUMNS:
+        value = out.get(col)
+        if value is not None and not pd.isna(value):
+            out[col] = str(value)
+    for col in INT_COLUMNS:
+        value = out.get(col)
+        out[col] = 0 if value is None or pd.isna(value) else int(value)
+    for col in FLOAT_COLUMNS:
+        value = out.get(col)
+        out[col] = float("nan") if value is None or pd.isna(value) else float(value)
+    for col in DATETIME_COLUMNS:
+        value = out.get(col)
+        if isinstance(value, (str, date, datetime)):
+            out[col] = pd.Timestamp(value)
+    return out
+
+
+def coerce_schema(frame: pd.DataFrame, columns: List[str] = CHECKIN_COLUMNS) -> pd.DataFrame:
+    """
+    Return `frame` reduced to `columns` (the wide check-in table by
+    default, or FACT_COLUMNS), each cast to CHECKIN_SCHEMA.
+    """
+    out = frame.reindex(columns=columns)
+    present = set(columns)
+    for col in CATEGORY_COLUMNS:
+        if col not in present:
+            continue
+        values = out[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Already categorical: only the (few) categories need fixing up.
+            codes = values.cat.codes.to_numpy()
+            used = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories)) > 0
+            if not used.all():
+                values = values.cat.remove_categories(values.cat.categories[~used])
+            labels = pd.Series([str(c) for c in values.cat.categories.tolist()])
+            if labels.is_unique:
+                values = values.cat.rename_categories(list(labels))
+                out[col] = values.cat.set_categories(_categories(col, labels))
+                continue
+            values = values.astype(object)
+        values = values.where(values.isna(), values.astype(str))
+        out[col] = pd.Categorical(values, categories=_categories(col, values))
+    for col in INT_COLUMNS:
+        if col in present:
+            out[col] = pd.to_numeric(out[col], errors="coerce").fillna(0).astype("int16")
+    for col in FLOAT_COLUMNS:
+        if col in present:
+            out[col] = pd.to_numeric(out[col], errors="coerce").astype("float32")
+    for col in DATETIME_COLUMNS:
+        if col in present:
+            out[col] = pd.to_datetime(out[col], errors="coerce", format="mixed").astype("datetime64[ns]")
+    for col in ID_COLUMNS:
+        if col in present:
+            # -1 = no participant / no nudge.
+            out[col] = pd.to_numeric(out[col], errors="coerce").fillna(-1).astype("int32")
+    return out
+
+
+def empty_frame(columns: List[str] = CHECKIN_COLUMNS) -> pd.DataFrame:
+    """A zero-row check-in (or fact) table with the full typed schema."""
+    return coerce_schema(pd.DataFrame(columns=columns), columns)
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate typed check-in blocks. Categories are unioned first so
+    categorical columns stay categorical instead of decaying to object;
+    that covers every column categorical in all blocks, not just
+    CATEGORY_COLUMNS (the rendered `nudge_text` gets per-block categories).
+    """
+    nonempty = [f for f in frames if not f.empty]
+    if not nonempty:
+        return empty_frame(list(frames[0].columns) if frames else CHECKIN_COLUMNS)
+    frames = nonempty
+    if len(frames) == 1:
+        return frames[0]
+
+    aligned = [f.copy(deep=False) for f in frames]
+    for col in aligned[0].columns:
+        if not all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in aligned):
+            continue
+        categories = aligned[0][col].cat.categories
+        for f in aligned[1:]:
+            extra = f[col].cat.categories
+            extra = extra[categories.get_indexer(extra) < 0]
+            if len(extra):
+                categories = categories.append(extra)
+        for f in aligned:
+            if not f[col].cat.categories.equals(categories):
+                f[col] = f[col].cat.set_categories(categories)
+    return pd.concat(aligned, ignore_index=True)
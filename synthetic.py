@@ -0,0 +1,269 @@
+"""
+Synthetic check-in generator for demos and load testing.
+
+Every column is sampled with NumPy in one vectorized pass per column
+(no per-row Python), so millions of check-ins take seconds. Participants
+get a fixed profile and a personal mood baseline; each week adds noise
+around that baseline, and matches -> conversations -> dates follow a
+simple funnel. Dates step back exactly seven days per week.
+
+Command line:
+
+    python synthetic.py --participants 100000 --weeks 12 --out checkins.parquet
+    python synthetic.py --participants 100000 --weeks 12 --store sqlite:///checkins.db
+"""
+import argparse
+import sys
+import time
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from assignment import NUDGE_EXPERIMENT
+from nudges import render_nudges, select_templates
+from personas import label_personas
+from schema import (
+    AGE_BRACKETS,
+    CHECKIN_COLUMNS,
+    DATING_INTENTIONS,
+    FRICTIONS,
+    GENDERS,
+    GOALS,
+    NEUROTYPES,
+    NUDGE_ARMS,
+    ORIENTATIONS,
+    WANT_SEE_AGAIN,
+    WENT_ON_DATE,
+)
+from tagging import DEFAULT_TAGGER
+
+# Environment variables the app reads to seed a larger synthetic study.
+SEED_PARTICIPANTS_ENV = "HINGE_SEED_PARTICIPANTS"
+SEED_WEEKS_ENV = "HINGE_SEED_WEEKS"
+
+REGIONS = ["NYC", "London", "SF Bay Area", "Chicago", "Toronto", "Austin", "Berlin", "Sydney"]
+
+PROFILE_COLUMNS = {
+    "age_bracket": AGE_BRACKETS,
+    "location_region": REGIONS,
+    "gender": GENDERS,
+    "orientation": ORIENTATIONS,
+    "neurotype": NEUROTYPES,
+    "dating_intention": DATING_INTENTIONS,
+}
+
+# Relative weights per vocabulary entry; columns not listed are uniform.
+DEFAULT_WEIGHTS: Dict[str, Sequence[float]] = {
+    "age_bracket": [0.05, 0.25, 0.30, 0.20, 0.12, 0.08],
+    "gender": [0.05, 0.45, 0.40, 0.06, 0.02, 0.02],
+    "orientation": [0.05, 0.60, 0.10, 0.07, 0.12, 0.05, 0.01],
+    "neurotype": [0.15, 0.20, 0.08, 0.07, 0.50],
+    "dating_intention": [0.25, 0.40, 0.15, 0.10, 0.10],
+    # Check-in answers: the sample data never picks "I'm not sure yet" or
+    # "Something else", and neither do most participants.
+    "goal": [0.30, 0.25, 0.20, 0.20, 0.05],
+    "friction": [0.30, 0.30, 0.15, 0.20, 0.05],
+    "want_see_again": [0.45, 0.35, 0.20],
+}
+
+STANDOUT_MOMENTS = [
+    "we laughed about our worst first dates",
+    "we talked about our favorite bad movies",
+    "we shared stories about our families",
+]
+BURNOUT_NOTES = [
+    "Felt a bit drained after so many small talks.",
+    "Actually felt hopeful this week.",
+    "Messaging back and forth is tiring but dates were good.",
+    "Got ghosted again, feeling pretty exhausted.",
+    "A bit anxious before the date but it went fine.",
+    "Hard to focus on the apps this week.",
+    "",
+]
+
+
+def _probabilities(column: str, size: int, weights: Optional[Dict[str, Sequence[float]]]) -> np.ndarray:
+    w = (weights or {}).get(column, DEFAULT_WEIGHTS.get(column))
+    if w is None:
+        return np.full(size, 1.0 / size)
+    w = np.asarray(w, dtype=float)
+    if len(w) != size:
+        raise ValueError(f"{column}: expected {size} weights, got {len(w)}")
+    return w / w.sum()
+
+
+def _categorical(codes: np.ndarray, categories: List[str]) -> pd.Categorical:
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def participant_ids(participants: int) -> List[str]:
+    """User IDs of the synthetic participants: P0001, P0002, ..."""
+    width = max(4, len(str(participants)))
+    return [f"P{i:0{width}d}" for i in range(1, participants + 1)]
+
+
+def sample_profiles(
+    participants: int,
+    rng: np.random.Generator,
+    weights: Optional[Dict[str, Sequence[float]]] = None,
+) -> pd.DataFrame:
+    """One row of segmentation fields per synthetic participant."""
+    profiles = {"user_id": participant_ids(participants)}
+    for col, vocab in PROFILE_COLUMNS.items():
+        codes = rng.choice(len(vocab), size=participants, p=_probabilities(col, len(vocab), weights))
+        profiles[col] = _categorical(codes, vocab)
+    return pd.DataFrame(profiles)
+
+
+def generate_checkins(
+    participants: int = 1000,
+    weeks: int = 12,
+    seed: Optional[int] = None,
+    weights: Optional[Dict[str, Sequence[float]]] = None,
+    attendance: float = 1.0,
+    end_date: Optional[date] = None,
+    profiles: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    Synthetic weekly check-ins as a typed check-in table.
+
+    participants, weeks:
+        Table size is at most participants x weeks rows.
+    seed:
+        Seed for `numpy.random.default_rng`; the same seed gives the same table.
+    weights:
+        Per-column relative weights over the schema vocabularies, overriding
+        DEFAULT_WEIGHTS (e.g. {"neurotype": [0, 1, 1, 0, 2]}).
+    attendance:
+        Probability that a participant checks in in any given week.
+    end_date:
+        Date of the most recent week (default: today); earlier weeks step
+        back exactly seven days each.
+    profiles:
+        Fixed participant profiles to use instead of sampling `participants`
+        random ones (columns: user_id plus PROFILE_COLUMNS).
+    """
+    rng = np.random.default_rng(seed)
+    if profiles is None:
+        profiles = sample_profiles(participants, rng, weights)
+    participants = len(profiles)
+
+    user = np.repeat(np.arange(participants), weeks)
+    week = np.tile(np.arange(weeks), participants)
+    if attendance < 1.0:
+        keep = rng.random(len(user)) < attendance
+        user, week = user[keep], week[keep]
+    n = len(user)
+
+    # Mood: a personal baseline plus weekly noise, on the 1-7 scale.
+    baseline = rng.normal(4.3, 1.1, participants)
+    dating_feel = np.clip(np.rint(baseline[user] + rng.normal(0.0, 1.0, n)), 1, 7).astype(np.int16)
+
+    # Funnel: matches -> conversations -> dates; burnt-out weeks convert less.
+    engagement = (dating_feel - 1) / 6.0
+    matches = rng.poisson(rng.gamma(2.0, 2.0, participants)[user]).astype(np.int16)
+    conversations = rng.binomial(matches, 0.35 + 0.35 * engagement).astype(np.int16)
+    dates = rng.binomial(conversations, 0.15 + 0.25 * engagement).astype(np.int16)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        conversation_rate = np.where(matches > 0, conversations / matches, 0.0).astype(np.float32)
+        date_rate = np.where(conversations > 0, dates / conversations, 0.0).astype(np.float32)
+
+    went = dates > 0
+    answered = rng.choice(3, size=n, p=_probabilities("want_see_again", 3, weights))
+    want_see_again = np.where(went, answered, WANT_SEE_AGAIN.index("N/A"))
+    standout = rng.integers(0, len(STANDOUT_MOMENTS), n)
+    standout_categories = [""] + STANDOUT_MOMENTS
+    standout_codes = np.where(went, standout + 1, 0)
+
+    # Participants keep their (hash-assigned) arm every week.
+    arm = NUDGE_EXPERIMENT.assign_batch(profiles["user_id"]).codes[user]
+
+    end = np.datetime64(end_date or date.today(), "D")
+    checkin_date = end - (week * 7).astype("timedelta64[D]")
+    created_at = checkin_date.astype("datetime64[ns]") + rng.integers(
+        8 * 3600, 23 * 3600, n
+    ).astype("timedelta64[s]")
+
+    # Order rows by date, oldest week first, as if they had been logged live.
+    order = np.lexsort((user, -week))
+
+    def take(values):
+        return values[order]
+
+    def by_participant(values: pd.Series) -> pd.Categorical:
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(str).astype("category")
+        return _categorical(values.cat.codes.to_numpy()[user[order]], list(values.cat.categories))
+
+    def sample(col, vocab):
+        return rng.choice(len(vocab), n, p=_probabilities(col, len(vocab), weights))
+
+    frame = pd.DataFrame(
+        {
+            "user_id": by_participant(profiles["user_id"]),
+            **{col: by_participant(profiles[col]) for col in PROFILE_COLUMNS},
+            "checkin_date": take(checkin_date).astype("datetime64[ns]"),
+            "dating_feel": take(dating_feel),
+            "burnout_index": take(8 - dating_feel),
+            "goal": _categorical(take(sample("goal", GOALS)), GOALS),
+            "friction": _categorical(take(sample("friction", FRICTIONS)), FRICTIONS),
+            "matches": take(matches),
+            "conversations": take(conversations),
+            "dates": take(dates),
+            "conversation_rate": take(conversation_rate),
+            "date_rate": take(date_rate),
+            "went_on_date": _categorical(take(went.astype(np.int8)), WENT_ON_DATE),
+            "want_see_again": _categorical(take(want_see_again), WANT_SEE_AGAIN),
+            "standout_moment": take(np.array(standout_categories, dtype=object)[standout_codes]),
+            "nudge_arm": _categorical(take(arm), NUDGE_ARMS),
+            "burnout_note": np.array(BURNOUT_NOTES, dtype=object)[
+                rng.integers(0, len(BURNOUT_NOTES), n)
+            ],
+            "created_at": take(created_at),
+        }
+    )
+    # Catalog nudges, drawn the way the Check-In Flow would pick them.
+    frame["nudge_template"] = select_templates(
+        frame["friction"], frame["want_see_again"], frame["nudge_arm"], frame["went_on_date"], seed=rng
+    )
+    frame["nudge_type"], frame["nudge_text"] = render_nudges(frame["nudge_template"], frame["standout_moment"])
+    frame["research_tags"] = pd.Categorical(DEFAULT_TAGGER.tag_series(frame["burnout_note"]))
+    frame["persona_label"] = label_personas(frame)
+    return frame[CHECKIN_COLUMNS]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic check-ins for demos and load tests.")
+    parser.add_argument("--participants", type=int, default=1000)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--attendance", type=float, default=1.0)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="Write to a .csv, .csv.gz or .parquet file")
+    target.add_argument("--store", help="Append to a store URL, e.g. sqlite:///checkins.db")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    frame = generate_checkins(args.participants, args.weeks, args.seed, attendance=args.attendance)
+    generated = time.perf_counter() - started
+    print(f"generated {len(frame):,} check-ins in {generated:.2f}s")
+
+    if args.out:
+        if args.out.endswith((".parquet", ".pq")):
+            frame.to_parquet(args.out, index=False)
+        else:
+            frame.to_csv(args.out, index=False)
+    else:
+        from checkin_store import store_from_url
+
+        store = store_from_url(args.store, preload=False)
+        store.extend(frame)
+        store.persist()
+    print(f"wrote {args.out or args.store} in {time.perf_counter() - started - generated:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
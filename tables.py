@@ -0,0 +1,88 @@
+"""
+Server-side paging for the raw check-in tables.
+
+`st.dataframe` serializes every row and column it is given, so the
+"underlying rows" tables only receive one sorted, projected page. Sort
+orders are plain position arrays (computed once per store version and
+sort column by the caller's cache); a page is then a `take` of a few
+dozen rows. A table can also page through a subset of a larger frame,
+given as row positions, without the subset ever being taken.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = (25, 50, 100, 250)
+DEFAULT_PAGE_SIZE = 50
+
+
+def sort_key(values: pd.Series) -> np.ndarray:
+    """
+    Float sort key for one column with missing values as NaN. Categoricals
+    sort by category order (the UI order for vocabulary columns), strings
+    alphabetically, dates chronologically.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        return np.where(codes < 0, np.nan, codes.astype(float))
+    if pd.api.types.is_datetime64_any_dtype(values):
+        stamps = values.to_numpy(dtype="datetime64[ns]")
+        return np.where(pd.isna(stamps), np.nan, stamps.astype(np.int64).astype(float))
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    codes, _ = pd.factorize(values, sort=True)
+    return np.where(codes < 0, np.nan, codes.astype(float))
+
+
+def sort_positions(frame: pd.DataFrame, column: Optional[str], ascending: bool = True) -> np.ndarray:
+    """Stable row positions of `frame` ordered by `column`, missing values last."""
+    if column is None:
+        positions = np.arange(len(frame))
+        return positions if ascending else positions[::-1]
+    key = sort_key(frame[column])
+    return np.argsort(key if ascending else -key, kind="stable")
+
+
+def sort_subset(
+    frame: pd.DataFrame, positions: np.ndarray, column: Optional[str], ascending: bool = True
+) -> np.ndarray:
+    """
+    `positions` (rows of `frame`, in their default order) reordered the
+    way `sort_positions` orders a frame of just those rows. Only `column`
+    is taken, not the rows.
+    """
+    if column is None:
+        return positions if ascending else positions[::-1]
+    return positions[sort_positions(frame[[column]].take(positions), column, ascending)]
+
+
+def page_count(rows: int, page_size: int) -> int:
+    return max(1, -(-rows // page_size))
+
+
+def page_slice(
+    frame: pd.DataFrame,
+    columns: Sequence[str],
+    order: np.ndarray,
+    page: int,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> Tuple[pd.DataFrame, int, int]:
+    """
+    Rows of 1-based `page` in `order`, projected to `columns`.
+    Returns (page frame, first row number, last row number), 1-based.
+    """
+    page = min(max(1, page), page_count(len(order), page_size))
+    start = (page - 1) * page_size
+    positions = order[start:start + page_size]
+    # Take first, then project: only the page's rows are ever copied.
+    rows = frame.take(positions)[list(columns)]
+    return rows, start + 1 if len(positions) else 0, start + len(positions)
+
+
+def visible_columns(available: List[str], chosen: Optional[Sequence[str]]) -> List[str]:
+    """`chosen` columns in table order, or all of `available` if none are chosen."""
+    if not chosen:
+        return list(available)
+    chosen = set(chosen)
+    return [c for c in available if c in chosen]
@@ -0,0 +1,93 @@
+"""
+Qualitative auto-tagging for free-text check-in notes.
+
+The keyword lexicon is compiled once into one regular expression per
+tag (an alternation of its keywords), so a note costs one search per
+tag however many keywords there are, and keywords of different tags
+that overlap or start at the same position are all found.
+`NoteTagger.tag_series` re-tags a whole column, scanning each distinct
+note only once.
+"""
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_LEXICON: Dict[str, List[str]] = {
+    "burnout": ["tired", "exhausted", "burnt", "burned"],
+    "anxiety": ["anxious", "nervous", "overwhelmed"],
+    "positive": ["excited", "hopeful", "optimistic"],
+    "ghosting": ["ghost", "ghosted"],
+    "attention": ["adhd", "focus", "distracted"],
+}
+
+
+class NoteTagger:
+    """
+    Multi-pattern keyword tagger.
+
+    lexicon:
+        tag -> keywords; matching is case-insensitive.
+    word_boundary:
+        False keeps plain substring matching ("ghosted" hits "ghost");
+        True only matches whole words.
+    """
+
+    def __init__(self, lexicon: Optional[Dict[str, List[str]]] = None, word_boundary: bool = False):
+        self.lexicon = dict(lexicon or DEFAULT_LEXICON)
+        self.word_boundary = word_boundary
+        self.tags = sorted(self.lexicon)
+        self._bits = {tag: 1 << i for i, tag in enumerate(self.tags)}
+        self._labels: Dict[int, str] = {}
+
+        edge = r"\b" if word_boundary else ""
+        # One pattern per tag: in a single alternation only one tag can
+        # match at a given position, so a keyword of another tag starting
+        # there ("burn" vs "burnout") would be lost.
+        self.patterns: Dict[str, "re.Pattern[str]"] = {}
+        for tag in self.tags:
+            words = sorted(set(self.lexicon[tag]), key=len, reverse=True)
+            alternatives = "|".join(re.escape(w) for w in words)
+            self.patterns[tag] = re.compile(f"{edge}(?:{alternatives}){edge}", re.IGNORECASE)
+
+    def mask(self, note: str) -> int:
+        """Bitmask of the tags present in `note` (bit order = `self.tags`)."""
+        bits = 0
+        for tag, pattern in self.patterns.items():
+            if pattern.search(note):
+                bits |= self._bits[tag]
+        return bits
+
+    def label(self, bits: int) -> str:
+        if bits not in self._labels:
+            self._labels[bits] = ", ".join(
+                tag for tag in self.tags if bits & self._bits[tag]
+            )
+        return self._labels[bits]
+
+    def tag(self, note: str) -> str:
+        """Comma-separated, alphabetically sorted tags for one note."""
+        return self.label(self.mask(note or ""))
+
+    def tag_series(self, notes: pd.Series) -> pd.Series:
+        """Tag every note in `notes`; missing notes get no tags."""
+        codes, uniques = pd.factorize(notes)
+        masks = np.fromiter(
+            (self.mask(str(note)) for note in uniques), dtype=np.int64, count=len(uniques)
+        )
+        masks = np.append(masks, 0)[np.where(codes < 0, len(uniques), codes)]
+        distinct, inverse = np.unique(masks, return_inverse=True)
+        labels = np.array([self.label(int(b)) for b in distinct], dtype=object)[inverse]
+        return pd.Series(labels, index=notes.index, name="research_tags")
+
+
+DEFAULT_TAGGER = NoteTagger()
+
+
+def tag_burnout_note(note: str) -> str:
+    """
+    Extremely lightweight auto-tagging to show how
+    qualitative notes could be structured for analysis.
+    """
+    return DEFAULT_TAGGER.tag(note)